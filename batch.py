@@ -0,0 +1,259 @@
+"""A module that encapsulates the batch download capability, which runs the Canvas file downloader for many
+accounts in parallel.
+
+The accounts are listed in a JSON manifest file, which is a list of accounts (or an object with the list of
+accounts under `accounts`). Each account is an object with the following fields:
+
+- `url` (required): The Canvas URL.
+- `token` (required): The Canvas token of the account.
+- `root` (required): The directory to save the account's files into.
+- `courses` (optional): The list of course codes to download. Defaults to all courses.
+- `name` (optional): The name of the account, used in the summary. Defaults to the root directory.
+- `order` (optional): The download order policy. Defaults to `api`.
+- `limit` (optional): The bandwidth limit specification for the account. Defaults to no limit.
+- `rules` (optional): The list of filter rules for the account. Defaults to no rules.
+- `enrollment_state`, `states`, `term` and `favourites` (optional): The course scope of the account (see `CourseScope`).
+  Defaults to all the account's courses.
+- `listing` (optional): The backend to list the folders and files with, `rest` or `graphql`. Defaults to `rest`.
+- `transport` (optional): The HTTP transport to send the requests with, `http1` or `http2`. Defaults to `http1`.
+- `storage` and `storage_endpoint` (optional): The storage sink to save the files into (`local`, `tar`, `zip` or
+  `s3://bucket/prefix`, see `storage`), and the endpoint of an S3-compatible object store. Defaults to `local`.
+- `cache` (optional): The URL of a shared file cache service to download the files through (see `filecache`).
+  Defaults to no cache.
+- `initial_sync` (optional): Whether to download the new files of courses with many new files as a single zip file
+  exported by Canvas (see `contentexport`). Defaults to false.
+
+The output of each account's run is written to a `.batch.log` file in the account's root directory.
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from urllib.parse import urlparse
+
+from downloader import Downloader
+from downloadqueue import DownloadQueue
+from ratelimit import TokenBucket
+from runstats import RunStats
+from coursescope import CourseScope
+from storage import validateStorage
+from transport import TRANSPORTS
+
+class BatchAccount:
+  """An account in the batch manifest."""
+
+  def __init__(self, url : str, token : str, root : str, courses : list[str] = None, name : str = None, order : str = "api", limit : str = "", rules : list[str] = None, courseScope : CourseScope = None, listing : str = "rest", transport : str = "http1", storage : str = "local", storageEndpoint : str = None, cacheUrl : str = None, initialSync : bool = False):
+    """Creates a batch account.
+
+    Args:
+      url (str): The Canvas URL.
+      token (str): The Canvas token of the account.
+      root (str): The directory to save the account's files into.
+      courses (list[str], optional): The list of course codes to download. Defaults to None, which means all courses.
+      name (str, optional): The name of the account. Defaults to None, which means the root directory.
+      order (str, optional): The download order policy. Defaults to "api".
+      limit (str, optional): The bandwidth limit specification. Defaults to "", which means no limit.
+      rules (list[str], optional): The filter rules. Defaults to None, which means no rules.
+      courseScope (CourseScope, optional): The course scope. Defaults to None, which means all the account's courses.
+      listing (str, optional): The listing backend, one of the keys of `Downloader.LISTING_BACKENDS`. Defaults to "rest".
+      transport (str, optional): The HTTP transport, one of the keys of `transport.TRANSPORTS`. Defaults to "http1".
+      storage (str, optional): The storage sink specification, as described in `storage`. Defaults to "local".
+      storageEndpoint (str, optional): The endpoint of an S3-compatible object store. Defaults to None.
+      cacheUrl (str, optional): The URL of a shared file cache service. Defaults to None, which means no cache.
+      initialSync (bool, optional): Whether to unpack content exports of the courses with many new files. Defaults to False.
+    """
+    self.url = url.rstrip("/")
+    self.token = token
+    self.root = root
+    self.courses = courses if courses is not None else []
+    self.name = name if name is not None else root
+    self.order = order
+    self.limit = limit
+    self.rules = rules if rules is not None else []
+    self.courseScope = courseScope
+    self.listing = listing
+    self.transport = transport
+    self.storage = storage
+    self.storageEndpoint = storageEndpoint
+    self.cacheUrl = cacheUrl
+    self.initialSync = initialSync
+
+  def host(self) -> str:
+    """Returns the Canvas host of the account, which the concurrency budget is shared by.
+
+    Returns:
+      str: The Canvas host.
+    """
+    return urlparse(self.url).netloc
+
+  def validate(self):
+    """Checks the account's options, so that an invalid option is reported when the manifest is loaded instead of
+    failing the account's run.
+
+    Raises:
+      ValueError: If an option of the account is invalid.
+    """
+    TokenBucket(self.limit)
+    if self.order not in DownloadQueue.POLICIES:
+      raise ValueError(f"Invalid order: {self.order}")
+    if self.listing not in Downloader.LISTING_BACKENDS:
+      raise ValueError(f"Invalid listing: {self.listing}")
+    if self.transport not in TRANSPORTS:
+      raise ValueError(f"Invalid transport: {self.transport}")
+    validateStorage(self.storage)
+
+  @classmethod
+  def fromManifest(cls, manifestLocation : str) -> list["BatchAccount"]:
+    """Loads the accounts from a batch manifest file.
+
+    Args:
+      manifestLocation (str): The location of the manifest file.
+
+    Raises:
+      ValueError: If the manifest is invalid.
+
+    Returns:
+      list[BatchAccount]: The accounts in the manifest.
+    """
+    with open(manifestLocation, "r") as f:
+      manifest = json.load(f)
+    if isinstance(manifest, dict):
+      manifest = manifest.get("accounts", [])
+
+    accounts = []
+    for index, entry in enumerate(manifest):
+      missing = [field for field in ["url", "token", "root"] if not entry.get(field)]
+      if len(missing) > 0:
+        raise ValueError(f"Account {index + 1} in the manifest is missing {', '.join(missing)}")
+      courseScope = CourseScope(entry.get("enrollment_state", ""), entry.get("states"), entry.get("term", ""), entry.get("favourites", False))
+      account = cls(entry["url"], entry["token"], entry["root"], entry.get("courses"), entry.get("name"), entry.get("order", "api"), entry.get("limit", ""), entry.get("rules"), courseScope, entry.get("listing", "rest"), entry.get("transport", "http1"),
+        entry.get("storage", "local"), entry.get("storage_endpoint"), entry.get("cache"), entry.get("initial_sync", False))
+      try:
+        account.validate()
+      except ValueError as e:
+        raise ValueError(f"Account {index + 1} in the manifest is invalid: {e}")
+      accounts.append(account)
+    return accounts
+
+class BatchResult:
+  """The result of running the downloader for a single batch account."""
+
+  def __init__(self, name : str, host : str, stats : RunStats, duration : float, error : str = None):
+    """Creates a batch result.
+
+    Args:
+      name (str): The name of the account.
+      host (str): The Canvas host of the account.
+      stats (RunStats): The statistics of the account's run.
+      duration (float): The duration of the account's run, in seconds.
+      error (str, optional): The error that stopped the run, if any. Defaults to None.
+    """
+    self.name = name
+    self.host = host
+    self.stats = stats
+    self.duration = duration
+    self.error = error
+
+def _runAccount(account : BatchAccount) -> BatchResult:
+  """Runs the downloader for a single account within a worker process.
+
+  Args:
+    account (BatchAccount): The account to download the files of.
+
+  Returns:
+    BatchResult: The result of the account's run. Errors, including invalid options of the account, are reported in
+    the result instead of being raised, so that they do not stop the other accounts.
+  """
+  start = time.monotonic()
+  downloader = None
+  try:
+    downloader = Downloader(account.root, account.url, account.token, account.courses, downloadOrder=account.order, bandwidthLimit=account.limit, rules=account.rules, courseScope=account.courseScope, listingBackend=account.listing, transport=account.transport,
+      storage=account.storage, storageEndpoint=account.storageEndpoint, cacheUrl=account.cacheUrl, initialSync=account.initialSync)
+    pathlib.Path(account.root).mkdir(parents=True, exist_ok=True)
+    with open(f"{account.root}/.batch.log", "w") as log, contextlib.redirect_stdout(log):
+      stats = downloader.run()
+    return BatchResult(account.name, account.host(), stats, time.monotonic() - start)
+  except Exception:
+    stats = downloader.stats if downloader is not None else RunStats()
+    return BatchResult(account.name, account.host(), stats, time.monotonic() - start, traceback.format_exc(limit=1).strip())
+
+class BatchRunner:
+  """Runs the downloader for many accounts in parallel across a pool of processes."""
+
+  def __init__(self, accounts : list[BatchAccount], workers : int = None, perHost : int = 2):
+    """Creates a batch runner.
+
+    Args:
+      accounts (list[BatchAccount]): The accounts to download the files of.
+      workers (int, optional): The number of worker processes. Defaults to None, which means the number of CPUs.
+      perHost (int, optional): The maximum number of accounts downloading from the same Canvas host at a time.
+      Defaults to 2.
+    """
+    self.accounts = accounts
+    self.workers = workers if workers is not None else os.cpu_count() or 1
+    self.perHost = perHost
+
+  def run(self, onResult = None) -> list[BatchResult]:
+    """Runs the downloader for all the accounts. An account is only handed to a worker once its Canvas host is within
+    its concurrency budget, so that the workers are kept busy with the accounts of other hosts meanwhile.
+
+    Args:
+      onResult (Callable[[BatchResult], None], optional): Called with each account's result as soon as it
+      completes. Defaults to None.
+
+    Returns:
+      list[BatchResult]: The results of the accounts, in the order of the accounts.
+    """
+    results : dict[int, BatchResult] = {}
+    # the accounts waiting to run, in the order of the accounts, and the number of accounts running on each host
+    waiting = list(enumerate(self.accounts))
+    running : dict[str, int] = {}
+
+    with ProcessPoolExecutor(max_workers=self.workers) as executor:
+      futures = {}
+
+      def submitReady():
+        for index, account in list(waiting):
+          if len(futures) >= self.workers:
+            return
+          if running.get(account.host(), 0) < self.perHost:
+            waiting.remove((index, account))
+            running[account.host()] = running.get(account.host(), 0) + 1
+            futures[executor.submit(_runAccount, account)] = index
+
+      submitReady()
+      while len(futures) > 0:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+          index = futures.pop(future)
+          results[index] = future.result()
+          running[self.accounts[index].host()] -= 1
+          if onResult is not None:
+            onResult(results[index])
+        submitReady()
+
+    return [results[index] for index in range(len(self.accounts))]
+
+def summarise(results : list[BatchResult]) -> str:
+  """Builds the aggregated summary of a batch run.
+
+  Args:
+    results (list[BatchResult]): The results of the batch run.
+
+  Returns:
+    str: The summary, as a table with one line per account and a line with the totals.
+  """
+  total = RunStats()
+  lines = ["Batch summary:", ""]
+  for result in results:
+    total.add(result.stats)
+    status = "FAILED: " + result.error.splitlines()[-1] if result.error else "OK"
+    lines.append(f"{result.name} ({result.host}): {result.stats} in {result.duration:.1f}s [{status}]")
+  failedAccounts = len([result for result in results if result.error])
+  lines.append("")
+  lines.append(f"Total: {len(results)} accounts ({failedAccounts} failed), {total}")
+  return "\n".join(lines)
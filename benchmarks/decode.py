@@ -0,0 +1,99 @@
+"""Benchmarks the decoding and transfer of large file listings.
+
+- `decode` decodes a large synthetic files listing into File objects with the standard `json` module and intermediate
+  copies of the listing, as the listing used to be decoded, and with `transport.decodeJson` (which uses `orjson` if it
+  is installed) building the File objects directly from each decoded page.
+- `transfer` lists a stand-in tenant with large folders through the downloader, with the stand-in server sending
+  uncompressed and gzip-compressed responses.
+
+Run from the repository root with `python -m benchmarks.decode`.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import sys
+import time
+
+import transport
+from downloader import Downloader
+from filemodels import File
+from benchmarks.standin import StandInServer, SyntheticTenant
+
+def _baselineDecode(pages : list[bytes]) -> list[File]:
+  """Decodes the pages of a files listing with `json`, copying each page before building the File objects."""
+  files = []
+  for page in pages:
+    text = json.loads(page)
+    files.extend(list(map(lambda apiObject : File(apiObject["modified_at"], apiObject["id"], apiObject["url"], apiObject["display_name"], apiObject.get("size")), list(text))))
+  return files
+
+def _directDecode(pages : list[bytes]) -> list[File]:
+  """Decodes the pages of a files listing with `transport.decodeJson`, building the File objects directly."""
+  files = []
+  for page in pages:
+    files.extend(File.fromApiArray(transport.decodeJson(page)))
+  return files
+
+def _best(function, *args, repeat : int = 5) -> float:
+  """Returns the best time of several calls of a function, in seconds."""
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function(*args)
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+def benchmarkDecode(files : int, perPage : int):
+  tenant = SyntheticTenant(1, 1, files)
+  listing = [{ **file, "url": f"https://canvas.example.com/files/{file['id']}/download" } for file in tenant.files[1000]]
+  pages = [json.dumps(listing[start:start + perPage]).encode() for start in range(0, len(listing), perPage)]
+  baseline = _best(_baselineDecode, pages)
+  direct = _best(_directDecode, pages)
+  decoder = "orjson" if importlib.util.find_spec("orjson") is not None else "json"
+  print(f"decode   {files} files in pages of {perPage}, {sum(len(page) for page in pages) / 1024 ** 2:.1f} MB")
+  print(f"  json + copies      {baseline * 1000:8.1f} ms")
+  print(f"  {decoder:<6} + direct     {direct * 1000:8.1f} ms  ({baseline / direct:.1f}x faster)")
+
+def _listTenant(server : StandInServer) -> tuple[int, float]:
+  """Lists the stand-in tenant through the downloader.
+
+  Returns:
+    tuple[int, float]: The number of files listed and the time taken in seconds.
+  """
+  downloader = Downloader("", server.url, "token", [])
+  start = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    courses = downloader.loadFiles()
+  duration = time.perf_counter() - start
+  return sum(len(folder.files) for course in courses for folder in course.folders), duration
+
+def benchmarkTransfer(courses : int, folders : int, files : int, latency : float):
+  tenant = SyntheticTenant(courses, folders, files)
+  print(f"transfer {tenant.fileCount()} files in {courses} courses x {folders} folders, {latency * 1000:.0f} ms latency")
+  for compress in [False, True]:
+    server = StandInServer(tenant, latency, compress=compress)
+    try:
+      listed, duration = _listTenant(server)
+    finally:
+      server.close()
+    print(f"  {'gzip' if compress else 'identity':<18} {listed:7d} files  {server.counter['requests']:5d} requests  "
+      f"{server.counter['bytes'] / 1024 ** 2:7.2f} MB  {duration:7.2f}s")
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--files", type=int, default=100000, help="the number of files in the decoded listing")
+  parser.add_argument("--per-page", type=int, default=100, help="the number of files in each page of the decoded listing")
+  parser.add_argument("--courses", type=int, default=2, help="the number of courses in the transferred tenant")
+  parser.add_argument("--folders", type=int, default=5, help="the number of folders in each course of the transferred tenant")
+  parser.add_argument("--folder-files", type=int, default=1000, help="the number of files in each folder of the transferred tenant")
+  parser.add_argument("--latency", type=float, default=2, help="the latency of each request, in milliseconds")
+  args = parser.parse_args(argv)
+
+  benchmarkDecode(args.files, args.per_page)
+  benchmarkTransfer(args.courses, args.folders, args.folder_files, args.latency / 1000)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""Benchmarks the initial sync of a large course, downloading its files one by one and as a single zip file exported
+by Canvas (`--initial-sync`), against a local stand-in Canvas server. Both downloads are checked to produce the same
+files, hashes and file log entries, and a second run after the initial sync to download nothing.
+
+Run from the repository root with `python -m benchmarks.export`.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from downloader import Downloader
+from filemodels import FileLog
+from benchmarks.standin import StandInServer, SyntheticTenant
+
+def _tree(root : str) -> dict[str, str]:
+  """Returns the SHA-256 hash of each downloaded file by its path within the root directory."""
+  tree = {}
+  for directory, _, names in os.walk(root):
+    for name in names:
+      location = os.path.join(directory, name)
+      if not name.startswith("."):
+        with open(location, "rb") as f:
+          tree[os.path.relpath(location, root)] = hashlib.sha256(f.read()).hexdigest()
+  return tree
+
+def _fileLog(root : str) -> list[tuple]:
+  """Returns the entries of the file log in the root directory, in the order of their file IDs."""
+  fileLog = FileLog.fromFileLog(f"{root}/.files")
+  return sorted((file.id, file.modified_at, file.sha256, file.local_path) for file in fileLog.fileList)
+
+def _run(server : StandInServer, root : str, initialSync : bool) -> tuple[float, int, "RunStats"]:
+  """Runs the downloader against the stand-in server.
+
+  Returns:
+    tuple[float, int, RunStats]: The time of the run in seconds, the number of requests sent and the run statistics.
+  """
+  downloader = Downloader(root, server.url, "token", [], initialSync=initialSync)
+  server.counter["requests"] = 0
+  start = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    stats = downloader.run()
+  return time.perf_counter() - start, server.counter["requests"], stats
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--folders", type=int, default=10, help="the number of folders in the course")
+  parser.add_argument("--files", type=int, default=100, help="the number of files in each folder")
+  parser.add_argument("--size", type=int, default=4096, help="the size of each file, in bytes")
+  parser.add_argument("--latency", type=float, default=20, help="the latency of each request, in milliseconds")
+  parser.add_argument("--export-delay", type=float, default=2, help="the time Canvas takes to export the course, in seconds")
+  args = parser.parse_args(argv)
+
+  tenant = SyntheticTenant(1, args.folders, args.files, args.size)
+  server = StandInServer(tenant, args.latency / 1000, exportDelay=args.export_delay)
+  print(f"{tenant.fileCount()} files of {args.size} bytes in {args.folders} folders, {args.latency:.0f} ms per request, "
+    f"{args.export_delay:.1f}s to export")
+  try:
+    with tempfile.TemporaryDirectory() as perFileRoot, tempfile.TemporaryDirectory() as exportRoot:
+      results = {}
+      for name, root, initialSync in [("per file", perFileRoot, False), ("export", exportRoot, True)]:
+        duration, requests, stats = _run(server, root, initialSync)
+        results[name] = (_tree(root), _fileLog(root))
+        print(f"{name:<9} {duration:7.2f}s  {requests:6d} requests  {stats.added} added  {stats.failed} failed")
+
+      duration, requests, stats = _run(server, exportRoot, True)
+      print(f"{'again':<9} {duration:7.2f}s  {requests:6d} requests  {stats.added} added  {stats.skipped} skipped")
+
+      identical = results["per file"] == results["export"] and len(results["export"][0]) == tenant.fileCount()
+      print(f"Files, hashes and file log entries {'match' if identical else 'DO NOT match'}")
+      if not identical or stats.added + stats.updated > 0:
+        sys.exit(1)
+  finally:
+    server.close()
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
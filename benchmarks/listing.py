@@ -0,0 +1,58 @@
+"""Benchmarks the REST and GraphQL listing backends against a local stand-in Canvas server.
+
+The stand-in serves the `filesConnection` schema that the GraphQL backend assumes (see `graphqllisting`), which is not
+in Canvas's documented GraphQL schema, so the `graphql` row is only the speedup on a Canvas instance that serves it.
+The `graphql*` row lists against a stand-in that rejects the query, as a Canvas instance without the schema does,
+which shows the cost of the fallback to the REST API.
+
+Run from the repository root with `python -m benchmarks.listing`.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+from downloader import Downloader
+from benchmarks.standin import StandInServer, SyntheticTenant
+
+def _listTenant(server : StandInServer, backend : str) -> tuple[int, int, float]:
+  """Lists the stand-in tenant with a listing backend.
+
+  Returns:
+    tuple[int, int, float]: The number of files listed, the number of requests made and the time taken in seconds.
+  """
+  downloader = Downloader("", server.url, "token", [], listingBackend=backend)
+  server.counter["requests"] = 0
+  start = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    courses = downloader.loadFiles()
+  duration = time.perf_counter() - start
+  files = sum(len(folder.files) for course in courses for folder in course.folders)
+  return files, server.counter["requests"], duration
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument("--courses", type=int, default=5)
+  parser.add_argument("--folders", type=int, default=20, help="the number of folders in each course")
+  parser.add_argument("--files", type=int, default=25, help="the number of files in each folder")
+  parser.add_argument("--latency", type=float, default=20, help="the latency of each request, in milliseconds")
+  args = parser.parse_args(argv)
+
+  tenant = SyntheticTenant(args.courses, args.folders, args.files)
+  print(f"{tenant.fileCount()} files in {args.courses} courses x {args.folders} folders, {args.latency:.0f} ms latency")
+  results = {}
+  for name, backend, graphqlFiles in [("rest", "rest", True), ("graphql", "graphql", True), ("graphql*", "graphql", False)]:
+    server = StandInServer(tenant, args.latency / 1000, graphqlFiles=graphqlFiles)
+    try:
+      results[name] = _listTenant(server, backend)
+    finally:
+      server.close()
+
+  for name, (files, requests, duration) in results.items():
+    print(f"{name:<8} {files:7d} files  {requests:5d} requests  {duration:7.2f}s")
+  print("graphql: stand-in serving the assumed filesConnection schema; graphql*: stand-in rejecting it, like Canvas")
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
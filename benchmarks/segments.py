@@ -0,0 +1,83 @@
+"""Benchmarks downloading large files in a single stream and in parallel segments (`--segments`), against a local
+stand-in Canvas server that limits the bandwidth of each response, like a file store throttling each connection.
+Every download is checked to produce the files' content. The segmented download is also run with sizes in the listing
+that are much smaller than the files, as for a file replaced on Canvas since it was listed, which must not split the
+files into more segments.
+
+Run from the repository root with `python -m benchmarks.segments`.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from downloader import Downloader
+from benchmarks.standin import StandInServer, SyntheticTenant
+
+def _complete(tenant : SyntheticTenant, root : str) -> bool:
+  """Returns whether every file of the tenant was downloaded into the root directory with its content."""
+  for course in tenant.courses:
+    for folder in tenant.folders[course["id"]]:
+      path = folder["full_name"].removeprefix("course files").lstrip("/")
+      for file in tenant.files[folder["id"]]:
+        location = os.path.join(root, course["course_code"], path, file["display_name"])
+        if not os.path.isfile(location):
+          return False
+        with open(location, "rb") as f:
+          if f.read() != tenant.body(file["id"]):
+            return False
+  return True
+
+def _run(server : StandInServer, segments : int) -> tuple[float, int, bool]:
+  """Downloads the stand-in tenant, splitting every file into segments.
+
+  Returns:
+    tuple[float, int, bool]: The time of the download in seconds, the number of requests sent, and whether every file
+    was downloaded with its content.
+  """
+  with tempfile.TemporaryDirectory() as root:
+    downloader = Downloader(root, server.url, "token", [], segments=segments, segmentThreshold=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+      courses = downloader.loadFiles()
+      server.counter["requests"] = 0
+      start = time.perf_counter()
+      downloader.download(courses)
+    return time.perf_counter() - start, server.counter["requests"], _complete(server.tenant, root)
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--files", type=int, default=4, help="the number of files")
+  parser.add_argument("--size", type=int, default=8 * 1024 * 1024, help="the size of each file, in bytes")
+  parser.add_argument("--bandwidth", type=float, default=8, help="the bandwidth of each response, in MB/s")
+  parser.add_argument("--latency", type=float, default=20, help="the latency of each request, in milliseconds")
+  parser.add_argument("--segments", type=int, default=4, help="the number of segments of the segmented download")
+  args = parser.parse_args(argv)
+
+  tenant = SyntheticTenant(1, 1, args.files, args.size)
+  server = StandInServer(tenant, args.latency / 1000, bandwidth=args.bandwidth * 1024 * 1024)
+  print(f"{args.files} files of {args.size / 1024 / 1024:.1f} MB, {args.bandwidth:.0f} MB/s per response, {args.latency:.0f} ms per request")
+  failed = False
+  try:
+    for name, segments, listedSize in [
+      ("single", 1, args.size),
+      (f"{args.segments} segments", args.segments, args.size),
+      ("stale size", args.segments, 1000),
+    ]:
+      for files in tenant.files.values():
+        for file in files:
+          file["size"] = listedSize
+      duration, requests, complete = _run(server, segments)
+      print(f"{name:<12} {duration:6.2f}s  {args.files * args.size / duration / 1024 / 1024:6.1f} MB/s  {requests:5d} requests  "
+        f"files {'match' if complete else 'DO NOT match'}")
+      failed = failed or not complete
+  finally:
+    server.close()
+  if failed:
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,546 @@
+"""A local stand-in for the parts of the Canvas API used by the downloader, serving a synthetic tenant for the
+benchmarks. Every request is delayed by a fixed latency to simulate the round trip to a remote Canvas host, and
+every new connection by a further latency to simulate the TCP and TLS handshakes. Like Canvas, REST listings are
+paginated with `Link` headers, and JSON responses are compressed with gzip if the client accepts it. Files can be
+downloaded in parts with `Range` requests, and each response can be limited to a bandwidth to simulate a host that
+throttles each connection. Content exports of files (`export_type=zip`) are exported after a fixed delay, into zip files
+with the files' paths within the course.
+
+The server speaks HTTP/1.1, or HTTP/2 over plain TCP with prior knowledge (`http2=True`, requires the `h2` package),
+in which case concurrent requests on a connection are served concurrently like on an HTTP/2 Canvas host.
+
+`S3StandInServer` is a stand-in for the parts of the S3 API used by the S3 storage sink (objects, copies and multipart
+uploads, with path-style addressing), keeping the objects in memory. Request signatures are not checked.
+"""
+
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import re
+import socket
+import socketserver
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlparse
+from xml.etree import ElementTree
+
+class SyntheticTenant:
+  """A synthetic Canvas tenant with the same number of folders in each course and files in each folder."""
+
+  def __init__(self, courses : int = 5, folders : int = 20, files : int = 25, fileSize : int = 1024):
+    """Creates a synthetic tenant.
+
+    Args:
+      courses (int, optional): The number of courses. Defaults to 5.
+      folders (int, optional): The number of folders in each course. Defaults to 20.
+      files (int, optional): The number of files in each folder. Defaults to 25.
+      fileSize (int, optional): The size of each file, in bytes. Defaults to 1024.
+    """
+    self.courses = [{ "id": c, "name": f"Course {c}", "course_code": f"C{c}" } for c in range(1, courses + 1)]
+    self.folders = {
+      course["id"]: [{ "id": course["id"] * 1000 + f, "full_name": "course files" if f == 0 else f"course files/Folder {f}" } for f in range(folders)]
+      for course in self.courses
+    }
+    self.fileSize = fileSize
+    self.files = {
+      folder["id"]: [
+        { "id": folder["id"] * 1000 + i, "display_name": f"file{i}.pdf", "modified_at": "2024-01-01T00:00:00Z", "size": fileSize }
+        for i in range(files)
+      ]
+      for courseFolders in self.folders.values() for folder in courseFolders
+    }
+
+  def fileCount(self) -> int:
+    """Returns the number of files in the tenant."""
+    return sum(len(files) for files in self.files.values())
+
+  def body(self, fileId : int) -> bytes:
+    """Returns the content of a file."""
+    pattern = bytes((fileId + i) % 251 for i in range(251))
+    return (pattern * (self.fileSize // 251 + 1))[:self.fileSize]
+
+  def exportZip(self, courseId : int, fileIds : list[int]) -> bytes:
+    """Returns the zip file of a content export of files in a course, with the files' paths within the course."""
+    selected = set(fileIds)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+      for folder in self.folders.get(courseId, []):
+        path = folder["full_name"].removeprefix("course files").lstrip("/")
+        for file in self.files[folder["id"]]:
+          if file["id"] in selected:
+            archive.writestr(f"{path}/{file['display_name']}".lstrip("/"), self.body(file["id"]))
+    return buffer.getvalue()
+
+class _StandInApp:
+  """The stand-in Canvas API, independent of the HTTP version the requests are received with."""
+
+  def __init__(self, tenant : SyntheticTenant, counter : dict, maxPerPage : int, compress : bool, exportDelay : float, graphqlFiles : bool):
+    self.tenant = tenant
+    self.counter = counter
+    self.maxPerPage = maxPerPage
+    self.compress = compress
+    self.exportDelay = exportDelay
+    self.graphqlFiles = graphqlFiles
+    self._lock = threading.Lock()
+    # the content exports by ID, with their zip files and the time they were requested
+    self._exports = {}
+    self._exportIds = itertools.count(1)
+
+  def count(self, name : str, amount : int = 1):
+    """Adds to a counter of the server."""
+    with self._lock:
+      self.counter[name] += amount
+
+  def handle(self, method : str, target : str, host : str, acceptEncoding : str, body : bytes, byteRange : str = None) -> tuple[int, dict, bytes]:
+    """Handles a request.
+
+    Args:
+      method (str): The request method.
+      target (str): The request target, the path with the query string.
+      host (str): The host the request was sent to, used in the URLs of the response.
+      acceptEncoding (str): The `Accept-Encoding` header of the request.
+      body (bytes): The request body.
+      byteRange (str, optional): The `Range` header of the request. Defaults to None.
+
+    Returns:
+      tuple[int, dict, bytes]: The status, headers and body of the response.
+    """
+    self.count("requests")
+    request = _Request(method, urlparse(target), host, acceptEncoding, byteRange)
+    if method == "GET":
+      status, headers, content = self._get(request)
+    elif method == "POST":
+      status, headers, content = self._post(request, json.loads(body or b"{}"))
+    else:
+      status, headers, content = 405, {}, b"{}"
+    self.count("bytes", len(content))
+    return status, headers, content
+
+  def _json(self, request : "_Request", value, headers : dict = None) -> tuple[int, dict, bytes]:
+    body = json.dumps(value).encode()
+    headers = { "Content-Type": "application/json", **(headers or {}) }
+    if self.compress and "gzip" in request.acceptEncoding:
+      body = gzip.compress(body, 6)
+      headers["Content-Encoding"] = "gzip"
+    return 200, headers, body
+
+  def _page(self, request : "_Request", items : list) -> tuple[int, dict, bytes]:
+    """Returns a page of a listing, with a `Link` header to the next page like the Canvas API."""
+    query = { name : values[-1] for name, values in parse_qs(request.url.query).items() if name != "access_token" }
+    perPage = min(int(query.get("per_page", 10)), self.maxPerPage)
+    page = int(query.get("page", 1))
+    headers = {}
+    if page * perPage < len(items):
+      nextQuery = urlencode({ **query, "page": page + 1, "per_page": perPage })
+      headers["Link"] = f'<http://{request.host}{request.url.path}?{nextQuery}>; rel="next"'
+    return self._json(request, items[(page - 1) * perPage:page * perPage], headers)
+
+  def _completion(self, exportId : int) -> int:
+    """Returns the completion of a content export, from 0 to 100, which is exported once its delay has passed."""
+    if self.exportDelay <= 0:
+      return 100
+    return min(100, int((time.monotonic() - self._exports[exportId]["requested"]) / self.exportDelay * 100))
+
+  def _export(self, request : "_Request", exportId : int) -> dict:
+    """Returns a content export as the Canvas API describes it."""
+    completion = self._completion(exportId)
+    value = {
+      "id": exportId, "export_type": "zip", "workflow_state": "exported" if completion >= 100 else "exporting",
+      "progress_url": f"http://{request.host}/api/v1/progress/{exportId}",
+    }
+    if completion >= 100:
+      value["attachment"] = { "url": f"http://{request.host}/exports/{exportId}/download", "size": len(self._exports[exportId]["zip"]) }
+    return value
+
+  def _withUrls(self, request : "_Request", files : list[dict]) -> list[dict]:
+    return [{ **file, "url": f"http://{request.host}/files/{file['id']}/download" } for file in files]
+
+  def _get(self, request : "_Request") -> tuple[int, dict, bytes]:
+    tenant = self.tenant
+    path = request.url.path
+    if path == "/api/v1/courses":
+      return self._page(request, tenant.courses)
+    elif match := re.fullmatch(r"/api/v1/courses/(\d+)/folders", path):
+      return self._page(request, tenant.folders.get(int(match[1]), []))
+    elif match := re.fullmatch(r"/api/v1/folders/(\d+)/files", path):
+      return self._page(request, self._withUrls(request, tenant.files.get(int(match[1]), [])))
+    elif match := re.fullmatch(r"/files/(\d+)/download", path):
+      return self._content(request, tenant.body(int(match[1])))
+    elif (match := re.fullmatch(r"/api/v1/courses/\d+/content_exports/(\d+)", path)) and int(match[1]) in self._exports:
+      return self._json(request, self._export(request, int(match[1])))
+    elif (match := re.fullmatch(r"/api/v1/progress/(\d+)", path)) and int(match[1]) in self._exports:
+      return self._json(request, { "completion": self._completion(int(match[1])) })
+    elif (match := re.fullmatch(r"/exports/(\d+)/download", path)) and int(match[1]) in self._exports:
+      return 200, { "Content-Type": "application/zip" }, self._exports[int(match[1])]["zip"]
+    return 404, { "Content-Type": "application/json" }, b"{}"
+
+  def _content(self, request : "_Request", content : bytes) -> tuple[int, dict, bytes]:
+    """Returns the content of a file, or the part of it in the request's `Range` header like a file store."""
+    headers = { "Content-Type": "application/octet-stream", "Accept-Ranges": "bytes" }
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.byteRange or "")
+    if match is None:
+      return 200, headers, content
+    start = int(match[1])
+    end = min(int(match[2]) if match[2] != "" else len(content) - 1, len(content) - 1)
+    if start > end:
+      return 416, { "Content-Range": f"bytes */{len(content)}" }, b""
+    return 206, { **headers, "Content-Range": f"bytes {start}-{end}/{len(content)}" }, content[start:end + 1]
+
+  def _post(self, request : "_Request", body : dict) -> tuple[int, dict, bytes]:
+    path = request.url.path
+    if path == "/api/graphql" and not self.graphqlFiles:
+      # the response of a Canvas instance whose schema has no `filesConnection`
+      return self._json(request, { "errors": [{ "message": "Field 'filesConnection' doesn't exist on type 'Course'" }] })
+    elif path == "/api/graphql":
+      return self._json(request, self._courseFiles(request, body.get("variables", {})))
+    elif match := re.fullmatch(r"/api/v1/courses/(\d+)/content_exports", path):
+      fileIds = [int(id) for id in body.get("select", {}).get("files", [])]
+      with self._lock:
+        exportId = next(self._exportIds)
+        self._exports[exportId] = { "zip": self.tenant.exportZip(int(match[1]), fileIds), "requested": time.monotonic() }
+      return self._json(request, self._export(request, exportId))
+    return 404, { "Content-Type": "application/json" }, b"{}"
+
+  def _courseFiles(self, request : "_Request", variables : dict) -> dict:
+    folders = self.tenant.folders.get(int(variables["courseId"]))
+    if folders is None:
+      return { "data": { "course": None } }
+    nodes = [
+      {
+        "_id": str(file["id"]), "displayName": file["display_name"], "size": file["size"], "modifiedAt": file["modified_at"],
+        "url": file["url"], "folder": { "_id": str(folder["id"]), "fullName": folder["full_name"] },
+      }
+      for folder in folders for file in self._withUrls(request, self.tenant.files[folder["id"]])
+    ]
+    start = int(variables.get("after") or 0)
+    end = start + int(variables["first"])
+    return { "data": { "course": { "filesConnection": {
+      "nodes": nodes[start:end],
+      "pageInfo": { "hasNextPage": end < len(nodes), "endCursor": str(end) },
+    } } } }
+
+class _Request:
+  """The parts of a request the stand-in API uses."""
+
+  def __init__(self, method : str, url, host : str, acceptEncoding : str, byteRange : str = None):
+    self.method = method
+    self.url = url
+    self.host = host
+    self.acceptEncoding = acceptEncoding or ""
+    self.byteRange = byteRange
+
+def _handler(app : _StandInApp, latency : float, connectLatency : float, bandwidth : float):
+  """Creates the HTTP/1.1 request handler class of the stand-in server."""
+
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and body are written separately, which would otherwise be delayed on kept-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+      pass
+
+    def setup(self):
+      time.sleep(connectLatency)
+      app.count("connections")
+      super().setup()
+
+    def handle(self):
+      try:
+        super().handle()
+      except (ConnectionResetError, BrokenPipeError):
+        # the client closed the connection without reading the whole response
+        pass
+
+    def _handle(self, method : str):
+      time.sleep(latency)
+      body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+      status, headers, content = app.handle(method, self.path, self.headers.get("Host"), self.headers.get("Accept-Encoding", ""), body,
+        self.headers.get("Range"))
+      self.send_response(status)
+      self.send_header("Content-Length", str(len(content)))
+      for name, value in headers.items():
+        self.send_header(name, value)
+      self.end_headers()
+      if bandwidth is None:
+        self.wfile.write(content)
+        return
+      # the content is sent in chunks, each after the time it takes at the bandwidth
+      for start in range(0, len(content), 65536):
+        chunk = content[start:start + 65536]
+        time.sleep(len(chunk) / bandwidth)
+        self.wfile.write(chunk)
+
+    def do_GET(self):
+      self._handle("GET")
+
+    def do_POST(self):
+      self._handle("POST")
+
+  return Handler
+
+class _HTTP2Connection:
+  """Serves the requests of an HTTP/2 connection, each stream in its own thread, with the responses sent within the
+  flow control windows of the client.
+  """
+
+  def __init__(self, sock : socket.socket, app : _StandInApp, latency : float):
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+    self._events = h2.events
+    self._errors = h2.exceptions
+    self._sock = sock
+    self._app = app
+    self._latency = latency
+    self._connection = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+    self._lock = threading.Lock()
+    # notified when the client opens the flow control windows
+    self._windowOpened = threading.Condition(self._lock)
+    self._requests : dict[int, tuple[dict, bytearray]] = {}
+
+  def _flush(self):
+    """Sends the pending frames. Must be called with the connection's lock held."""
+    data = self._connection.data_to_send()
+    if data:
+      self._sock.sendall(data)
+
+  def serve(self):
+    with self._lock:
+      self._connection.initiate_connection()
+      self._flush()
+    while True:
+      try:
+        data = self._sock.recv(65536)
+      except OSError:
+        data = b""
+      with self._lock:
+        if not data:
+          self._windowOpened.notify_all()
+          return
+        events = self._connection.receive_data(data)
+        for event in events:
+          if isinstance(event, self._events.RequestReceived):
+            self._requests[event.stream_id] = (dict(event.headers), bytearray())
+          elif isinstance(event, self._events.DataReceived):
+            self._requests[event.stream_id][1].extend(event.data)
+            self._connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+          elif isinstance(event, self._events.StreamEnded):
+            headers, body = self._requests.pop(event.stream_id)
+            threading.Thread(target=self._respond, args=(event.stream_id, headers, bytes(body)), daemon=True).start()
+          elif isinstance(event, (self._events.WindowUpdated, self._events.StreamReset)):
+            self._windowOpened.notify_all()
+          elif isinstance(event, self._events.ConnectionTerminated):
+            self._windowOpened.notify_all()
+            return
+        self._flush()
+
+  def _respond(self, streamId : int, requestHeaders : dict, body : bytes):
+    time.sleep(self._latency)
+    status, headers, content = self._app.handle(requestHeaders[":method"], requestHeaders[":path"],
+      requestHeaders.get(":authority"), requestHeaders.get("accept-encoding", ""), body, requestHeaders.get("range"))
+    try:
+      with self._lock:
+        self._connection.send_headers(streamId, [(":status", str(status)), ("content-length", str(len(content)))]
+          + [(name.lower(), value) for name, value in headers.items()], end_stream=len(content) == 0)
+        self._flush()
+        sent = 0
+        while sent < len(content):
+          window = self._connection.local_flow_control_window(streamId)
+          if window <= 0:
+            self._windowOpened.wait()
+            continue
+          size = min(window, self._connection.max_outbound_frame_size, len(content) - sent)
+          self._connection.send_data(streamId, content[sent:sent + size], end_stream=sent + size == len(content))
+          sent += size
+          self._flush()
+    except (self._errors.StreamClosedError, self._errors.ProtocolError, OSError):
+      # the client reset the stream or closed the connection
+      pass
+
+def _http2Handler(app : _StandInApp, latency : float, connectLatency : float):
+  """Creates the HTTP/2 connection handler class of the stand-in server."""
+
+  class Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+      time.sleep(connectLatency)
+      app.count("connections")
+      self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+      _HTTP2Connection(self.request, app, latency).serve()
+
+  return Handler
+
+class StandInServer:
+  """A stand-in Canvas server running in a background thread."""
+
+  def __init__(self, tenant : SyntheticTenant, latency : float = 0.02, connectLatency : float = 0.0, maxPerPage : int = 100, compress : bool = True, exportDelay : float = 0.5, graphqlFiles : bool = True, http2 : bool = False, bandwidth : float = None):
+    """Starts a stand-in server on a free local port.
+
+    Args:
+      tenant (SyntheticTenant): The tenant to serve.
+      latency (float, optional): The delay added to every request, in seconds. Defaults to 0.02.
+      connectLatency (float, optional): The delay added to every new connection, in seconds. Defaults to 0.
+      maxPerPage (int, optional): The maximum number of items in a page of a REST listing. Defaults to 100, the
+      maximum of the Canvas API.
+      compress (bool, optional): Whether to compress JSON responses for clients that accept gzip. Defaults to True.
+      exportDelay (float, optional): The time content exports take to be exported, in seconds. Defaults to 0.5.
+      graphqlFiles (bool, optional): Whether to serve the `filesConnection` GraphQL schema the GraphQL listing backend
+      assumes. Defaults to True; if False, GraphQL queries are rejected like on a Canvas instance without it.
+      http2 (bool, optional): Whether to speak HTTP/2 with prior knowledge instead of HTTP/1.1, which requires the
+      `h2` package. Defaults to False.
+      bandwidth (float, optional): The bandwidth each HTTP/1.1 response is sent at, in bytes per second. Defaults to
+      None, which means responses are not throttled.
+    """
+    self.tenant = tenant
+    self.counter = { "requests": 0, "connections": 0, "bytes": 0 }
+    app = _StandInApp(tenant, self.counter, maxPerPage, compress, exportDelay, graphqlFiles)
+    if http2:
+      self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _http2Handler(app, latency, connectLatency))
+    else:
+      self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(app, latency, connectLatency, bandwidth))
+    self._server.daemon_threads = True
+    threading.Thread(target=self._server.serve_forever, daemon=True).start()
+    self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+  def close(self):
+    """Stops the stand-in server."""
+    self._server.shutdown()
+    self._server.server_close()
+
+def _decodeChunked(body : bytes) -> bytes:
+  """Decodes a request body sent with `aws-chunked` content encoding, dropping the chunk signatures and trailers."""
+  content = bytearray()
+  position = 0
+  while True:
+    end = body.index(b"\r\n", position)
+    size = int(body[position:end].split(b";")[0], 16)
+    if size == 0:
+      return bytes(content)
+    content += body[end + 2:end + 2 + size]
+    position = end + 2 + size + 2
+
+def _s3Handler(objects : dict, counter : dict, lock : threading.Lock, latency : float):
+  """Creates the request handler class of the S3 stand-in server."""
+
+  uploads = {}
+  uploadIds = itertools.count(1)
+
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+      pass
+
+    def _send(self, status : int, headers : dict = None, content : bytes = b"", head : bool = False):
+      self.send_response(status)
+      for name, value in (headers or {}).items():
+        self.send_header(name, value)
+      if "Content-Length" not in (headers or {}):
+        self.send_header("Content-Length", str(len(content)))
+      self.end_headers()
+      if not head:
+        self.wfile.write(content)
+
+    def _xml(self, root : str, **values) -> bytes:
+      fields = "".join(f"<{name}>{value}</{name}>" for name, value in values.items())
+      return f'<?xml version="1.0" encoding="UTF-8"?><{root} xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{fields}</{root}>'.encode()
+
+    def _notFound(self, head : bool = False):
+      self._send(404, { "Content-Type": "application/xml" }, self._xml("Error", Code="NoSuchKey"), head)
+
+    def _request(self) -> tuple[tuple[str, str], dict, bytes]:
+      """Reads a request, and returns its bucket and key, its query parameters and its body."""
+      time.sleep(latency)
+      with lock:
+        counter["requests"] += 1
+      url = urlparse(self.path)
+      bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+      body = b""
+      if "Content-Length" in self.headers:
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+      if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+        body = _decodeChunked(body)
+      with lock:
+        counter["bytes"] += len(body)
+      return (bucket, key), { name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items() }, body
+
+    def do_HEAD(self):
+      location, _, _ = self._request()
+      if location not in objects:
+        return self._notFound(True)
+      self._send(200, { "Content-Length": str(len(objects[location])), "ETag": f'"{hashlib.md5(objects[location]).hexdigest()}"' }, head=True)
+
+    def do_GET(self):
+      location, _, _ = self._request()
+      if location not in objects:
+        return self._notFound()
+      self._send(200, { "ETag": f'"{hashlib.md5(objects[location]).hexdigest()}"' }, objects[location])
+
+    def do_PUT(self):
+      location, query, body = self._request()
+      if "uploadId" in query:
+        if query["uploadId"] not in uploads:
+          return self._send(404, { "Content-Type": "application/xml" }, self._xml("Error", Code="NoSuchUpload"))
+        uploads[query["uploadId"]][int(query["partNumber"])] = body
+        return self._send(200, { "ETag": f'"{hashlib.md5(body).hexdigest()}"' })
+      if "x-amz-copy-source" in self.headers:
+        sourceBucket, _, sourceKey = unquote(self.headers["x-amz-copy-source"]).lstrip("/").partition("/")
+        if (sourceBucket, sourceKey) not in objects:
+          return self._notFound()
+        objects[location] = objects[(sourceBucket, sourceKey)]
+        return self._send(200, { "Content-Type": "application/xml" }, self._xml("CopyObjectResult", ETag=f'"{hashlib.md5(objects[location]).hexdigest()}"'))
+      objects[location] = body
+      self._send(200, { "ETag": f'"{hashlib.md5(body).hexdigest()}"' })
+
+    def do_POST(self):
+      location, query, body = self._request()
+      bucket, key = location
+      if "uploads" in query:
+        uploadId = str(next(uploadIds))
+        uploads[uploadId] = {}
+        return self._send(200, { "Content-Type": "application/xml" }, self._xml("InitiateMultipartUploadResult", Bucket=bucket, Key=key, UploadId=uploadId))
+      parts = uploads.pop(query.get("uploadId"), None)
+      if parts is None:
+        return self._send(404, { "Content-Type": "application/xml" }, self._xml("Error", Code="NoSuchUpload"))
+      numbers = [int(element.text) for element in ElementTree.fromstring(body).iter() if element.tag.endswith("PartNumber")]
+      objects[location] = b"".join(parts[number] for number in numbers)
+      self._send(200, { "Content-Type": "application/xml" }, self._xml("CompleteMultipartUploadResult", Bucket=bucket, Key=key,
+        ETag=f'"{hashlib.md5(objects[location]).hexdigest()}-{len(numbers)}"'))
+
+    def do_DELETE(self):
+      location, query, _ = self._request()
+      if "uploadId" in query:
+        uploads.pop(query["uploadId"], None)
+      else:
+        objects.pop(location, None)
+      self._send(204)
+
+  return Handler
+
+class S3StandInServer:
+  """A stand-in S3-compatible object store running in a background thread."""
+
+  def __init__(self, latency : float = 0.0):
+    """Starts an S3 stand-in server on a free local port. Every bucket exists, and starts empty.
+
+    Args:
+      latency (float, optional): The delay added to every request, in seconds. Defaults to 0.
+    """
+    # the content of the objects by their bucket and key
+    self.objects : dict[tuple[str, str], bytes] = {}
+    self.counter = { "requests": 0, "bytes": 0 }
+    self._server = ThreadingHTTPServer(("127.0.0.1", 0), _s3Handler(self.objects, self.counter, threading.Lock(), latency))
+    self._server.daemon_threads = True
+    threading.Thread(target=self._server.serve_forever, daemon=True).start()
+    self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+  def close(self):
+    """Stops the S3 stand-in server."""
+    self._server.shutdown()
+    self._server.server_close()
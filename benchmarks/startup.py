@@ -0,0 +1,102 @@
+"""Benchmarks the cold start of the GUI: the time from the start of `main.py` to the first frame of the main window,
+and the time to import the GUI modules. Each run starts a new interpreter, so nothing is cached between runs (apart
+from the operating system's file cache).
+
+The first frame needs a display; without one (e.g. on a headless server), only the import time is measured. The modules
+that should only be imported on first use (e.g. the HTTP stack) are reported if they are imported at startup.
+
+Run from the repository root with `python -m benchmarks.startup`.
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# the modules that should not be imported before the main window appears
+DEFERRED_MODULES = ["requests", "urllib3", "httpx", "orjson", "dotenv", "multiprocessing", "boto3", "sqlite3"]
+
+_REPOSITORY = pathlib.Path(__file__).resolve().parent.parent
+
+# runs in a new interpreter, in an empty working directory so that the saved `.values` are not read or overwritten
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+mode, repository, deferred = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+sys.path.insert(0, repository)
+result = {}
+if mode == "frame":
+  import runpy, tkinter
+  def firstFrame(window, n=0):
+    window.update()
+    result["seconds"] = time.perf_counter() - start
+    window.destroy()
+  tkinter.Tk.mainloop = firstFrame
+  sys.argv = ["main.py"]
+  try:
+    runpy.run_path(repository + "/main.py", run_name="__main__")
+  except tkinter.TclError as e:
+    result["error"] = str(e)
+else:
+  import gui.mainwindow
+  result["seconds"] = time.perf_counter() - start
+result["modules"] = [name for name in deferred if name in sys.modules]
+print(json.dumps(result))
+"""
+
+def _measure(mode : str, runs : int) -> dict:
+  """Measures the start of the GUI in new interpreters.
+
+  Args:
+    mode (str): `frame` to measure the time to the first frame, or `import` to measure the time to import the GUI.
+    runs (int): The number of runs.
+
+  Returns:
+    dict: The median time of the runs in seconds (`seconds`), the median time including the interpreter's own
+    startup (`process`), and the deferred modules imported at startup (`modules`), or the error of the first failed
+    run (`error`).
+  """
+  seconds, process, modules = [], [], set()
+  with tempfile.TemporaryDirectory() as workingDirectory:
+    for _ in range(runs):
+      start = time.perf_counter()
+      output = subprocess.run([sys.executable, "-c", _CHILD, mode, str(_REPOSITORY), json.dumps(DEFERRED_MODULES)],
+        cwd=workingDirectory, capture_output=True, text=True)
+      process.append(time.perf_counter() - start)
+      lines = output.stdout.strip().splitlines()
+      if output.returncode != 0 or len(lines) == 0:
+        return { "error": (output.stderr.strip().splitlines() or ["unknown error"])[-1] }
+      result = json.loads(lines[-1])
+      if "error" in result:
+        return result
+      seconds.append(result["seconds"])
+      modules.update(result["modules"])
+  return { "seconds": statistics.median(seconds), "process": statistics.median(process), "modules": sorted(modules) }
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--runs", type=int, default=10, help="the number of runs of each measurement")
+  parser.add_argument("--budget", type=float, default=None,
+    help="fail if the time to the first frame (or to import the GUI, without a display) is above this many milliseconds")
+  args = parser.parse_args(argv)
+
+  measured = None
+  for mode, title in [("import", "import GUI"), ("frame", "first frame")]:
+    result = _measure(mode, args.runs)
+    if "error" in result:
+      print(f"{title:<12} skipped ({result['error']})")
+      continue
+    measured = result["seconds"]
+    modules = f"  deferred modules imported: {', '.join(result['modules'])}" if len(result["modules"]) > 0 else ""
+    print(f"{title:<12} {result['seconds'] * 1000:7.1f} ms  ({result['process'] * 1000:.1f} ms with interpreter startup){modules}")
+
+  if args.budget is not None and measured is not None and measured * 1000 > args.budget:
+    print(f"Startup is over the budget of {args.budget:.0f} ms!")
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,110 @@
+"""Benchmarks the storage sinks, downloading the courses into separate files, tar and zip archives per course, and an
+S3-compatible object store, against a local stand-in Canvas server and a local stand-in S3 server. Every sink is
+checked to hold the content of every file, and a second run to download nothing.
+
+Run from the repository root with `python -m benchmarks.storage`. The S3 sink requires the optional `boto3` package.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from downloader import Downloader
+from benchmarks.standin import S3StandInServer, StandInServer, SyntheticTenant
+
+def _expected(tenant : SyntheticTenant) -> dict[str, bytes]:
+  """Returns the content of each file of the tenant by its path relative to the root directory."""
+  expected = {}
+  for course in tenant.courses:
+    for folder in tenant.folders[course["id"]]:
+      path = folder["full_name"].removeprefix("course files").lstrip("/")
+      for file in tenant.files[folder["id"]]:
+        expected[os.path.join(course["course_code"], path, file["display_name"]).replace(os.sep, "/")] = tenant.body(file["id"])
+  return expected
+
+def _stored(storage : str, root : str, s3 : S3StandInServer) -> dict[str, bytes]:
+  """Returns the content of each file saved into a sink by its path relative to the root directory."""
+  stored = {}
+  if storage.startswith("s3://"):
+    bucket, _, prefix = storage[5:].partition("/")
+    for (objectBucket, key), content in s3.objects.items():
+      if objectBucket == bucket and key.startswith(f"{prefix}/"):
+        stored[key.removeprefix(f"{prefix}/")] = content
+    return stored
+  for name in os.listdir(root):
+    location = os.path.join(root, name)
+    if name.endswith(".tar"):
+      with tarfile.open(location) as archive:
+        for member in archive.getmembers():
+          stored[f"{name[:-4]}/{member.name}"] = archive.extractfile(member).read()
+    elif name.endswith(".zip"):
+      with zipfile.ZipFile(location) as archive:
+        for member in archive.namelist():
+          stored[f"{name[:-4]}/{member}"] = archive.read(member)
+    elif os.path.isdir(location):
+      for directory, _, names in os.walk(location):
+        for fileName in names:
+          with open(os.path.join(directory, fileName), "rb") as f:
+            stored[os.path.relpath(os.path.join(directory, fileName), root).replace(os.sep, "/")] = f.read()
+  return stored
+
+def _run(server : StandInServer, root : str, storage : str, endpointUrl : str) -> tuple[float, "RunStats"]:
+  """Runs the downloader against the stand-in server, saving the files into a sink.
+
+  Returns:
+    tuple[float, RunStats]: The time of the run in seconds and the run statistics.
+  """
+  downloader = Downloader(root, server.url, "token", [], storage=storage, storageEndpoint=endpointUrl)
+  start = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    stats = downloader.run()
+  return time.perf_counter() - start, stats
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--courses", type=int, default=2)
+  parser.add_argument("--folders", type=int, default=10, help="the number of folders in each course")
+  parser.add_argument("--files", type=int, default=20, help="the number of files in each folder")
+  parser.add_argument("--size", type=int, default=4096, help="the size of each file, in bytes")
+  parser.add_argument("--latency", type=float, default=2, help="the latency of each Canvas request, in milliseconds")
+  parser.add_argument("--s3-latency", type=float, default=2, help="the latency of each S3 request, in milliseconds")
+  args = parser.parse_args(argv)
+
+  tenant = SyntheticTenant(args.courses, args.folders, args.files, args.size)
+  server = StandInServer(tenant, args.latency / 1000)
+  s3 = S3StandInServer(args.s3_latency / 1000)
+  # the stand-in does not check request signatures, but boto3 needs credentials to sign them
+  for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+    os.environ.setdefault(name, "standin")
+  os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+  print(f"{tenant.fileCount()} files of {args.size} bytes in {args.courses} courses x {args.folders} folders, "
+    f"{args.latency:.0f} ms per Canvas request, {args.s3_latency:.0f} ms per S3 request")
+  expected = _expected(tenant)
+  failed = False
+  try:
+    for storage in ["local", "tar", "zip", "s3://mirror/canvas"]:
+      with tempfile.TemporaryDirectory() as root:
+        try:
+          duration, stats = _run(server, root, storage, s3.url)
+        except ImportError as e:
+          print(f"{storage:<18} not available ({e})")
+          continue
+        againDuration, againStats = _run(server, root, storage, s3.url)
+        complete = _stored(storage, root, s3) == expected
+        print(f"{storage:<18} {duration:6.2f}s  {stats.added} added  {stats.failed} failed  "
+          f"again {againDuration:6.2f}s  {againStats.skipped} skipped  files {'match' if complete else 'DO NOT match'}")
+        failed = failed or not complete or stats.failed > 0 or againStats.added + againStats.updated > 0
+  finally:
+    server.close()
+    s3.close()
+  if failed:
+    sys.exit(1)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,93 @@
+"""Benchmarks the HTTP transports on a listing-heavy crawl and on downloading many small files, against a local
+stand-in Canvas server. `unpooled` sends every request on a new connection, as the downloader did before the
+transports were added.
+
+The `http1` rows run against a stand-in server speaking HTTP/1.1, sending one request at a time and then `--concurrency`
+requests at a time over pooled connections. The `http2` rows run against a stand-in server speaking HTTP/2 (with prior
+knowledge, as it has no TLS), where the concurrent requests are multiplexed as streams over a single connection.
+
+Run from the repository root with `python -m benchmarks.transport`.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+import requests
+
+from downloader import Downloader
+from transport import HTTP2Transport, RequestsTransport, Transport
+from benchmarks.standin import StandInServer, SyntheticTenant
+
+class _UnpooledTransport(Transport):
+  """Sends every request on a new connection."""
+
+  name = "unpooled"
+
+  def get(self, url : str, params : dict = None, headers : dict = None, stream : bool = False) -> requests.Response:
+    return requests.get(url, params=params, headers=headers, stream=stream)
+
+  def post(self, url : str, params : dict = None, json : dict = None, headers : dict = None) -> requests.Response:
+    return requests.post(url, params=params, json=json, headers=headers)
+
+def _run(server : StandInServer, transport : Transport, concurrency : int) -> tuple[float, float, int]:
+  """Crawls and downloads the stand-in tenant with a transport, sending up to `concurrency` requests at a time.
+
+  Returns:
+    tuple[float, float, int]: The crawl time and download time in seconds, and the number of connections opened.
+  """
+  downloader = Downloader(tempfile.mkdtemp(), server.url, "token", [], concurrency=concurrency)
+  downloader.transport = transport
+  server.counter["connections"] = 0
+  with contextlib.redirect_stdout(io.StringIO()):
+    start = time.perf_counter()
+    courses = downloader.loadFiles()
+    crawlTime = time.perf_counter() - start
+    start = time.perf_counter()
+    downloader.download(courses)
+    downloadTime = time.perf_counter() - start
+  transport.close()
+  return crawlTime, downloadTime, server.counter["connections"]
+
+def main(argv : list[str] = None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--courses", type=int, default=2)
+  parser.add_argument("--folders", type=int, default=20, help="the number of folders in each course")
+  parser.add_argument("--files", type=int, default=10, help="the number of files in each folder")
+  parser.add_argument("--size", type=int, default=4096, help="the size of each file, in bytes")
+  parser.add_argument("--latency", type=float, default=5, help="the latency of each request, in milliseconds")
+  parser.add_argument("--connect-latency", type=float, default=30, help="the latency of each new connection, in milliseconds")
+  parser.add_argument("--concurrency", type=int, default=8, help="the number of requests in flight at a time in the concurrent runs")
+  args = parser.parse_args(argv)
+
+  tenant = SyntheticTenant(args.courses, args.folders, args.files, args.size)
+  servers = { "http1": StandInServer(tenant, args.latency / 1000, args.connect_latency / 1000) }
+  print(f"{tenant.fileCount()} files of {args.size} bytes in {args.courses} courses x {args.folders} folders, "
+    f"{args.latency:.0f} ms per request, {args.connect_latency:.0f} ms per connection")
+  runs = [
+    ("unpooled", "http1", _UnpooledTransport, 1),
+    ("http1", "http1", RequestsTransport, 1),
+    ("http1", "http1", RequestsTransport, args.concurrency),
+  ]
+  try:
+    HTTP2Transport().close()
+    servers["http2"] = StandInServer(tenant, args.latency / 1000, args.connect_latency / 1000, http2=True)
+    runs += [
+      ("http2", "http2", lambda : HTTP2Transport(priorKnowledge=True), 1),
+      ("http2", "http2", lambda : HTTP2Transport(priorKnowledge=True), args.concurrency),
+    ]
+  except ImportError:
+    print("http2: not available (requires httpx[http2])")
+  try:
+    for name, protocol, transport, concurrency in runs:
+      crawlTime, downloadTime, connections = _run(servers[protocol], transport(), concurrency)
+      print(f"{name:<9} x{concurrency:<3} crawl {crawlTime:6.2f}s  download {downloadTime:6.2f}s  {connections:5d} connections")
+  finally:
+    for server in servers.values():
+      server.close()
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,127 @@
+"""A module that encapsulates the crawl checkpoint (`.checkpoint`), which records the courses, folders and files
+listed from the Canvas API as a run progresses, so that an interrupted run can be resumed without listing them again.
+
+The checkpoint is saved as one JSON record per line, and records are only ever appended, so that saving the
+checkpoint costs the same no matter how large the crawl is. The first record identifies the Canvas URL and course
+scope of the crawl, and the checkpoint is ignored if they change.
+"""
+
+import json
+import os
+import threading
+
+from filemodels import Course, File, Folder
+
+class CrawlCheckpoint:
+  """The crawl checkpoint of a run, saved in a locally-stored checkpoint file."""
+
+  def __init__(self, checkpointLocation : str = None, key : str = ""):
+    """Creates a crawl checkpoint, loading the records in the checkpoint file if the file exists and was saved
+    for the same key.
+
+    Args:
+      checkpointLocation (str, optional): The location of the checkpoint file. Defaults to None, which means the
+      checkpoint is not saved.
+      key (str, optional): The key identifying the crawl (e.g. the Canvas URL and course scope). Defaults to "".
+    """
+    self.checkpointLocation = checkpointLocation
+    self.key = key
+    self.courses : list[Course] = None
+    self.folders : dict[int, list[Folder]] = {}
+    self.files : dict[int, list[File]] = {}
+    self._lock = threading.Lock()
+    self.resumed = self._load()
+
+  def _load(self) -> bool:
+    """Loads the records in the checkpoint file.
+
+    Returns:
+      bool: True if a checkpoint for the same key was loaded, False otherwise.
+    """
+    if self.checkpointLocation is None:
+      return False
+    try:
+      with open(self.checkpointLocation, "r") as f:
+        lines = f.readlines()
+    except OSError:
+      return False
+
+    try:
+      header = json.loads(lines[0]) if len(lines) > 0 else None
+    except ValueError:
+      # a corrupt checkpoint is discarded, and replaced by the next record appended
+      return False
+    if not isinstance(header, dict) or header.get("key") != self.key:
+      return False
+
+    for line in lines[1:]:
+      try:
+        record = json.loads(line)
+      except ValueError:
+        # the last record may be incomplete if the run was interrupted while it was being written
+        break
+      if "courses" in record:
+        self.courses = Course.fromApiArray(record["courses"])
+      elif "folders" in record:
+        self.folders[record["course"]] = Folder.fromApiArray(record["folders"])
+      elif "files" in record:
+        self.files[record["folder"]] = File.fromApiArray(record["files"])
+    return True
+
+  def _append(self, record : dict):
+    """Appends a record to the checkpoint file, starting a new checkpoint file if needed.
+
+    Args:
+      record (dict): The record to append.
+    """
+    if self.checkpointLocation is None:
+      return
+    # the files of several folders may be recorded at once when they are listed concurrently
+    with self._lock:
+      self._write(record)
+
+  def _write(self, record : dict):
+    """Appends a record to the checkpoint file. Must be called with the checkpoint's lock held."""
+    try:
+      if not self.resumed:
+        with open(self.checkpointLocation, "w") as f:
+          f.write(json.dumps({ "key": self.key }) + "\n")
+        self.resumed = True
+      with open(self.checkpointLocation, "a") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    except OSError:
+      print("Could not save the checkpoint!")
+
+  def recordCourses(self, courses : list[Course]):
+    """Records the courses listed from the Canvas API.
+
+    Args:
+      courses (list[Course]): The listed courses.
+    """
+    self.courses = courses
+    self._append({ "courses": [course.toDict() for course in courses] })
+
+  def recordFolders(self, courseId : int, folders : list[Folder]):
+    """Records the folders listed in a course.
+
+    Args:
+      courseId (int): The ID of the course.
+      folders (list[Folder]): The listed folders.
+    """
+    self.folders[courseId] = folders
+    self._append({ "course": courseId, "folders": [folder.toDict() for folder in folders] })
+
+  def recordFiles(self, folderId : int, files : list[File]):
+    """Records the files listed in a folder.
+
+    Args:
+      folderId (int): The ID of the folder.
+      files (list[File]): The listed files.
+    """
+    self.files[folderId] = files
+    self._append({ "folder": folderId, "files": [file.toDict() for file in files] })
+
+  def clear(self):
+    """Deletes the checkpoint file, once the run it belongs to has completed."""
+    if self.checkpointLocation is not None and os.path.exists(self.checkpointLocation):
+      os.remove(self.checkpointLocation)
@@ -0,0 +1,350 @@
+"""Module that runs the command line interface (CLI) of the Canvas downloader application.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from downloader import Downloader
+from downloadqueue import DownloadQueue
+from filters import FilterEngine
+from ratelimit import TokenBucket, parseSize
+from storage import createSink
+from coursescope import CourseScope
+from transport import TRANSPORTS
+
+def _watchCommands(downloader : Downloader):
+  """Reads commands from the standard input while a download is in progress, in a separate thread.
+  The following commands are supported:
+
+  - `limit <spec>`: Changes the bandwidth limit specification (e.g. `limit 500K`, or `limit off` to remove the limit).
+  - `pause` and `resume`: Pauses and resumes the download.
+  - `cancel`: Cancels the download, saving its progress so that the next run continues from where it stopped.
+
+  Args:
+    downloader (Downloader): The downloader running the download.
+  """
+  def watch():
+    for line in sys.stdin:
+      command, _, argument = line.strip().partition(" ")
+      if command == "limit":
+        try:
+          downloader.rateLimiter.setSpec(argument)
+          print(f"Bandwidth limit set to {argument if argument.strip() != '' else 'off'}")
+        except ValueError as e:
+          print(f"Invalid bandwidth limit! {e}")
+      elif command == "pause":
+        downloader.pause()
+      elif command == "resume":
+        downloader.resume()
+        print("Resumed")
+      elif command == "cancel":
+        downloader.cancel()
+        print("Cancelling...")
+      elif command != "":
+        print(f"Unknown command: {command}")
+
+  threading.Thread(target=watch, daemon=True).start()
+
+def _loadRules(args : argparse.Namespace) -> list[str]:
+  """Collects the filter rules from the `--rules-file`, `--include` and `--exclude` options, and checks that they are valid.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+
+  Returns:
+    list[str]: The filter rules.
+  """
+  rules = []
+  try:
+    if args.rules_file is not None:
+      with open(args.rules_file, "r") as f:
+        rules += f.readlines()
+    rules += ["+" + rule.lstrip("+") for rule in args.include]
+    rules += ["-" + rule.lstrip("-") for rule in args.exclude]
+    FilterEngine(rules)
+  except (OSError, ValueError) as e:
+    sys.exit(f"Could not load the filter rules! {e}")
+  return rules
+
+def _createDownloader(args : argparse.Namespace) -> Downloader:
+  """Creates the downloader from the options added by `_addDownloaderArguments`.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+
+  Returns:
+    Downloader: The downloader.
+  """
+  try:
+    TokenBucket(args.limit)
+  except ValueError as e:
+    sys.exit(f"Invalid bandwidth limit! {e}")
+  try:
+    segmentThreshold = parseSize(args.segment_threshold)
+  except ValueError as e:
+    sys.exit(f"Invalid segment threshold! {e}")
+  try:
+    # the sink is created before the crawl, so that an invalid storage does not fail after all the listing requests
+    createSink(args.storage, args.root, args.s3_endpoint).close()
+  except ValueError as e:
+    sys.exit(f"Invalid storage! {e}")
+  except ImportError as e:
+    sys.exit(f"The {args.storage} storage requires an optional package that is not installed! {e}")
+  return Downloader(args.root, args.url, args.token, args.courses, downloadOrder=args.order, bandwidthLimit=args.limit, rules=_loadRules(args),
+    courseScope=CourseScope(args.enrollment_state, args.state, args.term, args.favourites),
+    segments=args.segments, segmentThreshold=segmentThreshold, listingBackend=args.listing, transport=args.transport,
+    concurrency=args.concurrency, storage=args.storage, storageEndpoint=args.s3_endpoint, cacheUrl=args.cache,
+    initialSync=getattr(args, "initial_sync", False))
+
+def _download(args : argparse.Namespace):
+  """Runs the `download` command, which downloads the files from Canvas.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  downloader = _createDownloader(args)
+  _watchCommands(downloader)
+  downloader.run()
+
+def _verify(args : argparse.Namespace):
+  """Runs the `verify` command, which checks the downloaded files for missing, changed and corrupt files, and
+  downloads those files again.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  downloader = _createDownloader(args)
+  _watchCommands(downloader)
+  problems = downloader.verify(repair=not args.no_repair, workers=args.workers)
+  if args.no_repair and any(len(tasks) > 0 for tasks in problems.values()):
+    sys.exit(1)
+
+def _history(args : argparse.Namespace):
+  """Runs the `history` command, which prints the statistics of the previous runs.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  from runstats import RunStats, formatHistory
+
+  print(formatHistory(RunStats.loadHistory(args.root), args.limit, args.details))
+
+def _openIndex(root : str):
+  """Opens the manifest index in a root directory, exiting if no files have been downloaded into it yet.
+
+  Args:
+    root (str): The directory the files are saved into.
+
+  Returns:
+    ManifestIndex: The manifest index.
+  """
+  from manifestindex import ManifestIndex
+
+  if not os.path.exists(f"{root}/.manifest.db"):
+    print(f"No manifest index in {root}. Download the files first.")
+    sys.exit(1)
+  return ManifestIndex(f"{root}/.manifest.db")
+
+def _printEntries(entries : list[dict], asJson : bool):
+  """Prints the records of files from the manifest index.
+
+  Args:
+    entries (list[dict]): The records of the files.
+    asJson (bool): Whether to print the records as JSON, one record per line.
+  """
+  from runstats import formatBytes
+
+  for entry in entries:
+    if asJson:
+      print(json.dumps(entry))
+    else:
+      print(f"{entry['id']:>10}  {formatBytes(entry['size'] or 0):>9}  {entry['modified_at']}  {(entry['sha256'] or '-')[:12]:<12}  {entry['local_path']}")
+
+def _find(args : argparse.Namespace):
+  """Runs the `find` command, which looks up downloaded files in the manifest index by their Canvas file IDs.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  with _openIndex(args.root) as index:
+    entries = [index.find(id) for id in args.ids]
+  missing = [id for id, entry in zip(args.ids, entries) if entry is None]
+  _printEntries([entry for entry in entries if entry is not None], args.json)
+  for id in missing:
+    print(f"File ID {id} has not been downloaded", file=sys.stderr)
+  if len(missing) > 0:
+    sys.exit(1)
+
+def _search(args : argparse.Namespace):
+  """Runs the `search` command, which searches the manifest index for downloaded files by name or path.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  with _openIndex(args.root) as index:
+    _printEntries(index.search(args.pattern, args.course, args.limit), args.json)
+
+def _batch(args : argparse.Namespace):
+  """Runs the `batch` command, which downloads the files of all the accounts in a batch manifest in parallel.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  from batch import BatchAccount, BatchRunner, summarise
+
+  try:
+    accounts = BatchAccount.fromManifest(args.manifest)
+  except (OSError, ValueError) as e:
+    sys.exit(f"Could not load the batch manifest! {e}")
+
+  def onResult(result):
+    print(f"{'Failed' if result.error else 'Finished'} {result.name} in {result.duration:.1f}s")
+
+  print(f"Running {len(accounts)} accounts...")
+  results = BatchRunner(accounts, args.workers, args.per_host).run(onResult)
+  print()
+  print(summarise(results))
+
+  if args.summary is not None:
+    with open(args.summary, "w") as f:
+      json.dump([
+        { "name": result.name, "host": result.host, "duration": result.duration, "error": result.error, **result.stats.toDict() }
+        for result in results
+      ], f, indent=2)
+
+def _cacheServer(args : argparse.Namespace):
+  """Runs the `cache-server` command, which serves the files of a Canvas installation to the downloaders at an
+  institution from a shared file cache.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+  """
+  from filecache import CacheServer, FileCache
+
+  try:
+    cache = FileCache(args.cache_root, parseSize(args.max_size))
+  except (OSError, ValueError) as e:
+    sys.exit(f"Could not open the file cache! {e}")
+  server = CacheServer(cache, args.url, args.host, args.port, args.transport)
+  print(f"Caching the files of {server.canvasUrl} in {args.cache_root} ({cache.size} of {cache.maxBytes} bytes used)")
+  print(f"Serving on port {args.port}. Download with --cache http://<this host>:{args.port}. Press Ctrl+C to stop.")
+  try:
+    server.serveForever()
+  except KeyboardInterrupt:
+    pass
+
+def _addDownloaderArguments(parser : argparse.ArgumentParser, root : str, canvasUrl : str, canvasToken : str):
+  """Adds the options to create a downloader with to a command's argument parser.
+
+  Args:
+    parser (argparse.ArgumentParser): The command's argument parser.
+    root (str): The default root directory to save the files into.
+    canvasUrl (str): The default Canvas URL.
+    canvasToken (str): The default Canvas token.
+  """
+  parser.add_argument("--url", default=canvasUrl, required=canvasUrl is None, help="the Canvas URL (defaults to $CANVAS_URL)")
+  parser.add_argument("--token", default=canvasToken, required=canvasToken is None, help="the Canvas token (defaults to $CANVAS_TOKEN)")
+  parser.add_argument("--root", default=root, required=root is None, help="the directory to save the files into (defaults to $SAVE_TO)")
+  parser.add_argument("--courses", nargs="*", default=[], metavar="CODE", help="the course codes to download (defaults to all courses)")
+  parser.add_argument("--order", choices=DownloadQueue.POLICIES.keys(), default="api", help="the order to download the files in")
+  parser.add_argument("--limit", default="", metavar="SPEC",
+    help="the bandwidth limit, e.g. '500K' or '09:00-17:00=500K, 5M'. Type 'limit <SPEC>' while downloading to change it")
+  parser.add_argument("--include", action="append", default=[], metavar="RULE", help="only download the items matching this filter rule, e.g. 'ext:pdf'")
+  parser.add_argument("--exclude", action="append", default=[], metavar="RULE", help="skip the items matching this filter rule, e.g. 'folder:/Videos'")
+  parser.add_argument("--rules-file", default=None, metavar="FILE", help="load filter rules from this file, one rule per line")
+  parser.add_argument("--enrollment-state", choices=[state for state in CourseScope.ENROLLMENT_STATES if state != ""], default="",
+    help="only list courses where your enrollment is in this state")
+  parser.add_argument("--state", action="append", choices=CourseScope.COURSE_STATES, default=None,
+    help="only list courses in this state (can be given more than once)")
+  parser.add_argument("--term", default="", help="only list courses in the term with this ID, or whose name contains this text")
+  parser.add_argument("--favourites", action="store_true", help="only list your favourite courses")
+  parser.add_argument("--segments", type=int, default=1, help="download large files in this many parallel segments")
+  parser.add_argument("--segment-threshold", default="64M", metavar="SIZE", help="the minimum size of a file to download in segments")
+  parser.add_argument("--listing", choices=Downloader.LISTING_BACKENDS.keys(), default="rest",
+    help="list the folders and files with the REST API, or in bulk with the GraphQL API (experimental, see README)")
+  parser.add_argument("--transport", choices=TRANSPORTS.keys(), default="http1",
+    help="send the requests over pooled HTTP/1.1 connections, or multiplexed over HTTP/2 (requires httpx[http2])")
+  parser.add_argument("--concurrency", type=int, default=None, metavar="N",
+    help="send up to this many listing and download requests at a time (default: 8 with --transport http2, 1 otherwise)")
+  parser.add_argument("--storage", default="local", metavar="SINK",
+    help="save the files as separate files ('local'), into an archive per course ('tar' or 'zip'), or into an object store ('s3://BUCKET/PREFIX', requires boto3)")
+  parser.add_argument("--s3-endpoint", default=None, metavar="URL", help="the endpoint of an S3-compatible object store other than AWS")
+  parser.add_argument("--cache", default=None, metavar="URL", help="download the files through a shared file cache (see the cache-server command)")
+
+def _buildParser(root : str, canvasUrl : str, canvasToken : str) -> argparse.ArgumentParser:
+  """Builds the command line argument parser.
+
+  Args:
+    root (str): The default root directory to save the files into.
+    canvasUrl (str): The default Canvas URL.
+    canvasToken (str): The default Canvas token.
+
+  Returns:
+    argparse.ArgumentParser: The command line argument parser.
+  """
+  parser = argparse.ArgumentParser(prog="main.py", description="Downloads files from Canvas. Runs the GUI if no command is given.")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+
+  downloadParser = subparsers.add_parser("download", help="download the files from Canvas")
+  _addDownloaderArguments(downloadParser, root, canvasUrl, canvasToken)
+  downloadParser.add_argument("--initial-sync", action="store_true",
+    help="download the new files of courses with many new files as a single zip file exported by Canvas, instead of one by one")
+  downloadParser.set_defaults(handler=_download)
+
+  verifyParser = subparsers.add_parser("verify", help="check the downloaded files and download missing, changed or corrupt files again")
+  _addDownloaderArguments(verifyParser, root, canvasUrl, canvasToken)
+  verifyParser.add_argument("--no-repair", action="store_true", help="only report the problems, without downloading any files")
+  verifyParser.add_argument("--workers", type=int, default=None, help="the number of processes to hash the files with (defaults to the number of CPUs)")
+  verifyParser.set_defaults(handler=_verify)
+
+  historyParser = subparsers.add_parser("history", help="show the statistics of the previous runs")
+  historyParser.add_argument("--root", default=root, required=root is None, help="the directory the files are saved into (defaults to $SAVE_TO)")
+  historyParser.add_argument("--limit", type=int, default=20, help="the number of most recent runs to show")
+  historyParser.add_argument("--details", action="store_true", help="show the phase durations and slowest requests of each run")
+  historyParser.set_defaults(handler=_history)
+
+  findParser = subparsers.add_parser("find", help="show where downloaded files are saved, by their Canvas file IDs")
+  findParser.add_argument("ids", nargs="+", type=int, metavar="ID", help="the Canvas file IDs")
+  findParser.add_argument("--root", default=root, required=root is None, help="the directory the files are saved into (defaults to $SAVE_TO)")
+  findParser.add_argument("--json", action="store_true", help="print the files as JSON, one per line")
+  findParser.set_defaults(handler=_find)
+
+  searchParser = subparsers.add_parser("search", help="search the downloaded files by name or path")
+  searchParser.add_argument("pattern", help="text the name or path contains, or a glob pattern such as '*.pdf' (case-insensitive)")
+  searchParser.add_argument("--root", default=root, required=root is None, help="the directory the files are saved into (defaults to $SAVE_TO)")
+  searchParser.add_argument("--course", default=None, metavar="CODE", help="only search the files of this course")
+  searchParser.add_argument("--limit", type=int, default=50, help="the maximum number of files to show")
+  searchParser.add_argument("--json", action="store_true", help="print the files as JSON, one per line")
+  searchParser.set_defaults(handler=_search)
+
+  batchParser = subparsers.add_parser("batch", help="download the files of many accounts in parallel")
+  batchParser.add_argument("manifest", help="the JSON manifest of the accounts to download (see batch.py)")
+  batchParser.add_argument("--workers", type=int, default=None, help="the number of worker processes (defaults to the number of CPUs)")
+  batchParser.add_argument("--per-host", type=int, default=2, help="the maximum number of accounts downloading from one Canvas host at a time")
+  batchParser.add_argument("--summary", default=None, metavar="FILE", help="save the summary as JSON into this file")
+  batchParser.set_defaults(handler=_batch)
+
+  cacheParser = subparsers.add_parser("cache-server", help="serve the files of a Canvas installation to the downloaders at an institution from a shared cache")
+  cacheParser.add_argument("--url", default=canvasUrl, required=canvasUrl is None, help="the Canvas URL (defaults to $CANVAS_URL)")
+  cacheParser.add_argument("--cache-root", default=".cache", metavar="DIR", help="the directory to store the cached files in")
+  cacheParser.add_argument("--max-size", default="10G", metavar="SIZE", help="the maximum size of the cache, e.g. '50G'")
+  cacheParser.add_argument("--host", default="0.0.0.0", help="the address to listen on (defaults to all addresses)")
+  cacheParser.add_argument("--port", type=int, default=8765, help="the port to listen on")
+  cacheParser.add_argument("--transport", choices=TRANSPORTS.keys(), default="http1", help="the HTTP transport to fetch the files from Canvas with")
+  cacheParser.set_defaults(handler=_cacheServer)
+
+  return parser
+
+def runCli(argv : list[str], root : str = None, canvasUrl : str = None, canvasToken : str = None):
+  """Runs the command line interface of the application.
+
+  Args:
+    argv (list[str]): The command line arguments, excluding the program name.
+    root (str, optional): The default root directory to save the files into. Defaults to None.
+    canvasUrl (str, optional): The default Canvas URL. Defaults to None.
+    canvasToken (str, optional): The default Canvas token. Defaults to None.
+  """
+  args = _buildParser(root, canvasUrl, canvasToken).parse_args(argv)
+  args.handler(args)
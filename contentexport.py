@@ -0,0 +1,111 @@
+"""A module that encapsulates the export of a course's files into a single zip file with the Canvas content exports
+API (https://canvas.instructure.com/doc/api/content_exports.html), which the initial sync of a course downloads
+instead of downloading each file separately.
+
+An export is requested with `POST /courses/:id/content_exports` with `export_type=zip`, selecting the files to
+export, and Canvas builds the zip file in the background. The export is polled until it is `exported` (its progress
+is read from its `progress_url`), and the zip file is then downloaded from the export's `attachment`. The entries of
+the zip file are paths within the course's files (e.g. `Lectures/week1.pdf`), without the `course files` root folder.
+"""
+
+import posixpath
+import time
+
+from filemodels import File, Folder
+from transport import decodeJson
+
+class ContentExportError(Exception):
+  """Raised when a course's files cannot be exported."""
+
+class ContentExporter:
+  """Exports the files of courses into zip files with the Canvas content exports API."""
+
+  # the first interval between polls of an export, in seconds, which grows up to `MAX_POLL_INTERVAL`
+  POLL_INTERVAL = 1.0
+  MAX_POLL_INTERVAL = 10.0
+
+  # the maximum time to wait for an export, in seconds
+  TIMEOUT = 60 * 60
+
+  def __init__(self, fetch, post, wait = time.sleep):
+    """Creates a content exporter.
+
+    Args:
+      fetch (Callable[[str], requests.Response]): Sends a `GET` request to a path within the Canvas API.
+      post (Callable[[str, dict], requests.Response]): Sends a `POST` request with a JSON body to a path within the
+      Canvas API.
+      wait (Callable[[float], None], optional): Waits between polls for the given number of seconds. It may raise
+      to stop waiting for the export (e.g. when the run is cancelled). Defaults to `time.sleep`.
+    """
+    self._fetch = fetch
+    self._post = post
+    self._wait = wait
+
+  def export(self, courseId : int, fileIds : list[int], onProgress = None) -> str:
+    """Exports files of a course into a zip file, and waits for the export to complete.
+
+    Args:
+      courseId (int): The course ID.
+      fileIds (list[int]): The IDs of the files to export.
+      onProgress (Callable[[int], None], optional): Called with the completion of the export (from 0 to 100)
+      whenever it changes. Defaults to None.
+
+    Raises:
+      ContentExportError: If the export cannot be requested, fails or times out.
+
+    Returns:
+      str: The URL to download the zip file from.
+    """
+    response = self._post(f"courses/{courseId}/content_exports", {
+      "export_type": "zip",
+      "skip_notifications": True,
+      "select": { "files": [str(id) for id in fileIds] },
+    })
+    if response.status_code not in [200, 201]:
+      raise ContentExportError(f"HTTP status: {response.status_code}")
+    export = decodeJson(response.content)
+
+    interval = ContentExporter.POLL_INTERVAL
+    deadline = time.monotonic() + ContentExporter.TIMEOUT
+    completion = None
+    while export.get("workflow_state") not in ["exported", "failed"]:
+      if time.monotonic() > deadline:
+        raise ContentExportError("Timed out waiting for the export")
+      self._wait(interval)
+      interval = min(interval * 1.5, ContentExporter.MAX_POLL_INTERVAL)
+      if onProgress is not None and export.get("progress_url"):
+        progress = self._get(export["progress_url"].split("/api/v1/", 1)[-1])
+        if progress.get("completion") is not None and progress["completion"] != completion:
+          completion = progress["completion"]
+          onProgress(int(completion))
+      export = self._get(f"courses/{courseId}/content_exports/{export['id']}")
+
+    if export["workflow_state"] == "failed":
+      raise ContentExportError("The export failed on Canvas")
+    url = (export.get("attachment") or {}).get("url")
+    if url is None:
+      raise ContentExportError("The export has no zip file")
+    return url
+
+  def _get(self, apiPath : str) -> dict:
+    """Sends a `GET` request to a path within the Canvas API, and returns its JSON body.
+
+    Raises:
+      ContentExportError: If the request fails.
+    """
+    response = self._fetch(apiPath)
+    if response.status_code != 200:
+      raise ContentExportError(f"HTTP status: {response.status_code}")
+    return decodeJson(response.content)
+
+def entryName(folder : Folder, file : File) -> str:
+  """Returns the name of a file's entry in the zip file of a course's export.
+
+  Args:
+    folder (Folder): The folder of the file.
+    file (File): The file.
+
+  Returns:
+    str: The path of the entry in the zip file (e.g. `Lectures/week1.pdf`).
+  """
+  return posixpath.join(folder.getPath().lstrip("/"), file.display_name)
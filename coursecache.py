@@ -0,0 +1,76 @@
+"""A module that encapsulates the cache of the course list fetched from the Canvas API, which is kept in memory
+and in a locally-stored cache file (`.courses`).
+"""
+
+import hashlib
+import json
+import time
+
+from filemodels import Course
+
+class CourseCache:
+  """A cache of the course lists fetched from the Canvas API, one for each Canvas URL and token."""
+
+  def __init__(self, cacheLocation : str = ".courses"):
+    """Creates a course cache, loading the cached course lists from the cache file if it exists.
+
+    Args:
+      cacheLocation (str, optional): The location of the cache file. Defaults to ".courses".
+    """
+    self.cacheLocation = cacheLocation
+    try:
+      with open(cacheLocation, "r") as f:
+        self._entries = json.load(f)
+    except (OSError, ValueError):
+      self._entries = {}
+
+  @staticmethod
+  def _key(canvasUrl : str, canvasToken : str, scope : str) -> str:
+    """Returns the cache key for a Canvas URL, token and course scope. The token is hashed so that it is not stored
+    in the cache file.
+
+    Args:
+      canvasUrl (str): The Canvas URL.
+      canvasToken (str): The Canvas token.
+      scope (str): The key of the course scope (see `CourseScope.key`).
+
+    Returns:
+      str: The cache key.
+    """
+    return f"{canvasUrl} {hashlib.sha256(canvasToken.encode()).hexdigest()[:16]} {scope}"
+
+  def get(self, canvasUrl : str, canvasToken : str, scope : str = "") -> tuple[list[Course], float]:
+    """Gets the cached course list for a Canvas URL, token and course scope.
+
+    Args:
+      canvasUrl (str): The Canvas URL.
+      canvasToken (str): The Canvas token.
+      scope (str, optional): The key of the course scope. Defaults to "".
+
+    Returns:
+      tuple[list[Course], float]: The cached course list and the time it was fetched at, or (None, None) if the
+      course list is not cached.
+    """
+    entry = self._entries.get(CourseCache._key(canvasUrl, canvasToken, scope))
+    if entry is None:
+      return None, None
+    return Course.fromApiArray(entry["courses"]), entry["fetchedAt"]
+
+  def put(self, canvasUrl : str, canvasToken : str, courses : list[Course], scope : str = ""):
+    """Caches the course list for a Canvas URL, token and course scope, and saves the cache into the cache file.
+
+    Args:
+      canvasUrl (str): The Canvas URL.
+      canvasToken (str): The Canvas token.
+      courses (list[Course]): The course list fetched from the Canvas API.
+      scope (str, optional): The key of the course scope. Defaults to "".
+    """
+    self._entries[CourseCache._key(canvasUrl, canvasToken, scope)] = {
+      "fetchedAt": time.time(),
+      "courses": [course.toDict() for course in courses],
+    }
+    try:
+      with open(self.cacheLocation, "w") as f:
+        json.dump(self._entries, f)
+    except OSError:
+      print("Could not save the course cache!")
@@ -0,0 +1,90 @@
+"""A module containing the course scope, which narrows down the courses listed from the Canvas API on the
+server side, so that concluded or irrelevant courses are not crawled.
+"""
+
+from filemodels import Course
+
+class CourseScope:
+  """The scope of the courses to list from the Canvas API."""
+
+  ENROLLMENT_STATES = {
+    "": "All enrollments",
+    "active": "Active enrollments",
+    "completed": "Completed enrollments",
+    "invited_or_pending": "Invited or pending enrollments",
+  }
+
+  COURSE_STATES = ["available", "completed", "unpublished", "deleted"]
+
+  def __init__(self, enrollmentState : str = "", courseStates : list[str] = None, term : str = "", favouritesOnly : bool = False):
+    """Creates a course scope. The default scope includes all the user's courses.
+
+    Args:
+      enrollmentState (str, optional): Only list courses where the user's enrollment is in this state, one of the
+      keys of `CourseScope.ENROLLMENT_STATES`. Defaults to "", which means any state.
+      courseStates (list[str], optional): Only list courses in these workflow states (from `CourseScope.COURSE_STATES`).
+      Defaults to None, which means the Canvas API default.
+      term (str, optional): Only list courses in the enrollment term with this ID, or whose name contains this text
+      (case-insensitive). Defaults to "", which means any term.
+      favouritesOnly (bool, optional): Only list the user's favourite courses. Defaults to False.
+
+    Raises:
+      ValueError: If the enrollment state or a course state is invalid.
+    """
+    if enrollmentState not in CourseScope.ENROLLMENT_STATES:
+      raise ValueError(f"Invalid enrollment state: {enrollmentState}")
+    for courseState in (courseStates or []):
+      if courseState not in CourseScope.COURSE_STATES:
+        raise ValueError(f"Invalid course state: {courseState}")
+    self.enrollmentState = enrollmentState
+    self.courseStates = courseStates if courseStates is not None else []
+    self.term = term.strip()
+    self.favouritesOnly = favouritesOnly
+
+  def apiParams(self) -> dict:
+    """Returns the query parameters to list the user's courses (`courses`) in the scope with. Favourite courses are
+    listed from the user's courses too (and checked with `includes`), since the favourite courses API ignores the
+    enrollment state, course states and term.
+
+    Returns:
+      dict: The query parameters for the Canvas API request.
+    """
+    params = {}
+    if self.enrollmentState != "":
+      params["enrollment_state"] = self.enrollmentState
+    if len(self.courseStates) > 0:
+      params["state[]"] = self.courseStates
+    includes = []
+    if self.term != "":
+      includes.append("term")
+    if self.favouritesOnly:
+      includes.append("favorites")
+    if len(includes) > 0:
+      params["include[]"] = includes
+    return params
+
+  def includes(self, course : Course) -> bool:
+    """Checks whether a course listed from the Canvas API is within the scope. The Canvas API cannot filter the
+    user's courses by term or by whether they are favourites, so these are checked on the listed courses.
+
+    Args:
+      course (Course): The course to check.
+
+    Returns:
+      bool: True if the course is within the scope, False otherwise.
+    """
+    if self.favouritesOnly and not course.is_favorite:
+      return False
+    if self.term == "":
+      return True
+    if course.term is None:
+      return False
+    return str(course.term.get("id")) == self.term or self.term.lower() in str(course.term.get("name", "")).lower()
+
+  def key(self) -> str:
+    """Returns a string identifying the scope, to cache the course list of the scope with.
+
+    Returns:
+      str: The string identifying the scope.
+    """
+    return f"courses{' favourites' if self.favouritesOnly else ''} {self.enrollmentState} {','.join(sorted(self.courseStates))} {self.term}"
@@ -1,13 +1,34 @@
 """A module that encapsulates the Canvas file downloader capability.
 """
 
-import requests
+import hashlib
 import pathlib
+import posixpath
+import tempfile
+import time
+import threading
 import tkinter as tk
 import os
-
-from richtext import RichText
-from filemodels import Course, File, FileLog, Folder
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
+
+from RichText import RichText
+from filemodels import Course, File, FileLog, Folder, CHUNK_SIZE, SEGMENT_THRESHOLD
+from downloadqueue import DownloadQueue, DownloadTask
+from ratelimit import TokenBucket
+from runstats import RunStats
+from filters import FilterEngine
+from coursescope import CourseScope
+from integrity import hashFile, hashFiles
+from checkpoint import CrawlCheckpoint
+from graphqllisting import GraphQLListing, GraphQLSchemaError
+from contentexport import ContentExporter, entryName
+from transport import API_HEADERS, Transport, createTransport, decodeJson
+from storage import StorageSink, createSink
+
+if TYPE_CHECKING:
+  import requests
 
 os.system("")
 
@@ -24,10 +45,38 @@ class color:
   UNDERLINE = '\033[4m'
   END = '\033[0m'
 
+class RunCancelled(Exception):
+  """Raised within a run of the downloader when the run is cancelled."""
+
+class CanvasAPIError(Exception):
+  """Raised when a Canvas API request does not succeed."""
+
+  def __init__(self, statusCode : int):
+    """Creates a Canvas API error.
+
+    Args:
+      statusCode (int): The HTTP status of the response.
+    """
+    super().__init__(f"HTTP status: {statusCode}")
+    self.statusCode = statusCode
+
 class Downloader:
   """A class representing a Canvas file downloader."""
 
-  def __init__(self, root : str, canvasUrl : str, canvasToken : str, filters : list[str], displayWindow : tk.Tk = None, displayArea : RichText = None):
+  # the number of files downloaded between saves of the file log, so that an interrupted run loses little progress
+  LOG_SAVE_INTERVAL = 25
+
+  # the minimum number of new files in a course for the initial sync to export the course instead of downloading the
+  # files one by one, since an export takes a while for Canvas to prepare
+  EXPORT_MIN_FILES = 20
+
+  # the backends the folders and files can be listed with
+  LISTING_BACKENDS = {
+    "rest": "REST API (one request per folder)",
+    "graphql": "GraphQL API (experimental, one request per page of files in a course)",
+  }
+
+  def __init__(self, root : str, canvasUrl : str, canvasToken : str, filters : list[str], displayWindow : tk.Tk = None, displayArea : RichText = None, downloadOrder : str = "api", bandwidthLimit : str = "", rules : list[str] = None, courseScope : CourseScope = None, segments : int = 1, segmentThreshold : int = SEGMENT_THRESHOLD, listingBackend : str = "rest", progressListener = None, transport : str = "http1", storage : str = "local", storageEndpoint : str = None, cacheUrl : str = None, initialSync : bool = False, concurrency : int = None):
     """Creates a Canvas file downloader object.
 
     Args:
@@ -37,6 +86,40 @@ class Downloader:
       filters (list[str]): The list of course codes to download. If left empty, downloads all courses.
       displayWindow (tk.Tk, optional): The display window for the GUI. Defaults to None.
       displayArea (RichText, optional): The display text area GUI to display the download status onto. Defaults to None.
+      downloadOrder (str, optional): The download order policy, one of the keys of `DownloadQueue.POLICIES`.
+      Defaults to "api".
+      bandwidthLimit (str, optional): The bandwidth limit specification, as described in the `ratelimit` module.
+      Defaults to "", which means no limit.
+      rules (list[str], optional): The include/exclude filter rules for courses, folders and files, as described in
+      the `filters` module. Defaults to None, which means no rules.
+      courseScope (CourseScope, optional): The scope of the courses to list from the Canvas API. Defaults to None,
+      which means all the user's courses.
+      segments (int, optional): The number of segments to split large files into, which are downloaded in parallel.
+      Defaults to 1, which means files are never split.
+      segmentThreshold (int, optional): The minimum size of a file, in bytes, to split it into segments.
+      Defaults to `SEGMENT_THRESHOLD`.
+      listingBackend (str, optional): The backend to list the folders and files with, one of the keys of
+      `Downloader.LISTING_BACKENDS`. Courses are always listed with the REST API. Defaults to "rest".
+      progressListener (Callable[[str, dict], None], optional): Called from the download thread with each progress
+      event and its details: `plan` when the courses start being listed, `folder` (with `course` and `folder`) for
+      each listed folder with the files to download, and `file` (with `id` and `status`) when the status of a file
+      changes. The statuses are `downloading`, `added`, `updated`, `moved`, `skipped`, `conflict` and `failed`, and `verified`,
+      `missing`, `changed` and `corrupt` when verifying. Defaults to None.
+      transport (str, optional): The HTTP transport to send the requests with, one of the keys of
+      `transport.TRANSPORTS`. Defaults to "http1".
+      storage (str, optional): The storage sink to save the files into, `local`, `tar`, `zip` or
+      `s3://bucket/prefix`, as described in the `storage` module. Defaults to "local".
+      storageEndpoint (str, optional): The endpoint of the object store for `s3://` storage, for S3-compatible
+      stores other than AWS. Defaults to None.
+      cacheUrl (str, optional): The URL of a shared file cache service to download the files through, as described
+      in the `filecache` module. Defaults to None, which means the files are downloaded from Canvas.
+      initialSync (bool, optional): Whether to export the new files of each course with at least
+      `Downloader.EXPORT_MIN_FILES` new files into a zip file with the Canvas content exports API, and unpack it
+      instead of downloading the files one by one. Defaults to False.
+      concurrency (int, optional): The number of requests in flight at a time when listing the files of a course's
+      folders and when downloading files. Files are still started in the download order. Defaults to None, which
+      means 8 with the http2 transport, whose concurrent requests are multiplexed over a single connection, and 1
+      (one request at a time) with the http1 transport.
     """
     self.root = root
     self.canvasUrl = canvasUrl
@@ -44,18 +127,99 @@ class Downloader:
     self.filters = filters
     self.displayWindow = displayWindow
     self.displayArea = displayArea
+    self.downloadOrder = downloadOrder
+    self.rateLimiter = TokenBucket(bandwidthLimit)
+    self.rules = rules if rules is not None else []
+    self.courseScope = courseScope if courseScope is not None else CourseScope()
+    self.segments = segments
+    self.segmentThreshold = segmentThreshold
+    self.listingBackend = listingBackend
+    self.progressListener = progressListener
+    # the transport is created on first use, so that the HTTP packages are not loaded until they are needed
+    self.transportName = transport
+    self._transport : Transport = None
+    self.storage = storage
+    self.storageEndpoint = storageEndpoint
+    self.cacheUrl = cacheUrl
+    self.initialSync = initialSync
+    self.concurrency = max(1, concurrency if concurrency is not None else 8 if transport == "http2" else 1)
+    self._graphqlListing = GraphQLListing(self.fetchCanvasGraphQL)
+    self.stats = RunStats()
+    self._fetchFailures = 0
+    # the status lines of concurrent requests are printed one at a time
+    self._printLock = threading.Lock()
+    # the run continues while `_running` is set, and stops at the next file or folder once `_cancelled` is set
+    self._running = threading.Event()
+    self._running.set()
+    self._cancelled = threading.Event()
+
+  @property
+  def transport(self) -> Transport:
+    """The HTTP transport the requests are sent with, created on first use."""
+    if self._transport is None:
+      self._transport = createTransport(self.transportName)
+    return self._transport
+
+  @transport.setter
+  def transport(self, transport : Transport):
+    self._transport = transport
+
+  def pause(self):
+    """Pauses the current run before the next folder is listed or the next file is downloaded."""
+    self._running.clear()
+
+  def resume(self):
+    """Resumes the current run if it is paused."""
+    self._running.set()
+
+  def cancel(self):
+    """Cancels the current run before the next folder is listed or the next file is downloaded. The progress of the
+    run is saved, so that the next run continues from where the run stopped.
+    """
+    self._cancelled.set()
+    self._running.set()
 
-  def _isFilterEmpty(self):
-    """Checks whether the course filters are left blank. If so, all courses should be downloaded.
+  def isPaused(self) -> bool:
+    """Checks whether the current run is paused.
 
     Returns:
-      bool: True if course filters are blank, False otherwise.
+      bool: True if the run is paused, False otherwise.
+    """
+    return not self._running.is_set()
+
+  def _emit(self, event : str, **details):
+    """Sends a progress event to the progress listener, if any.
+
+    Args:
+      event (str): The progress event, as described in `__init__`.
+      **details: The details of the event.
     """
+    if self.progressListener is not None:
+      self.progressListener(event, details)
 
-    # remove all filters that are whitespace
-    processedFilters = list(filter(lambda x : x.strip() != '', self.filters))
+  def _wait(self, seconds : float):
+    """Waits for a number of seconds, or until the run is cancelled.
+
+    Args:
+      seconds (float): The number of seconds to wait.
+
+    Raises:
+      RunCancelled: If the run is cancelled.
+    """
+    self._cancelled.wait(seconds)
+    self._checkInterrupt()
 
-    return (len(processedFilters) == 0)
+  def _checkInterrupt(self):
+    """Blocks while the run is paused, and stops the run if it has been cancelled.
+
+    Raises:
+      RunCancelled: If the run has been cancelled.
+    """
+    if not self._running.is_set():
+      self._print(f"{color.YELLOW}Paused{color.END}")
+      self._running.wait()
+    if self._cancelled.is_set():
+      raise RunCancelled()
 
   def _print(self, content : str = ""):
     """Prints a status line regarding the Canvas file download process in the console as well as in the
@@ -65,6 +229,11 @@ class Downloader:
     Args:
       content (str, optional): The content to be displayed. Defaults to "".
     """
+    with self._printLock:
+      self._printLine(content)
+
+  def _printLine(self, content : str):
+    """Prints a status line, as described in `_print`. Must be called with the print lock held."""
     print(content)
     if self.displayWindow != None and self.displayArea != None:
       if content.startswith(color.BOLD + color.UNDERLINE) or content.startswith(color.UNDERLINE + color.BOLD):
@@ -86,66 +255,232 @@ class Downloader:
       self.displayArea.see("end")
       self.displayWindow.update_idletasks()
 
-  def loadFiles(self) -> list[Course]:
+  def loadFiles(self, checkpoint : CrawlCheckpoint = None) -> list[Course]:
     """Gets the courses and files and organises the files to download as a list of Course
     objects loaded with all the folders and files to download.
 
+    Args:
+      checkpoint (CrawlCheckpoint, optional): The crawl checkpoint to record the listed courses, folders and files
+      in. Anything already in the checkpoint is not listed from Canvas again. Defaults to None, which means
+      everything is listed from Canvas.
+
+    Raises:
+      RunCancelled: If the run is cancelled.
+
     Returns:
       list[Course]: The list of courses, containing folder and file objects that can be
       processed for download.
     """
     self._print(color.UNDERLINE + color.BOLD + f"Retrieving files from courses:" + color.END)
     self._print()
+    checkpoint = checkpoint if checkpoint is not None else CrawlCheckpoint()
+    if checkpoint.resumed:
+      self._print(f"{color.YELLOW}Resuming from the checkpoint of an interrupted run{color.END}")
+      self._print()
     courseListWithFiles : list[Course] = []
-    for course in self.fetchCourses():
-      if course.course_code in self.filters or self._isFilterEmpty():
+    filterEngine = FilterEngine(self.rules, self.filters)
+    self._emit("plan")
+    courses = self._fetchOnce(checkpoint.courses, self.fetchCourses, checkpoint.recordCourses)
+    for course in courses:
+      if filterEngine.includeCourse(course):
         self._print(color.BOLD + f"Course: {course.name} ({course.course_code})" + color.END)
         foldersArray : list[Folder] = []
-        for folder in self.getCourseFolders(course.id):
+        folders = self._fetchOnce(
+          checkpoint.folders.get(course.id),
+          lambda : self.getCourseFolders(course.id),
+          lambda folders : checkpoint.recordFolders(course.id, folders))
+        skippedFolders = { folder.id for folder in folders if not filterEngine.includeFolder(folder.getPath()) }
+        # the files of the skipped folders may have been listed together with the course's folders
+        self._graphqlListing.discardFiles(skippedFolders)
+
+        def listFiles(folder : Folder) -> list[File]:
+          self._checkInterrupt()
+          return self._fetchOnce(
+            checkpoint.files.get(folder.id),
+            lambda : self.getFilesFromFolder(folder.id),
+            lambda files : checkpoint.recordFiles(folder.id, files))
+
+        # the folders' files are listed concurrently, and taken in the order of the folders
+        listedFiles = self._mapConcurrently(listFiles, [folder for folder in folders if folder.id not in skippedFolders])
+        for folder in folders:
           courseFolderName = folder.getPath()
-          filesInFolder = self.getFilesFromFolder(folder.id)
+          if folder.id in skippedFolders:
+            self._print(f"{color.YELLOW}{folder.id} {courseFolderName} (skipped by filter rules){color.END}")
+            continue
+          files = next(listedFiles)
+          filesInFolder = list(filter(filterEngine.includeFile, files))
           self._print(f"{folder.id} {courseFolderName}")
           foldersArray.append(folder.withFiles(filesInFolder))
+          self._emit("folder", course=course, folder=foldersArray[-1])
         self._print()
         courseListWithFiles.append(course.withFolders(foldersArray))
     return courseListWithFiles
 
-  def fetchCanvasAPI(self, apiPath : str) -> requests.Response:
+  def _mapConcurrently(self, function, items : list):
+    """Calls a function on each item, with up to `concurrency` calls in progress at a time.
+
+    Args:
+      function (Callable): The function to call on each item.
+      items (list): The items.
+
+    Yields:
+      The result of each call, in the order of the items.
+    """
+    if self.concurrency <= 1 or len(items) <= 1:
+      yield from map(function, items)
+      return
+    executor = ThreadPoolExecutor(max_workers=self.concurrency)
+    try:
+      yield from executor.map(function, items)
+    finally:
+      executor.shutdown(cancel_futures=True)
+
+  def _fetchOnce(self, listed : list, fetch, record) -> list:
+    """Returns the items already listed in the crawl checkpoint, or fetches them from Canvas and records them in the
+    checkpoint if they have not been listed yet. Items are not recorded if fetching them failed, so that they are
+    fetched again by the next run.
+
+    Args:
+      listed (list): The items in the checkpoint, or None if they have not been listed yet.
+      fetch (Callable[[], list]): Fetches the items from Canvas.
+      record (Callable[[list], None]): Records the fetched items in the checkpoint.
+
+    Returns:
+      list: The items.
+    """
+    if listed is not None:
+      return listed
+    # a failure of a concurrent fetch may also stop the items from being recorded, so they are fetched again next run
+    failures = self._fetchFailures
+    items = fetch()
+    if self._fetchFailures == failures:
+      record(items)
+    return items
+
+  def fetchCanvasAPI(self, apiPath : str, params : dict = None) -> "requests.Response":
     """Sends a `GET` request to a path within the Canvas API given the Canvas token, and returns
     the response received from the Canvas API.
 
     Args:
       apiPath (str): The API path within the Canvas API.
+      params (dict, optional): Additional query parameters for the request. List values are sent as
+      repeated parameters (e.g. `state[]`). Defaults to None.
 
     Returns:
       requests.Response: The response received from the Canvas API request made.
     """
-    fullPath = f"{self.canvasUrl}/api/v1/{apiPath}?per_page=1000&access_token={self.canvasToken}"
-    response = requests.get(
-      fullPath,
-      headers={
-        'Accept': 'application/json'
-      }    
+    response = self._getCanvasAPI(
+      f"{self.canvasUrl}/api/v1/{apiPath}",
+      {
+        'per_page': 1000,
+        'access_token': self.canvasToken,
+        **(params or {})
+      },
+      apiPath
     )
     print(response)
     return response
 
+  def fetchCanvasAPIPages(self, apiPath : str, params : dict = None):
+    """Fetches every page of a paginated Canvas API listing, following the `next` links in the `Link` headers of the
+    responses, and yields the decoded JSON array of each page as soon as it is received.
+
+    Args:
+      apiPath (str): The API path within the Canvas API.
+      params (dict, optional): Additional query parameters for the request. Defaults to None.
+
+    Raises:
+      CanvasAPIError: If a page could not be fetched.
+
+    Yields:
+      list[dict]: The JSON objects in each page of the listing.
+    """
+    response = self.fetchCanvasAPI(apiPath, params)
+    while True:
+      if response.status_code != 200:
+        raise CanvasAPIError(response.status_code)
+      yield decodeJson(response.content)
+      nextUrl = response.links.get("next", {}).get("url")
+      if nextUrl is None:
+        return
+      # the next links repeat the query parameters of the listing, but not always the token
+      response = self._getCanvasAPI(nextUrl, None if "access_token=" in nextUrl else { 'access_token': self.canvasToken }, apiPath)
+
+  def _getCanvasAPI(self, url : str, params : dict, description : str) -> "requests.Response":
+    """Sends a `GET` request to a Canvas API URL, recording it in the run statistics.
+
+    Args:
+      url (str): The full URL of the request.
+      params (dict): The query parameters of the request.
+      description (str): The description of the request in the run statistics.
+
+    Returns:
+      requests.Response: The response received from the Canvas API.
+    """
+    start = time.monotonic()
+    response = self.transport.get(url, params=params, headers=API_HEADERS)
+    self.stats.recordRequest(description, time.monotonic() - start)
+    return response
+
+  def fetchCanvasGraphQL(self, query : str, variables : dict = None) -> "requests.Response":
+    """Sends a query to the Canvas GraphQL API given the Canvas token, and returns the response received.
+
+    Args:
+      query (str): The GraphQL query.
+      variables (dict, optional): The variables of the query. Defaults to None.
+
+    Returns:
+      requests.Response: The response received from the Canvas GraphQL API.
+    """
+    start = time.monotonic()
+    response = self.transport.post(
+      f"{self.canvasUrl}/api/graphql",
+      params={ 'access_token': self.canvasToken },
+      json={ 'query': query, 'variables': variables or {} },
+      headers=API_HEADERS
+    )
+    self.stats.recordRequest("graphql", time.monotonic() - start)
+    return response
+
+  def postCanvasAPI(self, apiPath : str, body : dict) -> "requests.Response":
+    """Sends a `POST` request with a JSON body to a path within the Canvas API given the Canvas token, and returns
+    the response received.
+
+    Args:
+      apiPath (str): The API path within the Canvas API.
+      body (dict): The JSON body of the request.
+
+    Returns:
+      requests.Response: The response received from the Canvas API.
+    """
+    start = time.monotonic()
+    response = self.transport.post(
+      f"{self.canvasUrl}/api/v1/{apiPath}",
+      params={ 'access_token': self.canvasToken },
+      json=body,
+      headers=API_HEADERS
+    )
+    self.stats.recordRequest(apiPath, time.monotonic() - start)
+    return response
+
   def fetchCourses(self) -> list[Course]:
-    """Fetches the user's courses as a JSON list.
+    """Fetches the user's courses within the downloader's course scope.
 
     Returns:
-      list: The list of courses by the user, in JSON format.
+      list[Course]: The list of courses by the user.
     """
     try:
-      response = self.fetchCanvasAPI('courses')
-      if response.status_code == 200:
-        text = response.json()
-        return Course.fromApiArray(list(filter(lambda course : 'name' in course.keys() and course['name'] != None, text)))
-      else:
-        self._print(f"Could not fetch courses! HTTP status: {response.status_code}")
-        return []
+      courses = []
+      for page in self.fetchCanvasAPIPages("courses", self.courseScope.apiParams()):
+        courses.extend(course for course in Course.fromApiArray(apiCourse for apiCourse in page if apiCourse.get('name') is not None) if self.courseScope.includes(course))
+      return courses
+    except CanvasAPIError as e:
+      self._print(f"Could not fetch courses! HTTP status: {e.statusCode}")
+      self._fetchFailures += 1
+      return []
     except Exception as e:
       self._print("Failed to fetch! " + str(e))
+      self._fetchFailures += 1
       return []
     
   def getCourseFolders(self, courseId : int) -> list[Folder]:
@@ -157,16 +492,25 @@ class Downloader:
     Returns:
       list: The list of folders in the specific course's files, in JSON format.
     """
+    if self.listingBackend == "graphql" and self._graphqlListing.supported:
+      try:
+        return self._graphqlListing.listFolders(courseId)
+      except GraphQLSchemaError as e:
+        self._print(f"{color.YELLOW}This Canvas instance does not support the GraphQL files listing ({e}), using the REST API for all courses{color.END}")
+      except Exception as e:
+        self._print(f"{color.YELLOW}Could not list course ID {courseId} with GraphQL ({e}), using the REST API{color.END}")
     try:
-      response = self.fetchCanvasAPI(f'courses/{courseId}/folders')
-      if response.status_code == 200:
-        text = response.json()
-        return Folder.fromApiArray(list(text))
-      else:
-        self._print(f"{color.RED}Could not fetch folders from course ID {courseId}{color.END}")
-        return []
+      folders = []
+      for page in self.fetchCanvasAPIPages(f'courses/{courseId}/folders'):
+        folders.extend(Folder.fromApiArray(page))
+      return folders
+    except CanvasAPIError:
+      self._print(f"{color.RED}Could not fetch folders from course ID {courseId}{color.END}")
+      self._fetchFailures += 1
+      return []
     except Exception as e:
       self._print("Failed to fetch! " + str(e))
+      self._fetchFailures += 1
       return []
 
   def getFilesFromFolder(self, folderId : int) -> list[File]:
@@ -178,23 +522,36 @@ class Downloader:
     Returns:
       list: The list of files in the specified folder, in JSON format.
     """
+    if self.listingBackend == "graphql":
+      # the files of the folder are listed together with the course's folders
+      files = self._graphqlListing.takeFiles(folderId)
+      if files is not None:
+        return files
     try:
-      response = self.fetchCanvasAPI(f'folders/{folderId}/files')
-      if response.status_code == 200:
-        text = response.json()
-        return File.fromApiArray(list(text))
-      else:
-        self._print(f"{color.RED}Could not fetch files from folder ID {folderId}{color.END}")
-        return []
+      files = []
+      for page in self.fetchCanvasAPIPages(f'folders/{folderId}/files'):
+        files.extend(File.fromApiArray(page))
+      return files
+    except CanvasAPIError:
+      self._print(f"{color.RED}Could not fetch files from folder ID {folderId}{color.END}")
+      self._fetchFailures += 1
+      return []
     except Exception as e:
       self._print("Failed to fetch! " + str(e))
+      self._fetchFailures += 1
       return []
 
-  def download(self, courseListWithFiles : list[Course]):
+  def download(self, courseListWithFiles : list[Course], forceIds : set[int] = None):
     """Downloads the files within the file list one-by-one, and saves into the folder specified by the root directory.
+    The files are downloaded in the order given by the downloader's download order policy.
 
     Args:
       courseListWithFiles (list): The list of files to download, organised by course and folder as a list of course objects containing the folders and files to download.
+      forceIds (set[int], optional): The IDs of files to download even if the file log shows that they are up to date. Defaults to None.
+
+    Raises:
+      RunCancelled: If the run is cancelled. The file log is saved first, so that the files already downloaded are
+      skipped by the next run.
     """
 
     self._print(color.UNDERLINE + color.BOLD + f"Downloading files:" + color.END)
@@ -202,47 +559,437 @@ class Downloader:
     fileLogLocation = f'{self.root}/.files'
 
     fileLog = FileLog.fromFileLog(fileLogLocation)
+    sink = createSink(self.storage, self.root, self.storageEndpoint)
+    # the index (and `sqlite3`) is only loaded when files are downloaded
+    from manifestindex import ManifestIndex
+    index = ManifestIndex(f'{self.root}/.manifest.db')
+    cache = None
+    if self.cacheUrl:
+      from filecache import CacheClient
+      cache = CacheClient(self.cacheUrl, self.canvasToken)
+    downloadQueue = DownloadQueue(self.downloadOrder, self.filters)
+    forceIds = forceIds if forceIds is not None else set()
 
     for course in courseListWithFiles:
-      folders = course.folders
-      courseNameUsed = course.course_code.replace('/', '')
-      
+      for folder in course.folders:
+        sink.makeFolder(self._relativeFolder(course, folder))
+
+    try:
+      # the files unpacked from the content exports of the initial sync are not downloaded again
+      exported = self._syncFromExports(courseListWithFiles, fileLog, fileLogLocation, sink, index) if self.initialSync else set()
+
+      for course in courseListWithFiles:
+        for folder in course.folders:
+          for file in folder.files:
+            if file.id not in exported:
+              downloadQueue.push(DownloadTask(course, folder, file, self._localFolder(course, folder)))
+
       self._print()
-      self._print(color.BOLD + f"Course: {course.name} ({course.course_code})" + color.END)
-
-      for folder in folders:
-        path = folder.getPath()
-        self._print(f"Processing {courseNameUsed}{path}...")
-        pathlib.Path(f"{self.root}/{courseNameUsed}{path}").mkdir(parents=True, exist_ok=True)
-
-        fileList = folder.files
-        for file in fileList:
-          if fileLog.isPresent(file):
-            if fileLog.isUpdated(file):
-              self._print(f"{color.YELLOW}No updates required for file ID {file.id}: {file.display_name}{color.END}")
-            else:
-              fileLog.update(file.id, file.modified_at)
-              downloadStatus = file.download(f"{self.root}/{courseNameUsed}{path}")
-              if downloadStatus:
-                self._print(f"{color.GREEN}Updated file ID {file.id}: {file.display_name}{color.END}")
-              else:
-                self._print("Failed to download!")
+      self._print(f"Queued {len(downloadQueue)} files ({DownloadQueue.POLICIES[self.downloadOrder]})")
+
+      savedChanges = self.stats.added + self.stats.updated + self.stats.moved
+
+      def settle(task : DownloadTask, localPath : str):
+        """Records a file that is up to date in the index, and saves the file log and index every few changes."""
+        nonlocal savedChanges
+        if fileLog.isUpdated(task.file):
+          loggedFile = fileLog.findById(task.file.id)
+          index.record(task.course, task.folder, task.file, loggedFile.local_path or localPath, loggedFile.sha256)
+        changes = self.stats.added + self.stats.updated + self.stats.moved
+        if changes - savedChanges >= Downloader.LOG_SAVE_INTERVAL:
+          fileLog.saveToFileLog(fileLogLocation)
+          index.commit()
+          savedChanges = changes
+
+      def finishDownload(task : DownloadTask, localPath : str, outcome : str, downloadStatus : bool):
+        """Records the result of a file's download, `outcome` being "added" or "updated"."""
+        file = task.file
+        if downloadStatus:
+          if outcome == "added":
+            fileLog.append(file.id, file.modified_at, file.sha256, localPath)
           else:
-            fileLog.append(file.id, file.modified_at)
-            downloadStatus = file.download(f"{self.root}/{courseNameUsed}{path}")
-            if downloadStatus:
-              self._print(f"{color.GREEN}Added file ID {file.id}: {file.display_name}{color.END}")
-            else:
-              self._print("Failed to download!")
-    fileLog.saveToFileLog(fileLogLocation)
+            fileLog.update(file.id, file.modified_at, file.sha256, localPath)
+          self._recordDownload(task, outcome)
+          self._print(f"{color.GREEN}{outcome.capitalize()} file ID {file.id}: {task.course.course_code} {file.display_name}{color.END}")
+        else:
+          self.stats.failed += 1
+          self._emit("file", id=file.id, status="failed")
+          self._print("Failed to download!")
+        settle(task, localPath)
+
+      # the downloads in progress, which are started in the download order and recorded as they complete
+      downloads = {}
+      with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+        try:
+          while len(downloadQueue) > 0 or len(downloads) > 0:
+            while len(downloadQueue) > 0 and len(downloads) < self.concurrency:
+              self._checkInterrupt()
+              task = downloadQueue.pop()
+              file = task.file
+              courseCode = task.course.course_code
+              localPath = self._relativePath(task)
+              outcome = "added"
+              if fileLog.isPresent(file):
+                outcome = "updated"
+                loggedFile = fileLog.findById(file.id)
+                # a file renamed or moved on Canvas is moved locally instead of being downloaded again
+                oldPath = loggedFile.local_path
+                relocation = self._relocate(sink, loggedFile, localPath)
+                if fileLog.isUpdated(file) and file.id not in forceIds and relocation != "missing":
+                  if relocation == "moved":
+                    self.stats.moved += 1
+                    self._emit("file", id=file.id, status="moved")
+                    self._print(f"{color.GREEN}Moved file ID {file.id}: {oldPath} -> {localPath}{color.END}")
+                  elif relocation == "conflict":
+                    self.stats.failed += 1
+                    self._emit("file", id=file.id, status="conflict")
+                    self._print(f"{color.RED}Could not move file ID {file.id} from {oldPath}, as a different file exists at {localPath}{color.END}")
+                  else:
+                    self.stats.skipped += 1
+                    self._emit("file", id=file.id, status="skipped")
+                    self._print(f"{color.YELLOW}No updates required for file ID {file.id}: {courseCode} {file.display_name}{color.END}")
+                  settle(task, localPath)
+                  continue
+              self._emit("file", id=file.id, status="downloading")
+              download = executor.submit(file.download, posixpath.dirname(localPath), self.rateLimiter, self.segments, self.segmentThreshold, self.transport, sink, cache)
+              downloads[download] = (task, localPath, outcome)
+
+            if len(downloads) > 0:
+              done, _ = wait(downloads, return_when=FIRST_COMPLETED)
+              for download in done:
+                finishDownload(*downloads.pop(download), download.result())
+        finally:
+          # the downloads in progress when the run is cancelled are finished and recorded, so that they are not
+          # downloaded again by the next run
+          for download in list(downloads):
+            finishDownload(*downloads.pop(download), download.result())
+    finally:
+      fileLog.saveToFileLog(fileLogLocation)
+      index.close()
+      sink.close()
     self._print()
     self._print(color.GREEN + color.BOLD + f"Download complete" + color.END)
+    self._print(f"{self.stats}")
+    if cache is not None:
+      if cache.available:
+        self._print(f"File cache: {cache.hits} files from the cache, {cache.misses} fetched into the cache")
+      else:
+        self._print(f"{color.YELLOW}Could not reach the file cache at {self.cacheUrl}, the files were downloaded from Canvas{color.END}")
+
+  def _syncFromExports(self, courseListWithFiles : list[Course], fileLog : FileLog, fileLogLocation : str, sink : StorageSink, index) -> set[int]:
+    """Downloads the new files of each course with at least `Downloader.EXPORT_MIN_FILES` new files as a single zip
+    file with the Canvas content exports API, and unpacks the zip file into the storage sink. The files of a course
+    whose export fails are left to be downloaded one by one.
+
+    Args:
+      courseListWithFiles (list[Course]): The courses with the folders and files to download.
+      fileLog (FileLog): The file log, which the unpacked files are appended to.
+      fileLogLocation (str): The location of the file log, which is saved after each course.
+      sink (StorageSink): The storage sink to unpack the files into.
+      index (ManifestIndex): The manifest index, which the unpacked files are recorded in.
+
+    Raises:
+      RunCancelled: If the run is cancelled.
+
+    Returns:
+      set[int]: The IDs of the files unpacked from the exports.
+    """
+    exporter = ContentExporter(self.fetchCanvasAPI, self.postCanvasAPI, self._wait)
+    exported = set()
+    for course in courseListWithFiles:
+      # the files in the export by their entry names in the zip file
+      tasks = {
+        entryName(folder, file): DownloadTask(course, folder, file, self._localFolder(course, folder))
+        for folder in course.folders
+        for file in folder.files
+        if not fileLog.isPresent(file)
+      }
+      if len(tasks) < Downloader.EXPORT_MIN_FILES:
+        continue
+
+      self._checkInterrupt()
+      self._print(f"Exporting {len(tasks)} new files of {course.course_code} from Canvas...")
+      location = None
+      try:
+        url = exporter.export(course.id, [task.file.id for task in tasks.values()],
+          lambda completion : self._print(f"Exporting {course.course_code}: {completion}%"))
+        location = self._downloadExport(url)
+        for task in self._unpackExport(location, tasks, sink):
+          file = task.file
+          fileLog.append(file.id, file.modified_at, file.sha256, self._relativePath(task))
+          index.record(task.course, task.folder, file, self._relativePath(task), file.sha256)
+          self._recordDownload(task, "added")
+          self._print(f"{color.GREEN}Added file ID {file.id}: {course.course_code} {file.display_name}{color.END}")
+          exported.add(file.id)
+      except RunCancelled:
+        raise
+      except Exception as e:
+        self._print(f"{color.YELLOW}Could not export the files of {course.course_code} ({e}), downloading them one by one{color.END}")
+      finally:
+        if location is not None and os.path.exists(location):
+          os.remove(location)
+        fileLog.saveToFileLog(fileLogLocation)
+        index.commit()
+    return exported
+
+  def _downloadExport(self, url : str) -> str:
+    """Downloads the zip file of a content export into a temporary file in the root directory.
+
+    Args:
+      url (str): The URL of the zip file.
+
+    Raises:
+      RunCancelled: If the run is cancelled. The temporary file is removed first.
+
+    Returns:
+      str: The location of the downloaded zip file.
+    """
+    descriptor, location = tempfile.mkstemp(dir=self.root, prefix=".export-", suffix=".zip")
+    try:
+      with os.fdopen(descriptor, "wb") as f, self.transport.get(url, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+          self._checkInterrupt()
+          self.rateLimiter.consume(len(chunk))
+          f.write(chunk)
+    except:
+      os.remove(location)
+      raise
+    return location
+
+  def _unpackExport(self, location : str, tasks : dict[str, DownloadTask], sink : StorageSink):
+    """Unpacks the files of a content export's zip file into the storage sink. Entries that do not match a file of
+    the export, or whose size does not match the file's size on Canvas, are skipped, so that the file is downloaded
+    one by one instead.
+
+    Args:
+      location (str): The location of the zip file.
+      tasks (dict[str, DownloadTask]): The download tasks of the exported files by their entry names in the zip file.
+      sink (StorageSink): The storage sink to unpack the files into.
+
+    Yields:
+      DownloadTask: The download task of each unpacked file, with the file's SHA-256 hash set.
+    """
+    with zipfile.ZipFile(location) as archive:
+      for entry in archive.infolist():
+        self._checkInterrupt()
+        # some Canvas versions put the files within the course's root folder
+        name = entry.filename.removeprefix("course files/")
+        task = tasks.get(name)
+        if entry.is_dir() or task is None:
+          continue
+        if task.file.size is not None and entry.file_size != task.file.size:
+          continue
+        digest = hashlib.sha256()
+        with archive.open(entry) as source, sink.open(self._relativePath(task), entry.file_size) as f:
+          for chunk in iter(lambda : source.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+        task.file.sha256 = digest.hexdigest()
+        yield task
+
+  def _relativeFolder(self, course : Course, folder : Folder) -> str:
+    """Returns the folder the files of a folder are saved into, relative to the root directory.
+
+    Args:
+      course (Course): The course the folder belongs to.
+      folder (Folder): The folder.
+
+    Returns:
+      str: The relative path of the folder.
+    """
+    courseNameUsed = course.course_code.replace('/', '')
+    return f"{courseNameUsed}{folder.getPath()}"
+
+  def _localFolder(self, course : Course, folder : Folder) -> str:
+    """Returns the local directory the files of a folder are saved into.
+
+    Args:
+      course (Course): The course the folder belongs to.
+      folder (Folder): The folder.
+
+    Returns:
+      str: The local directory of the folder.
+    """
+    courseNameUsed = course.course_code.replace('/', '')
+    return f"{self.root}/{courseNameUsed}{folder.getPath()}"
+
+  def _relativePath(self, task : DownloadTask) -> str:
+    """Returns the path of a file to download, relative to the root directory.
+
+    Args:
+      task (DownloadTask): The download task of the file.
+
+    Returns:
+      str: The relative path of the file.
+    """
+    return posixpath.join(self._relativeFolder(task.course, task.folder), task.file.display_name)
+
+  def _relocate(self, sink : StorageSink, loggedFile : File, localPath : str) -> str:
+    """Moves the saved copy of a file to its new path if the file has been renamed or moved on Canvas since it was
+    downloaded, and records the new path in the file log entry.
+
+    Args:
+      sink (StorageSink): The storage sink the files are saved into.
+      loggedFile (File): The file log entry of the file.
+      localPath (str): The new path of the file, relative to the root directory.
+
+    Returns:
+      str: `moved` if the file was moved to its new path, `conflict` if a different file already exists at the new
+      path (the file log entry is left unchanged), `missing` if the old copy no longer exists (so the file must be
+      downloaded again), or None if the file was not renamed or moved, or the storage sink cannot move files.
+    """
+    oldPath = loggedFile.local_path
+    if oldPath is None or oldPath == localPath:
+      loggedFile.local_path = localPath
+      return None
+
+    if sink.exists(localPath):
+      # the file at the new path may already be this file (e.g. moved by hand), which is only known for local files
+      location = sink.localLocation(localPath)
+      if location is not None and loggedFile.sha256 is not None and hashFile(location) == loggedFile.sha256:
+        loggedFile.local_path = localPath
+        return None
+      return "conflict"
+    if not sink.exists(oldPath):
+      return "missing"
+    if not sink.move(oldPath, localPath):
+      return None
+    loggedFile.local_path = localPath
+    return "moved"
+
+  def verify(self, repair : bool = True, workers : int = None) -> dict[str, list[DownloadTask]]:
+    """Verifies the local copies of the files against Canvas and the file log, by hashing the local copies across
+    a pool of processes. Files are reported as missing if there is no local copy, as changed if the file on Canvas
+    differs from the downloaded version, and as corrupt if the local copy does not match the hash in the file log.
+
+    Args:
+      repair (bool, optional): Whether to download the missing, changed and corrupt files again. Defaults to True.
+      workers (int, optional): The number of processes to hash the files with. Defaults to None, which means the
+      number of CPUs.
+
+    Returns:
+      dict[str, list[DownloadTask]]: The missing, changed and corrupt files, by problem.
+    """
+    self.stats = RunStats()
+    self.stats.start("verify")
+    self._cancelled.clear()
+    self._running.set()
+    problems : dict[str, list[DownloadTask]] = { "missing": [], "changed": [], "corrupt": [] }
+    if self.storage != "local":
+      self._print(f"{color.RED}Only files saved with the local storage can be verified{color.END}")
+      return problems
+    try:
+      self._verify(problems, repair, workers)
+    except RunCancelled:
+      self.stats.cancelled = True
+      self._print(f"{color.RED}Verification cancelled{color.END}")
+    self.stats.finish()
+    self.stats.save(self.root)
+    return problems
+
+  def _verify(self, problems : dict[str, list[DownloadTask]], repair : bool, workers : int):
+    """Verifies the local copies of the files, as described in `verify`.
+
+    Args:
+      problems (dict[str, list[DownloadTask]]): The missing, changed and corrupt files, by problem, which are added to
+      as they are found.
+      repair (bool): Whether to download the missing, changed and corrupt files again.
+      workers (int): The number of processes to hash the files with.
+
+    Raises:
+      RunCancelled: If the run is cancelled.
+    """
+    with self.stats.phase("crawl"):
+      courseListWithFiles = self.loadFiles()
+    fileLog = FileLog.fromFileLog(f'{self.root}/.files')
+
+    tasks : list[DownloadTask] = []
+    for course in courseListWithFiles:
+      for folder in course.folders:
+        for file in folder.files:
+          tasks.append(DownloadTask(course, folder, file, self._localFolder(course, folder)))
+
+    self._print(color.UNDERLINE + color.BOLD + f"Verifying {len(tasks)} files:" + color.END)
+    with self.stats.phase("verify"):
+      hashes = hashFiles([f"{task.path}/{task.file.display_name}" for task in tasks], workers)
+
+    unhashed = 0
+    for task in tasks:
+      localHash = hashes[f"{task.path}/{task.file.display_name}"]
+      loggedFile = fileLog.findById(task.file.id)
+      if localHash is None:
+        problems["missing"].append(task)
+      elif loggedFile is None or loggedFile.modified_at != task.file.modified_at:
+        problems["changed"].append(task)
+      elif loggedFile.sha256 is None:
+        unhashed += 1
+      elif loggedFile.sha256 != localHash:
+        problems["corrupt"].append(task)
+
+    problemOf = { task.file.id : problem for problem, problemTasks in problems.items() for task in problemTasks }
+    for task in tasks:
+      self._emit("file", id=task.file.id, status=problemOf.get(task.file.id, "verified"))
+    for problem, problemTasks in problems.items():
+      for task in problemTasks:
+        self._print(f"{color.RED}{problem.capitalize()}: file ID {task.file.id}: {task.course.course_code} {task.file.display_name}{color.END}")
+    self._print()
+    self._print(f"{len(tasks)} files verified: {len(problems['missing'])} missing, {len(problems['changed'])} changed, {len(problems['corrupt'])} corrupt")
+    if unhashed > 0:
+      self._print(f"{color.YELLOW}{unhashed} files have no hash in the file log and could not be checked for corruption{color.END}")
+
+    repairIds = { task.file.id for problemTasks in problems.values() for task in problemTasks }
+    if repair and len(repairIds) > 0:
+      self._print()
+      repairList = [
+        course.withFolders([folder.withFiles([file for file in folder.files if file.id in repairIds]) for folder in course.folders])
+        for course in courseListWithFiles
+      ]
+      with self.stats.phase("download"):
+        self.download(repairList, forceIds=repairIds)
+
+  def _recordDownload(self, task : DownloadTask, outcome : str):
+    """Records a successfully downloaded file in the run statistics.
+
+    Args:
+      task (DownloadTask): The download task of the downloaded file.
+      outcome (str): The run statistics field to count the file in, either "added" or "updated".
+    """
+    setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+    self._emit("file", id=task.file.id, status=outcome)
+    try:
+      self.stats.bytes += os.path.getsize(f"{task.path}/{task.file.display_name}")
+    except OSError:
+      # files that are not saved locally are counted by their size on Canvas
+      self.stats.bytes += task.file.size or 0
 
   def run(self):
     """
     Runs the current downloader by loading the courses/folders/files, then downloading the files loaded.
+
+    Returns:
+      RunStats: The statistics of the run.
     """
 
-    self.displayArea.delete(1.0, tk.END)
-    courseListWithFiles = self.loadFiles()
-    self.download(courseListWithFiles)
\ No newline at end of file
+    if self.displayArea != None:
+      self.displayArea.delete(1.0, tk.END)
+    self.stats = RunStats()
+    self.stats.start()
+    self._cancelled.clear()
+    self._running.set()
+    pathlib.Path(f"{self.root}").mkdir(parents=True, exist_ok=True)
+    # the checkpoint only applies to a run against the same Canvas URL and course scope
+    checkpoint = CrawlCheckpoint(f"{self.root}/.checkpoint", f"{self.canvasUrl} {self.courseScope.key()}")
+    try:
+      with self.stats.phase("crawl"):
+        courseListWithFiles = self.loadFiles(checkpoint)
+      with self.stats.phase("download"):
+        self.download(courseListWithFiles)
+      checkpoint.clear()
+    except RunCancelled:
+      self.stats.cancelled = True
+      self._print()
+      self._print(f"{color.RED}Run cancelled. Run the downloader again to continue from where it stopped.{color.END}")
+    self.stats.finish()
+    self.stats.save(self.root)
+    return self.stats
\ No newline at end of file
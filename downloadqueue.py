@@ -0,0 +1,117 @@
+"""A module containing the priority queue used to decide the order in which files are downloaded.
+
+The order is controlled by a download order policy:
+
+- `api`: the order the courses, folders and files are returned by the Canvas API.
+- `recent`: the most recently modified files first.
+- `smallest`: the smallest files first.
+- `course`: files ordered by the position of their course code in the course filter list.
+"""
+
+import heapq
+import itertools
+from datetime import datetime
+
+from filemodels import Course, File, Folder
+
+class DownloadTask:
+  """A single file to be downloaded, together with the course and folder it belongs to."""
+
+  def __init__(self, course : Course, folder : Folder, file : File, path : str):
+    """Creates a download task.
+
+    Args:
+      course (Course): The course the file belongs to.
+      folder (Folder): The folder the file belongs to.
+      file (File): The file to download.
+      path (str): The local directory the file should be saved into.
+    """
+    self.course = course
+    self.folder = folder
+    self.file = file
+    self.path = path
+
+  def __repr__(self) -> str:
+    return f"DownloadTask({self.course.course_code}, {self.path}, {self.file.display_name})"
+
+class DownloadQueue:
+  """A priority queue of download tasks, ordered by a download order policy. Tasks with the
+  same priority are downloaded in the order they were added to the queue.
+  """
+
+  POLICIES = {
+    "api": "Canvas API order",
+    "recent": "Most recently modified first",
+    "smallest": "Smallest first",
+    "course": "Course filter order",
+  }
+
+  def __init__(self, policy : str = "api", courseOrder : list[str] = None):
+    """Creates an empty download queue.
+
+    Args:
+      policy (str, optional): The download order policy, one of the keys of `DownloadQueue.POLICIES`.
+      Defaults to "api".
+      courseOrder (list[str], optional): The course codes in priority order, used by the `course`
+      policy. Courses not in the list are downloaded last. Defaults to None.
+    """
+    if policy not in DownloadQueue.POLICIES:
+      raise ValueError(f"Unknown download order policy: {policy}")
+    self.policy = policy
+    self.courseOrder = {}
+    for courseCode in (courseOrder or []):
+      if courseCode.strip() != '' and courseCode not in self.courseOrder:
+        self.courseOrder[courseCode] = len(self.courseOrder)
+    self._heap = []
+    self._counter = itertools.count()
+
+  def _priority(self, task : DownloadTask) -> tuple:
+    """Computes the priority of a download task under the queue's policy. Lower values are downloaded first.
+
+    Args:
+      task (DownloadTask): The task to compute the priority of.
+
+    Returns:
+      tuple: The priority of the task.
+    """
+    if self.policy == "recent":
+      return (-_timestamp(task.file.modified_at),)
+    elif self.policy == "smallest":
+      return (task.file.size if task.file.size is not None else float("inf"),)
+    elif self.policy == "course":
+      return (self.courseOrder.get(task.course.course_code, len(self.courseOrder)),)
+    else:
+      return ()
+
+  def push(self, task : DownloadTask):
+    """Adds a download task to the queue.
+
+    Args:
+      task (DownloadTask): The task to add.
+    """
+    heapq.heappush(self._heap, (self._priority(task), next(self._counter), task))
+
+  def pop(self) -> DownloadTask:
+    """Removes and returns the download task with the highest priority.
+
+    Returns:
+      DownloadTask: The next task to download.
+    """
+    return heapq.heappop(self._heap)[-1]
+
+  def __len__(self) -> int:
+    return len(self._heap)
+
+def _timestamp(modified_at : str) -> float:
+  """Converts a Canvas API timestamp (e.g. `2024-01-31T08:00:00Z`) into a POSIX timestamp.
+
+  Args:
+    modified_at (str): The timestamp from the Canvas API.
+
+  Returns:
+    float: The POSIX timestamp, or 0 if the timestamp could not be parsed.
+  """
+  try:
+    return datetime.fromisoformat(modified_at.replace("Z", "+00:00")).timestamp()
+  except (AttributeError, ValueError):
+    return 0.0
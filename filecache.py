@@ -0,0 +1,330 @@
+"""A module that encapsulates the shared file cache, a local service that caches the content of Canvas files for all
+the downloaders at an institution (e.g. in an office or a computer lab), so that files in large courses are fetched
+from Canvas once instead of once per user.
+
+The cache service is started with `python ./main.py cache-server`, and downloaders use it with `--cache <URL>`. A
+downloader asks the cache for a file with `GET /files/<file ID>`, sending its Canvas token as a bearer token. For every
+request, the cache looks up the file with the Canvas API using the downloader's token, so that users can only get the
+files they have access to on Canvas. The file's content is then served from the cache if it holds the file's current
+version (by the file ID and `modified_at`), or fetched from Canvas into the cache first. Downloaders fall back to
+downloading from Canvas directly if the cache cannot be reached or cannot serve a file.
+
+Files are cached as separate files in the cache directory, and the least recently used files are removed once the
+cache is larger than its maximum size. Tokens are only used to look up the files, and are never stored or logged.
+"""
+
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transport import API_HEADERS, Transport, createTransport, decodeJson
+
+# the number of bytes to copy at a time when fetching or serving a file
+CHUNK_SIZE = 64 * 1024
+
+class FileCache:
+  """The cached files of the cache service, stored in a directory with the least recently used files evicted once the
+  cache is larger than its maximum size. The recency of the files is kept in their modification times, so the cache
+  keeps its order across restarts.
+  """
+
+  # the number of locks the fetches of files are spread across
+  FETCH_LOCKS = 64
+
+  def __init__(self, root : str, maxBytes : int):
+    """Opens a file cache, creating its directory if it does not exist.
+
+    Args:
+      root (str): The directory to store the cached files in.
+      maxBytes (int): The maximum total size of the cached files, in bytes.
+    """
+    self.root = root
+    self.maxBytes = maxBytes
+    self.size = 0
+    self._lock = threading.Lock()
+    self._fetchLocks = [threading.Lock() for _ in range(FileCache.FETCH_LOCKS)]
+    # the size of each cached file by name, from the least to the most recently used
+    self._entries : OrderedDict[str, int] = OrderedDict()
+    # the name of the cached version of each file by file ID
+    self._versions : dict[int, str] = {}
+
+    os.makedirs(root, exist_ok=True)
+    cached = []
+    for entry in os.scandir(root):
+      if entry.name.endswith(".part"):
+        # left behind by a fetch that was interrupted
+        os.remove(entry.path)
+      elif entry.is_file() and re.fullmatch(r"\d+-\w+", entry.name):
+        stat = entry.stat()
+        cached.append((stat.st_mtime, entry.name, stat.st_size))
+    for _, name, size in sorted(cached):
+      previous = self._versions.get(int(name.split("-")[0]))
+      if previous is not None:
+        self._remove(previous)
+      self._entries[name] = size
+      self._versions[int(name.split("-")[0])] = name
+      self.size += size
+    self._evict()
+
+  @staticmethod
+  def _name(id : int, modifiedAt : str) -> str:
+    """Returns the name of the cached file of a version of a Canvas file (e.g. `123-20240101T000000Z`)."""
+    return f"{int(id)}-{re.sub(r'[^0-9A-Za-z]', '', modifiedAt or '')}"
+
+  def fetchLock(self, id : int) -> threading.Lock:
+    """Returns the lock to hold while fetching a file into the cache, so that a file requested by several downloaders
+    at once is only fetched from Canvas once.
+
+    Args:
+      id (int): The Canvas file ID.
+
+    Returns:
+      threading.Lock: The lock of the file.
+    """
+    return self._fetchLocks[int(id) % FileCache.FETCH_LOCKS]
+
+  def open(self, id : int, modifiedAt : str):
+    """Opens a cached file and marks it as the most recently used file.
+
+    Args:
+      id (int): The Canvas file ID.
+      modifiedAt (str): The `modified_at` timestamp of the version of the file.
+
+    Returns:
+      The cached file, opened for reading in binary mode, or None if the version of the file is not cached.
+    """
+    name = FileCache._name(id, modifiedAt)
+    with self._lock:
+      if name not in self._entries:
+        return None
+      try:
+        f = open(os.path.join(self.root, name), "rb")
+        os.utime(os.path.join(self.root, name))
+      except OSError:
+        self._remove(name)
+        return None
+      self._entries.move_to_end(name)
+      return f
+
+  def add(self, id : int, modifiedAt : str, location : str):
+    """Adds a fetched file into the cache, replacing the older versions of the file, and evicts the least recently
+    used files if the cache is full. Files larger than the cache are not cached.
+
+    Args:
+      id (int): The Canvas file ID.
+      modifiedAt (str): The `modified_at` timestamp of the version of the file.
+      location (str): The location of the fetched file, within the cache directory. The file is moved into the cache.
+
+    Returns:
+      The cached file, opened for reading in binary mode, or None if the file is larger than the cache and was not
+      cached (the fetched file is left in place).
+    """
+    size = os.path.getsize(location)
+    if size > self.maxBytes:
+      return None
+    name = FileCache._name(id, modifiedAt)
+    with self._lock:
+      previous = self._versions.get(int(id))
+      if previous is not None:
+        self._remove(previous)
+      os.replace(location, os.path.join(self.root, name))
+      self.size += size
+      self._entries[name] = size
+      self._versions[int(id)] = name
+      f = open(os.path.join(self.root, name), "rb")
+      self._evict()
+      return f
+
+  def _evict(self):
+    """Removes the least recently used files until the cache is within its maximum size. Must be called with the
+    cache's lock held (or before the cache is shared).
+    """
+    while self.size > self.maxBytes and len(self._entries) > 0:
+      self._remove(next(iter(self._entries)))
+
+  def _remove(self, name : str):
+    """Removes a cached file. Must be called with the cache's lock held."""
+    self.size -= self._entries.pop(name)
+    self._versions.pop(int(name.split("-")[0]), None)
+    try:
+      os.remove(os.path.join(self.root, name))
+    except OSError:
+      pass
+
+def _handler(cache : FileCache, canvasUrl : str, transport : Transport, log):
+  """Creates the request handler class of the cache service."""
+
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+      pass
+
+    def _sendStatus(self, status : int, message : str):
+      body = message.encode()
+      self.send_response(status)
+      self.send_header("Content-Type", "text/plain")
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def do_GET(self):
+      match = re.fullmatch(r"/files/(\d+)", self.path.split("?")[0])
+      authorization = self.headers.get("Authorization", "")
+      if match is None:
+        self._sendStatus(404, "Not found")
+        return
+      if not authorization.startswith("Bearer "):
+        self._sendStatus(401, "A Canvas token is required")
+        return
+      id = int(match[1])
+
+      # the file is looked up with the downloader's token, so only the files the user can access are served
+      try:
+        with transport.get(f"{canvasUrl}/api/v1/files/{id}", headers={ **API_HEADERS, 'Authorization': authorization }) as response:
+          if response.status_code != 200:
+            self._sendStatus(response.status_code, f"Canvas HTTP status: {response.status_code}")
+            return
+          apiFile = decodeJson(response.content)
+      except Exception as e:
+        self._sendStatus(502, f"Could not look up the file on Canvas: {e}")
+        return
+
+      start = time.monotonic()
+      outcome = "hit"
+      f = cache.open(id, apiFile.get("modified_at"))
+      if f is None:
+        with cache.fetchLock(id):
+          # the file may have been fetched by another request while waiting for the lock
+          f = cache.open(id, apiFile.get("modified_at"))
+          if f is None:
+            outcome = "miss"
+            try:
+              f = self._fetch(id, apiFile)
+            except Exception as e:
+              log(f"Could not fetch file ID {id} from Canvas: {e}")
+              self._sendStatus(502, f"Could not fetch the file from Canvas: {e}")
+              return
+
+      with f:
+        size = os.fstat(f.fileno()).st_size
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.send_header("X-Cache", outcome.upper())
+        self.end_headers()
+        try:
+          for chunk in iter(lambda : f.read(CHUNK_SIZE), b""):
+            self.wfile.write(chunk)
+        except OSError:
+          # the downloader disconnected
+          return
+      log(f"{outcome:<4} file ID {id} ({size} bytes) in {time.monotonic() - start:.2f}s, cache {cache.size} of {cache.maxBytes} bytes")
+
+    def _fetch(self, id : int, apiFile : dict):
+      """Fetches a file from Canvas into the cache.
+
+      Returns:
+        The fetched file, opened for reading in binary mode. Files larger than the cache are not cached, and are
+        removed once they are closed (or immediately on systems that allow it).
+      """
+      descriptor, location = tempfile.mkstemp(dir=cache.root, suffix=".part")
+      try:
+        with os.fdopen(descriptor, "wb") as part, transport.get(apiFile["url"], stream=True) as response:
+          response.raise_for_status()
+          for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            part.write(chunk)
+        if apiFile.get("size") is not None and os.path.getsize(location) != apiFile["size"]:
+          raise IOError(f"Incomplete file: {os.path.getsize(location)} of {apiFile['size']} bytes")
+        f = cache.add(id, apiFile.get("modified_at"), location)
+        if f is None:
+          f = open(location, "rb")
+          try:
+            os.remove(location)
+          except OSError:
+            pass
+        return f
+      except:
+        if os.path.exists(location):
+          os.remove(location)
+        raise
+
+  return Handler
+
+class CacheServer:
+  """The cache service, serving the files of a Canvas installation from a file cache."""
+
+  def __init__(self, cache : FileCache, canvasUrl : str, host : str = "0.0.0.0", port : int = 8765, transport : str = "http1", log = print):
+    """Creates the cache service.
+
+    Args:
+      cache (FileCache): The file cache.
+      canvasUrl (str): The URL of the Canvas installation whose files are cached.
+      host (str, optional): The address to listen on. Defaults to "0.0.0.0", which means all the addresses.
+      port (int, optional): The port to listen on. Defaults to 8765.
+      transport (str, optional): The HTTP transport to fetch the files from Canvas with, one of the keys of
+      `transport.TRANSPORTS`. Defaults to "http1".
+      log (Callable[[str], None], optional): Called with a line describing each request served. Defaults to print.
+    """
+    self.cache = cache
+    self.canvasUrl = canvasUrl.rstrip("/")
+    self._server = ThreadingHTTPServer((host, port), _handler(cache, self.canvasUrl, createTransport(transport), log))
+    self._server.daemon_threads = True
+    self.url = f"http://{host if host not in ['', '0.0.0.0'] else 'localhost'}:{self._server.server_port}"
+
+  def serveForever(self):
+    """Serves requests until the service is shut down."""
+    self._server.serve_forever()
+
+  def shutdown(self):
+    """Stops the service. Must be called from a different thread than `serveForever`."""
+    self._server.shutdown()
+    self._server.server_close()
+
+class CacheClient:
+  """The client of a cache service, used by a downloader to download files through the cache."""
+
+  def __init__(self, cacheUrl : str, canvasToken : str):
+    """Creates a cache client.
+
+    Args:
+      cacheUrl (str): The URL of the cache service (e.g. `http://fileserver:8765`).
+      canvasToken (str): The Canvas token of the user, which the cache looks up the files with.
+    """
+    self.cacheUrl = cacheUrl.rstrip("/")
+    self.canvasToken = canvasToken
+    # set to False once the cache cannot be reached, so that the rest of the files are downloaded from Canvas
+    self.available = True
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, id : int, transport : Transport):
+    """Requests a file from the cache.
+
+    Args:
+      id (int): The Canvas file ID.
+      transport (Transport): The HTTP transport to send the request with.
+
+    Returns:
+      The streaming response of the cache, or None if the cache cannot serve the file.
+    """
+    if not self.available:
+      return None
+    try:
+      response = transport.get(f"{self.cacheUrl}/files/{id}", headers={ 'Authorization': f"Bearer {self.canvasToken}" }, stream=True)
+    except Exception:
+      self.available = False
+      return None
+    if response.status_code != 200:
+      response.close()
+      return None
+    if response.headers.get("X-Cache") == "HIT":
+      self.hits += 1
+    else:
+      self.misses += 1
+    return response
@@ -9,21 +9,43 @@ FileLog model acts as a wrapper around a list of File objects, to
 be saved and loaded from locally-stored file logs (`.files`).
 """
 
-import requests
+import hashlib
+import os
+import posixpath
 import sys
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from integrity import hashFile
+from ratelimit import TokenBucket
+from transport import Transport, defaultTransport
+from storage import LocalSink, StorageSink
 
 if sys.version_info < (3, 10):
     from typing_extensions import Self
 else:
     from typing import Self
 
+if TYPE_CHECKING:
+    import requests
+    from filecache import CacheClient
+
+# the number of bytes to read from the network at a time when downloading a file
+CHUNK_SIZE = 64 * 1024
+
+# the default minimum size of a file to split into segments when downloading in segments
+SEGMENT_THRESHOLD = 64 * 1024 * 1024
+
 
 class File:
     """
     Represents a file within a Course's files, based on the File object in
     the Canvas API: https://canvas.instructure.com/doc/api/files.html
 
-    A file contains members `modified_at`, `id`, `url` and `display_name`.
+    A file contains members `modified_at`, `id`, `url`, `display_name` and `size`,
+    `sha256`, the SHA-256 hash of the file's content once downloaded, and `local_path`,
+    the path the file was saved to relative to the root directory.
     """
 
     def __init__(
@@ -32,6 +54,9 @@ class File:
         id: int = None,
         url: str = None,
         display_name: str = None,
+        size: int = None,
+        sha256: str = None,
+        local_path: str = None,
     ):
         """Creates a File object instance.
 
@@ -40,49 +65,72 @@ class File:
           id (int): The ID of the file, from the Canvas API.
           url (str): The URL of the file contents to download, from the Canvas API.
           display_name (str): The file's display name on Canvas.
+          size (int): The size of the file in bytes, from the Canvas API.
+          sha256 (str): The SHA-256 hash of the file's content, if known.
+          local_path (str): The path the file was saved to, relative to the root directory, if known.
         """
         self.modified_at = modified_at
         self.id = id
         self.url = url
         self.display_name = display_name
+        self.size = size
+        self.sha256 = sha256
+        self.local_path = local_path
 
     @classmethod
-    def fromApiArray(cls, apiArray: list[dict]) -> list[Self]:
+    def fromApiArray(cls, apiArray: Iterable[dict]) -> list[Self]:
         """
         A static class method that generates a list of File objects based on a
         list of File JSON objects from the Canvas API. Each Canvas API file
         object must be in the format indicated in
         https://canvas.instructure.com/doc/api/files.html with mandatory fields
-        `modified_at`, `id`, `url` and `display_name`.
+        `modified_at`, `id`, `url` and `display_name`, and optional field `size`.
 
         Args:
-          apiArray (list[dict]): The JSON array from the API to be processed into
-          File objects.
+          apiArray (Iterable[dict]): The JSON array (or a page of it) from the API
+          to be processed into File objects.
 
         Returns:
           list[File]: The resulting list of File objects from the Canvas API
           JSON output.
         """
-        return list(
-            map(
-                lambda apiObject: cls(
-                    modified_at=apiObject["modified_at"],
-                    id=apiObject["id"],
-                    url=apiObject["url"],
-                    display_name=apiObject["display_name"],
-                ),
-                apiArray,
+        return [
+            cls(
+                modified_at=apiObject["modified_at"],
+                id=apiObject["id"],
+                url=apiObject["url"],
+                display_name=apiObject["display_name"],
+                size=apiObject.get("size"),
             )
-        )
+            for apiObject in apiArray
+        ]
+
+    def toDict(self) -> dict:
+        """Returns the File object as a dictionary in the format of the Canvas API File object,
+        which can be loaded back with `fromApiArray`.
+
+        Returns:
+          dict: The dictionary representation of the File object.
+        """
+        return {
+            "id": self.id,
+            "modified_at": self.modified_at,
+            "url": self.url,
+            "display_name": self.display_name,
+            "size": self.size,
+        }
 
     def toLoadFileStr(self) -> str:
         """Returns a simplified string representation of the File object to be saved
-        in the locally-stored file log (`.files`), in the format "{id} {modified_at}\\n".
+        in the locally-stored file log (`.files`), in the format "{id} {modified_at} {sha256} {local_path}\\n".
+        If the hash is not known, it is saved as `-`. If the local path is not known, it is left out.
 
         Returns:
           str: The string representation of the File object.
         """
-        return f"{self.id} {self.modified_at}\n"
+        if self.local_path is None:
+            return f"{self.id} {self.modified_at} {self.sha256 or '-'}\n"
+        return f"{self.id} {self.modified_at} {self.sha256 or '-'} {self.local_path}\n"
 
     def __str__(self) -> str:
         """Returns a user-friendly string representation of the File object.
@@ -100,12 +148,44 @@ class File:
         """
         return f"File({self.id}, {self.modified_at}, {self.url}, {self.display_name})"
 
-    def download(self, path: str) -> bool:
-        """Downloads a file by sending a `GET` request to the file and retrieving its content, then
-        saving it into the
+    def download(
+        self,
+        path: str,
+        rateLimiter: TokenBucket = None,
+        segments: int = 1,
+        segmentThreshold: int = SEGMENT_THRESHOLD,
+        transport: Transport = None,
+        sink: StorageSink = None,
+        cache: "CacheClient" = None,
+    ) -> bool:
+        """Downloads a file by sending a `GET` request to the file and retrieving its content in chunks, then
+        streaming it into the specified path of a storage sink. The SHA-256 hash of the content is computed
+        as it is downloaded and stored in `sha256`. The file is only saved into the sink once the download is
+        complete (locally, the content is written into a temporary `.part` file which then replaces the file),
+        so an interrupted download never leaves a truncated file.
+
+        Files of at least `segmentThreshold` bytes can be split into several segments, which are downloaded
+        in parallel with `Range` requests and written into their positions in the file. Segments are only
+        used with sinks that save files locally.
+
+        If a shared file cache is given, the file is downloaded from the cache instead (in a single stream),
+        and only downloaded from Canvas if the cache cannot serve it.
 
         Args:
-          path (str): The path to save the file into.
+          path (str): The folder to save the file into. A local directory if no sink is given, and a path
+          relative to the sink's root directory otherwise.
+          rateLimiter (TokenBucket): The rate limiter to throttle the transfer with. Defaults to None, which
+          means the transfer is not throttled.
+          segments (int): The number of segments to split large files into. Defaults to 1, which means
+          files are never split.
+          segmentThreshold (int): The minimum size of a file, in bytes, to split it into segments.
+          Defaults to `SEGMENT_THRESHOLD`.
+          transport (Transport): The HTTP transport to send the requests with. Defaults to None, which
+          means the shared HTTP/1.1 transport.
+          sink (StorageSink): The storage sink to save the file into. Defaults to None, which means the
+          local filesystem.
+          cache (CacheClient): The client of the shared file cache to download the file through. Defaults
+          to None, which means the file is downloaded from Canvas.
 
         Returns:
           bool: The success status of the download. True if download is successful, false otherwise.
@@ -113,22 +193,181 @@ class File:
         if self.url is None:
             return False
 
-        if path[-1] != "/":
-            path += "/"
-
+        sink = sink if sink is not None else LocalSink()
+        location = posixpath.join(path, self.display_name)
+        transport = transport if transport is not None else defaultTransport()
+        if cache is not None:
+            try:
+                response = cache.get(self.id, transport)
+                if response is not None:
+                    self.sha256 = self._downloadStream(
+                        sink, location, rateLimiter, transport, response
+                    )
+                    return True
+            except:
+                # the file is downloaded from Canvas instead
+                pass
         try:
-            response = requests.get(self.url)
-            content = response.content
-
-            f = open(f"{path}{self.display_name}", "wb")
-            if content != None:
-                f.write(content)
-            f.close()
+            if (
+                segments > 1
+                and self.size is not None
+                and self.size >= segmentThreshold
+                and sink.localLocation(location) is not None
+            ):
+                sha256 = self._downloadSegmented(
+                    sink, location, rateLimiter, segments, transport
+                )
+            else:
+                sha256 = self._downloadStream(sink, location, rateLimiter, transport)
         except:
             return False
 
+        self.sha256 = sha256
         return True
 
+    def _downloadStream(
+        self,
+        sink: StorageSink,
+        location: str,
+        rateLimiter: TokenBucket,
+        transport: Transport,
+        response: "requests.Response" = None,
+    ) -> str:
+        """Downloads the file as a single stream into a storage sink.
+
+        Args:
+          sink (StorageSink): The storage sink to save the file into.
+          location (str): The path to save the file into, within the sink.
+          rateLimiter (TokenBucket): The rate limiter to throttle the transfer with, or None.
+          transport (Transport): The HTTP transport to send the request with.
+          response (requests.Response): An already-sent streaming response for the whole file. Defaults
+          to None, which means a new request is sent.
+
+        Returns:
+          str: The SHA-256 hash of the file's content.
+        """
+        digest = hashlib.sha256()
+        if response is None:
+            response = transport.get(self.url, stream=True)
+        with response:
+            response.raise_for_status()
+            with sink.open(location, self.size) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if rateLimiter is not None:
+                        rateLimiter.consume(len(chunk))
+                    digest.update(chunk)
+                    f.write(chunk)
+        return digest.hexdigest()
+
+    def _downloadSegmented(
+        self,
+        sink: StorageSink,
+        location: str,
+        rateLimiter: TokenBucket,
+        segments: int,
+        transport: Transport,
+    ) -> str:
+        """Downloads the file in segments fetched in parallel with `Range` requests into a preallocated
+        temporary file, which then replaces the file. Falls back to a single stream if the server does not
+        support `Range` requests.
+
+        Args:
+          sink (StorageSink): The storage sink to save the file into, which must save files locally.
+          location (str): The path to save the file into, within the sink.
+          rateLimiter (TokenBucket): The rate limiter to throttle the transfer with, or None.
+          segments (int): The number of segments to split the file into.
+          transport (Transport): The HTTP transport to send the requests with. With an HTTP/2 transport,
+          the segments are multiplexed over the same connection.
+
+        Raises:
+          IOError: If a segment or the whole file is not of the expected size.
+
+        Returns:
+          str: The SHA-256 hash of the file's content.
+        """
+        # the size in the listing may be stale, so the segments are split by the size the server reports
+        first = transport.get(
+            self.url,
+            headers={"Range": f"bytes=0-{-(-self.size // segments) - 1}"},
+            stream=True,
+        )
+        if first.status_code != 206:
+            return self._downloadStream(sink, location, rateLimiter, transport, first)
+
+        # the other segments are requested from the URL the first request was redirected to
+        contentRange, total = first.headers["Content-Range"].rsplit("/", 1)
+        firstEnd = int(contentRange.rsplit("-", 1)[1])
+        total = int(total)
+        url = first.url
+        segmentSize = -(-total // segments)
+        ranges = [
+            (start, min(start + segmentSize, total) - 1)
+            for start in range(0, total, segmentSize)
+        ]
+        if firstEnd != ranges[0][1]:
+            # the first response does not cover the first segment, so the segment is requested again
+            first.close()
+            first = None
+        localLocation = sink.localLocation(location)
+        partPath = f"{localLocation}.part"
+        os.makedirs(os.path.dirname(localLocation) or ".", exist_ok=True)
+        with open(partPath, "wb") as f:
+            f.truncate(total)
+
+        def fetchSegment(index: int) -> int:
+            start, end = ranges[index]
+            response = (
+                first
+                if index == 0 and first is not None
+                else transport.get(
+                    url, headers={"Range": f"bytes={start}-{end}"}, stream=True
+                )
+            )
+            received = 0
+            with response, open(partPath, "r+b") as f:
+                if response.status_code != 206:
+                    raise IOError(f"Range request failed: {response.status_code}")
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if rateLimiter is not None:
+                        rateLimiter.consume(len(chunk))
+                    _writeAt(f, start + received, chunk)
+                    received += len(chunk)
+            if received != end - start + 1:
+                raise IOError(f"Incomplete segment: {received} of {end - start + 1} bytes")
+            return received
+
+        try:
+            with ThreadPoolExecutor(max_workers=segments) as executor:
+                received = sum(executor.map(fetchSegment, range(len(ranges))))
+            # the part file is preallocated, so its size does not show whether every byte was received
+            if received != total:
+                raise IOError(f"Incomplete file: {received} of {total} bytes")
+            sha256 = hashFile(partPath)
+            os.replace(partPath, localLocation)
+        except:
+            if os.path.exists(partPath):
+                os.remove(partPath)
+            raise
+        finally:
+            if first is not None:
+                first.close()
+        return sha256
+
+
+def _writeAt(f, offset: int, data: bytes):
+    """Writes data into a file at a position, without affecting other writers of the same file.
+
+    Args:
+      f: The file object, opened for binary writing.
+      offset (int): The position in the file to write the data at.
+      data (bytes): The data to write.
+    """
+    if hasattr(os, "pwrite"):
+        os.pwrite(f.fileno(), data, offset)
+    else:
+        f.seek(offset)
+        f.write(data)
+
 
 class Folder:
     """
@@ -177,8 +416,17 @@ class Folder:
         """
         return Folder(self.id, self.full_name, files)
 
+    def toDict(self) -> dict:
+        """Returns the Folder object as a dictionary in the format of the Canvas API Folder object,
+        which can be loaded back with `fromApiArray`. The files of the folder are not included.
+
+        Returns:
+          dict: The dictionary representation of the Folder object.
+        """
+        return {"id": self.id, "full_name": self.full_name}
+
     @classmethod
-    def fromApiArray(cls, apiArray: list[dict]) -> list[Self]:
+    def fromApiArray(cls, apiArray: Iterable[dict]) -> list[Self]:
         """
         A static class method that generates a list of Folder objects based on a
         list of Folder JSON objects from the Canvas API. Each Canvas API folder
@@ -187,21 +435,17 @@ class Folder:
         `id` and `full_name`.
 
         Args:
-          apiArray (list[dict]): The JSON array from the API to be processed into
-          Folder objects.
+          apiArray (Iterable[dict]): The JSON array (or a page of it) from the API
+          to be processed into Folder objects.
 
         Returns:
           list[Folder]: The resulting list of Folder objects from the Canvas API
           JSON output.
         """
-        return list(
-            map(
-                lambda apiObject: cls(
-                    id=apiObject["id"], full_name=apiObject["full_name"]
-                ),
-                apiArray,
-            )
-        )
+        return [
+            cls(id=apiObject["id"], full_name=apiObject["full_name"])
+            for apiObject in apiArray
+        ]
 
     def __str__(self) -> str:
         """Returns a user-friendly string representation of the Folder object.
@@ -227,12 +471,18 @@ class Course:
     Course model for this application, based on the Course object in the API:
     https://canvas.instructure.com/doc/api/courses.html
 
-    A course contains members `id`, `name` and `course_code` (from the API Course object), and
-    `folders` that represent the folders within this course.
+    A course contains members `id`, `name`, `course_code`, `term` and `is_favorite` (from the API Course
+    object), and `folders` that represent the folders within this course.
     """
 
     def __init__(
-        self, id: int, name: str, course_code: str, folders: list[Folder] = None
+        self,
+        id: int,
+        name: str,
+        course_code: str,
+        folders: list[Folder] = None,
+        term: dict = None,
+        is_favorite: bool = None,
     ):
         """Creates a Course object instance.
 
@@ -241,11 +491,17 @@ class Course:
           name (str): The full name of the course.
           course_code (str): The course code.
           folders (list[Folder]): The list of Folder objects the Course contains.
+          term (dict): The enrollment term of the course (with `id` and `name`), if included in the
+          Canvas API response.
+          is_favorite (bool): Whether the course is one of the user's favourite courses, if included in
+          the Canvas API response.
         """
         self.id = id
         self.name = name
         self.course_code = course_code
         self.folders = folders
+        self.term = term
+        self.is_favorite = is_favorite
 
     def __str__(self) -> str:
         """Returns a user-friendly string representation of the Course object.
@@ -274,40 +530,57 @@ class Course:
         Returns:
           Course: The new Course object instance with the list of folders being set.
         """
-        return Course(self.id, self.name, self.course_code, folders)
+        return Course(
+            self.id, self.name, self.course_code, folders, self.term, self.is_favorite
+        )
+
+    def toDict(self) -> dict:
+        """Returns the Course object as a dictionary in the format of the Canvas API Course object,
+        which can be loaded back with `fromApiArray`. The folders of the course are not included.
+
+        Returns:
+          dict: The dictionary representation of the Course object.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "course_code": self.course_code,
+            "term": self.term,
+            "is_favorite": self.is_favorite,
+        }
 
     @classmethod
-    def fromApiArray(cls, apiArray: list[dict]) -> list[Self]:
+    def fromApiArray(cls, apiArray: Iterable[dict]) -> list[Self]:
         """
         A static class method that generates a list of Course objects based on a
         list of Course JSON objects from the Canvas API. Each Canvas API course
         object must be in the format indicated in
         https://canvas.instructure.com/doc/api/courses.html with mandatory fields
-        `id`, `name`, and `course_code`.
+        `id`, `name`, and `course_code`, and optional fields `term` and `is_favorite`.
 
         Args:
-          apiArray (list[dict]): The JSON array from the API to be processed into
-          Course objects.
+          apiArray (Iterable[dict]): The JSON array (or a page of it) from the API
+          to be processed into Course objects.
 
         Returns:
           list[Course]: The resulting list of Course objects from the Canvas API
           JSON output.
         """
-        return list(
-            map(
-                lambda apiObject: cls(
-                    id=apiObject["id"],
-                    name=apiObject["name"],
-                    course_code=apiObject["course_code"],
-                ),
-                apiArray,
+        return [
+            cls(
+                id=apiObject["id"],
+                name=apiObject["name"],
+                course_code=apiObject["course_code"],
+                term=apiObject.get("term"),
+                is_favorite=apiObject.get("is_favorite"),
             )
-        )
+            for apiObject in apiArray
+        ]
 
 
 class FileLog:
     """Represents a file log (`.files`) stored locally that contains files. A wrapper
-    around a list of File objects.
+    around a list of File objects, indexed by file ID.
     """
 
     def __init__(self, fileList: list[File] = None):
@@ -316,13 +589,15 @@ class FileLog:
         Args:
           fileList (list[File]): The file list to initialise the file log with.
         """
-        self.fileList = fileList
+        self.fileList = fileList if fileList is not None else []
+        self._index = {file.id: file for file in self.fileList}
 
     @classmethod
     def fromFileLog(cls, fileLogLocation: str) -> Self:
         """
         A static class method that generates a file log object based on  the
-        locally-stored file log(`.files`).
+        locally-stored file log(`.files`). Each line contains the ID, modified at
+        timestamp, and optionally the SHA-256 hash and local path of a file.
 
         Args:
           fileLogLocation (str): The location of the file log that should contain
@@ -334,7 +609,7 @@ class FileLog:
           empty array.
         """
 
-        loadedFiles: list[str] = []
+        loadedFiles: list[File] = []
 
         try:
             fileLog = open(fileLogLocation, "r")
@@ -342,8 +617,21 @@ class FileLog:
             fileLog.close()
 
             for line in loadedLines:
-                id, modified_at = line.strip().split(" ")[:2]
-                loadedFiles.append(File(id=id, modified_at=modified_at))
+                # the local path is the last field as it may contain spaces
+                fields = line.rstrip("\n").split(" ", 3)
+                id, modified_at = fields[:2]
+                sha256 = fields[2] if len(fields) > 2 and fields[2] != "-" else None
+                local_path = fields[3] if len(fields) > 3 else None
+                # file IDs from the Canvas API are integers
+                id = int(id) if id.isdigit() else id
+                loadedFiles.append(
+                    File(
+                        id=id,
+                        modified_at=modified_at,
+                        sha256=sha256,
+                        local_path=local_path,
+                    )
+                )
 
         except:
             loadedFiles = []
@@ -352,7 +640,7 @@ class FileLog:
 
     def saveToFileLog(self, fileLogLocation: str):
         """Saves the list of files in the file log to a local file. Each file is saved
-        as a line with the format "{id} {modified_at}\\n".
+        as a line with the format "{id} {modified_at} {sha256} {local_path}\\n".
 
         Args:
           fileLogLocation (str): The path of the file to save the list of files into.
@@ -365,8 +653,8 @@ class FileLog:
         fileLog.close()
 
     def findById(self, id: int) -> File:
-        """Finds the first file in the file log with a specified ID. Note that ID
-        is unique, so the first file should be the first file desired.
+        """Finds the file in the file log with a specified ID. Note that ID
+        is unique, so there is at most one such file.
 
         Args:
           id (int): The ID of the file to find within the file log.
@@ -374,36 +662,46 @@ class FileLog:
         Returns:
           File: The file within the file log, if found, else None.
         """
-        for file in self.fileList:
-            if file.id == id:
-                return file
-
-        return None
+        return self._index.get(id)
 
-    def append(self, id: int, modified_at: str):
-        """Appends a new File to the file log given its `id` and `modified_at`
-        parameters.
+    def append(
+        self, id: int, modified_at: str, sha256: str = None, local_path: str = None
+    ):
+        """Appends a new File to the file log given its `id`, `modified_at`, `sha256`
+        and `local_path` parameters.
 
         Args:
           id (int): The ID of the new file to append to the file log.
           modified_at (str): The modified at timestamp of the new file to append to the file log.
+          sha256 (str): The SHA-256 hash of the new file's content. Defaults to None.
+          local_path (str): The path the new file was saved to, relative to the root directory. Defaults to None.
         """
-        self.fileList.append(File(id, modified_at))
+        file = File(
+            id=id, modified_at=modified_at, sha256=sha256, local_path=local_path
+        )
+        self.fileList.append(file)
+        self._index[id] = file
 
-    def update(self, id: int, modified_at: str):
-        """Updates the modified at timestamp of the file in the file log, identified by ID. If
-        the file is not present in the file log, appends the file into the file log.
+    def update(
+        self, id: int, modified_at: str, sha256: str = None, local_path: str = None
+    ):
+        """Updates the modified at timestamp, hash and local path of the file in the file log, identified
+        by ID. If the file is not present in the file log, appends the file into the file log.
 
         Args:
           id (int): The ID of the file in the file log to update the modified at timestamp.
           modified_at (str): The new modified at timestamp.
+          sha256 (str): The new SHA-256 hash of the file's content. Defaults to None.
+          local_path (str): The new path of the file, relative to the root directory. Defaults to None.
         """
         fileInLog = self.findById(id)
 
         if fileInLog is None:
-            self.append(id, modified_at)
+            self.append(id, modified_at, sha256, local_path)
         else:
             fileInLog.modified_at = modified_at
+            fileInLog.sha256 = sha256
+            fileInLog.local_path = local_path
 
     def isUpdated(self, file: File) -> bool:
         """Checks whether the file given has been updated in the file log.
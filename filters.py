@@ -0,0 +1,174 @@
+"""A module that encapsulates the filtering of the courses, folders and files to download.
+
+Filters are given as a list of rules in the format `[+|-]field:pattern`. Rules starting with `+` are include rules,
+and rules starting with `-` are exclude rules (rules without a sign are include rules). The following fields are
+supported:
+
+- `course`: The course code (e.g. `+course:CS*`).
+- `folder`: The folder path within the course's files (e.g. `-folder:/Videos`). A folder rule also applies to all the
+  subfolders of the matched folders, and excluded folders are not listed from Canvas at all.
+- `name`: The file's display name (e.g. `-name:*draft*`).
+- `ext`: A comma-separated list of file extensions, case-insensitive (e.g. `-ext:mp4,mov`).
+- `size`: A size comparison in bytes with an optional `K`, `M` or `G` suffix (e.g. `-size:>500M`).
+
+Patterns for `course`, `folder` and `name` are glob patterns matching the whole value, or regular expressions if
+prefixed by `re:`, which match anywhere in the value unless anchored (e.g. `+course:re:^CS\\d{4}$` or
+`-folder:re:Videos`). An item is downloaded if it matches at least one include rule for each field with
+include rules, and does not match any exclude rule.
+"""
+
+import fnmatch
+import operator
+import re
+
+from filemodels import Course, File
+from ratelimit import parseSize
+
+FIELDS = ["course", "folder", "name", "ext", "size"]
+
+_COMPARISONS = { ">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt, "=": operator.eq }
+
+class FilterRule:
+  """A single compiled include or exclude rule."""
+
+  def __init__(self, rule : str):
+    """Compiles a filter rule.
+
+    Args:
+      rule (str): The rule, in the format described in the module documentation.
+
+    Raises:
+      ValueError: If the rule is invalid.
+    """
+    self.rule = rule.strip()
+    self.include = not self.rule.startswith("-")
+    field, separator, pattern = self.rule.lstrip("+-").partition(":")
+    self.field = field.strip().lower()
+    if separator == "" or self.field not in FIELDS or pattern.strip() == "":
+      raise ValueError(f"Invalid filter rule: {rule}")
+    pattern = pattern.strip()
+
+    try:
+      if self.field == "ext":
+        self._extensions = { "." + extension.strip().lstrip(".").lower() for extension in pattern.split(",") }
+      elif self.field == "size":
+        comparison = next(comparison for comparison in _COMPARISONS if pattern.startswith(comparison))
+        self._compare = _COMPARISONS[comparison]
+        self._size = parseSize(pattern[len(comparison):])
+      elif pattern.startswith("re:"):
+        # regular expressions match anywhere in the value, so that folder paths (which begin with `/`) can be matched
+        # by a folder's name
+        self._regex = re.compile(pattern[3:])
+        self._find = self._regex.search
+      else:
+        self._regex = re.compile(fnmatch.translate(pattern))
+        self._find = self._regex.match
+    except (StopIteration, ValueError, re.error):
+      raise ValueError(f"Invalid filter rule: {rule}")
+
+  def matches(self, value) -> bool:
+    """Checks whether a value matches the rule.
+
+    Args:
+      value: The value of the rule's field, a file for the `ext` and `size` fields, and a string otherwise.
+
+    Returns:
+      bool: True if the value matches the rule, False otherwise.
+    """
+    if self.field == "ext":
+      name = value.display_name.lower()
+      return any(name.endswith(extension) for extension in self._extensions)
+    elif self.field == "size":
+      return value.size is not None and self._compare(value.size, self._size)
+    elif self.field == "folder":
+      # a folder rule applies to the folder and all its subfolders
+      return any(self._find(path) for path in _ancestorPaths(value))
+    else:
+      return self._find(value) is not None
+
+def _ancestorPaths(path : str) -> list[str]:
+  """Returns a folder path and the paths of all its ancestor folders (e.g. `/a/b` gives `/a/b`, `/a` and `/`).
+
+  Args:
+    path (str): The folder path.
+
+  Returns:
+    list[str]: The folder path and its ancestor paths.
+  """
+  paths = ["/"]
+  parts = [part for part in path.split("/") if part != ""]
+  for index in range(len(parts)):
+    paths.append("/" + "/".join(parts[:index + 1]))
+  return paths
+
+class FilterEngine:
+  """A compiled set of filter rules, used to prune the courses, folders and files to download."""
+
+  def __init__(self, rules : list[str] = None, courseCodes : list[str] = None):
+    """Compiles a set of filter rules.
+
+    Args:
+      rules (list[str], optional): The filter rules. Blank lines and lines starting with `#` are ignored. Defaults to None.
+      courseCodes (list[str], optional): The exact course codes to download (the course filters). If empty,
+      all courses are downloaded. Defaults to None.
+
+    Raises:
+      ValueError: If any rule is invalid.
+    """
+    self.rules = [FilterRule(rule) for rule in (rules or []) if rule.strip() != "" and not rule.strip().startswith("#")]
+    self.courseCodes = { courseCode.strip() for courseCode in (courseCodes or []) if courseCode.strip() != "" }
+    self._includeRules = { field : [rule for rule in self.rules if rule.field == field and rule.include] for field in FIELDS }
+    self._excludeRules = { field : [rule for rule in self.rules if rule.field == field and not rule.include] for field in FIELDS }
+
+  def _allows(self, fields : list[str], value) -> bool:
+    """Checks whether a value passes the rules of the given fields.
+
+    Args:
+      fields (list[str]): The fields whose rules to check.
+      value: The value to check, passed to `FilterRule.matches`.
+
+    Returns:
+      bool: True if the value passes the rules, False otherwise.
+    """
+    for field in fields:
+      if any(rule.matches(value) for rule in self._excludeRules[field]):
+        return False
+      includeRules = self._includeRules[field]
+      if len(includeRules) > 0 and not any(rule.matches(value) for rule in includeRules):
+        return False
+    return True
+
+  def includeCourse(self, course : Course) -> bool:
+    """Checks whether a course should be downloaded.
+
+    Args:
+      course (Course): The course to check.
+
+    Returns:
+      bool: True if the course should be downloaded, False otherwise.
+    """
+    if len(self.courseCodes) > 0 and course.course_code not in self.courseCodes:
+      return False
+    return self._allows(["course"], course.course_code)
+
+  def includeFolder(self, path : str) -> bool:
+    """Checks whether a folder should be listed and downloaded.
+
+    Args:
+      path (str): The folder path within the course's files (see `Folder.getPath`).
+
+    Returns:
+      bool: True if the folder should be downloaded, False otherwise.
+    """
+    return self._allows(["folder"], path)
+
+  def includeFile(self, file : File) -> bool:
+    """Checks whether a file should be downloaded.
+
+    Args:
+      file (File): The file to check.
+
+    Returns:
+      bool: True if the file should be downloaded, False otherwise.
+    """
+    return self._allows(["name"], file.display_name) and self._allows(["ext", "size"], file)
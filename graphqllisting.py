@@ -0,0 +1,141 @@
+"""A module that encapsulates the GraphQL listing backend, which lists the files of a course from the Canvas GraphQL
+API (`/api/graphql`) in pages of many files per request, instead of one request per folder as with the REST API.
+
+The backend is experimental and opt-in (`--listing graphql`). It assumes the following parts of the Canvas GraphQL
+schema, which are not in Canvas's documented GraphQL schema, and are only known to be served by the stand-in server of
+the benchmarks. If a query fails, the downloader lists the course with the REST API instead, and once the Canvas
+instance rejects the query itself, the remaining courses are listed with the REST API without trying GraphQL.
+
+- `course(id: ID!)` returns the course, with a `filesConnection(first: Int, after: String)` connection of all the
+  files in the course and the standard `pageInfo { hasNextPage endCursor }` cursor pagination.
+- Each file node has the fields `_id`, `displayName`, `size`, `modifiedAt` (the same timestamp as `modified_at` in
+  the REST API, so that the file log stays valid when switching between backends), `url` and
+  `folder { _id fullName }`.
+
+Folders are only known through the files they contain, so empty folders are not listed by this backend.
+"""
+
+from filemodels import File, Folder
+from transport import decodeJson
+
+COURSE_FILES_QUERY = """
+query CourseFiles($courseId: ID!, $first: Int!, $after: String) {
+  course(id: $courseId) {
+    filesConnection(first: $first, after: $after) {
+      nodes {
+        _id
+        displayName
+        size
+        modifiedAt
+        url
+        folder { _id fullName }
+      }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+class GraphQLError(Exception):
+  """Raised when a GraphQL query fails or returns errors."""
+
+class GraphQLSchemaError(GraphQLError):
+  """Raised when the Canvas instance rejects the query itself, e.g. because its schema has no `filesConnection`."""
+
+class GraphQLListing:
+  """Lists the folders and files of courses with the Canvas GraphQL API."""
+
+  # the number of files requested per page
+  PAGE_SIZE = 500
+
+  def __init__(self, fetch):
+    """Creates a GraphQL listing backend.
+
+    Args:
+      fetch (Callable[[str, dict], requests.Response]): Sends a GraphQL query with its variables to the Canvas
+      GraphQL API, and returns the response (see `Downloader.fetchCanvasGraphQL`).
+    """
+    self._fetch = fetch
+    self._files : dict[int, list[File]] = {}
+    # set to False once the Canvas instance rejects the query, so that it is not sent for the remaining courses
+    self.supported = True
+
+  def _query(self, variables : dict) -> dict:
+    """Sends the course files query and returns its data.
+
+    Args:
+      variables (dict): The variables of the query.
+
+    Raises:
+      GraphQLSchemaError: If the Canvas instance rejects the query.
+      GraphQLError: If the query fails for another reason.
+
+    Returns:
+      dict: The data of the query result.
+    """
+    response = self._fetch(COURSE_FILES_QUERY, variables)
+    if response.status_code != 200:
+      raise GraphQLError(f"HTTP status: {response.status_code}")
+    result = decodeJson(response.content)
+    if result.get("errors"):
+      message = "; ".join(error.get("message", str(error)) for error in result["errors"])
+      # errors without data come from validating the query against the schema, before it is run
+      if result.get("data") is None:
+        self.supported = False
+        raise GraphQLSchemaError(message)
+      raise GraphQLError(message)
+    if result.get("data", {}).get("course") is None:
+      raise GraphQLError("Course not found")
+    return result["data"]
+
+  def listFolders(self, courseId : int) -> list[Folder]:
+    """Lists all the files of a course, following the cursor pagination, and returns the folders containing them.
+    The files of each folder are kept until they are taken with `takeFiles`.
+
+    Args:
+      courseId (int): The ID of the course.
+
+    Raises:
+      GraphQLError: If a query fails or returns errors.
+
+    Returns:
+      list[Folder]: The folders containing the course's files, in the order they were first seen.
+    """
+    folders : dict[int, Folder] = {}
+    files : dict[int, list[File]] = {}
+    cursor = None
+    while True:
+      connection = self._query({ "courseId": str(courseId), "first": GraphQLListing.PAGE_SIZE, "after": cursor })["course"]["filesConnection"]
+      for node in connection["nodes"]:
+        folderId = int(node["folder"]["_id"])
+        if folderId not in folders:
+          folders[folderId] = Folder(folderId, node["folder"]["fullName"])
+          files[folderId] = []
+        files[folderId].append(File(node["modifiedAt"], int(node["_id"]), node["url"], node["displayName"], node.get("size")))
+      if not connection["pageInfo"]["hasNextPage"]:
+        break
+      cursor = connection["pageInfo"]["endCursor"]
+
+    self._files.update(files)
+    return list(folders.values())
+
+  def takeFiles(self, folderId : int) -> list[File]:
+    """Takes the files of a folder listed by `listFolders`.
+
+    Args:
+      folderId (int): The ID of the folder.
+
+    Returns:
+      list[File]: The files of the folder, or None if the folder has not been listed.
+    """
+    return self._files.pop(folderId, None)
+
+  def discardFiles(self, folderIds : set[int]):
+    """Drops the files of folders listed by `listFolders` that will not be taken (e.g. folders skipped by filter
+    rules), so that they are not kept for the rest of the run.
+
+    Args:
+      folderIds (set[int]): The IDs of the folders.
+    """
+    for folderId in folderIds:
+      self._files.pop(folderId, None)
@@ -12,6 +12,15 @@ class Font:
   helv12 = ("Helvetica", "12")
   consolas = ("Consolas", "12")
 
+def configureStyles():
+  """Configures the ttk theme and the styles of the customised widgets. This is done once when the GUI is created,
+  before any `entry` widget is created.
+  """
+  style = ttk.Style()
+  style.theme_use('clam')
+  style.configure('pad.TEntry', padding='5 1 1 1', fieldbackground="#d0d0d0", background="#d0d0d0", foreground="black")
+  style.configure('invalid.TEntry', padding='5 1 1 1', fieldbackground="#f0b0b0", background="#f0b0b0", foreground="black")
+
 def label(frame : tk.Frame, text : str, font : tuple = Font.helv16b, width : int = 18, anchor : str = tk.E, *args, **kwargs) -> tk.Label:
   """Creates the customised label to be used in the GUI.
 
@@ -28,7 +37,8 @@ def label(frame : tk.Frame, text : str, font : tuple = Font.helv16b, width : int
   return tk.Label(master=frame, text=text, width=width, anchor=anchor, font=font, bg="black", fg="white", *args, **kwargs)
 
 def entry(frame: tk.Frame, text : str, textvariable : tk.StringVar, show : str = "") -> ttk.Entry:
-  """Creates the customised TKinter `ttk.Entry` widget (text box) to be used in the GUI.
+  """Creates the customised TKinter `ttk.Entry` widget (text box) to be used in the GUI. The styles of the widget
+  must have been configured with `configureStyles`.
 
   Args:
     frame (tk.Frame): The master/parent frame this `ttk.Entry` widget will be located in.
@@ -44,8 +54,6 @@ def entry(frame: tk.Frame, text : str, textvariable : tk.StringVar, show : str =
   Returns:
     Entry: The `ttk.Entry` text box instance created by the application.
   """
-  ttk.Style().theme_use('clam')
-  ttk.Style().configure('pad.TEntry', padding='5 1 1 1', fieldbackground="#d0d0d0", background="#d0d0d0", foreground="black")
   return ttk.Entry(
     master=frame, 
     width=45, 
@@ -2,10 +2,18 @@
 """
 
 from tkinter import Event, Label, StringVar, Tk, Toplevel
+import queue
+import threading
+import time
 import tkinter as tk
+from coursecache import CourseCache
 from downloader import Downloader
+from filemodels import Course
 from gui.components import Font, entry, label
 
+# the frames of the spinner shown while the courses are being loaded
+_SPINNER = "|/-\\"
+
 class CourseFilterWindow:
 
   def __init__(self, master : Tk, downloader : Downloader, contentVar : StringVar):
@@ -13,6 +21,8 @@ class CourseFilterWindow:
     self.__master = master
     self.__downloader = downloader
     self.__contentVar = contentVar
+    # the course cache is loaded when the window is first opened, so that it does not delay the main window
+    self.__courseCache : CourseCache = None
 
   def close(self, event : Event = None):
     self.__isOpen = False
@@ -21,11 +31,14 @@ class CourseFilterWindow:
 
     if not self.__isOpen:
 
+      if self.__courseCache is None:
+        self.__courseCache = CourseCache()
+
       courseFiltersWindow = Toplevel(self.__master, bg="black")
 
       courseFiltersWindow.title("Update Course Filters...")
       
-      courseFiltersWindow.geometry("640x500")
+      courseFiltersWindow.geometry("760x500")
 
       mainFrame = tk.Frame(courseFiltersWindow, bg="black")
 
@@ -63,14 +76,47 @@ class CourseFilterWindow:
         else:
           statusVar.set("Could not add as course contains comma or is empty!")
 
-      def loadCoursesBtnClick():
-        courses = self.__downloader.fetchCourses()
+      def showCourses(courses : list[Course]):
         listView.delete(0, tk.END)
         for course in courses:
           listView.insert(tk.END, course.course_code)
         updateContent()
 
-        statusVar.set(f"Courses loaded from Canvas API successfully!")
+      def loadCoursesBtnClick(refresh : bool = False):
+        canvasUrl, canvasToken = self.__downloader.canvasUrl, self.__downloader.canvasToken
+        scope = self.__downloader.courseScope.key()
+        courses, fetchedAt = self.__courseCache.get(canvasUrl, canvasToken, scope)
+        if courses is not None and not refresh:
+          showCourses(courses)
+          statusVar.set(f"Courses loaded from cache (fetched {time.strftime('%d %b %Y %H:%M', time.localtime(fetchedAt))}). Click 'Refresh' to reload from Canvas.")
+          return
+
+        # fetch the courses in a separate thread to ensure the window doesn't freeze during the request
+        results = queue.Queue()
+        threading.Thread(target=lambda : results.put(self.__downloader.fetchCourses()), daemon=True).start()
+        loadCoursesBtn['state'] = tk.DISABLED
+        refreshBtn['state'] = tk.DISABLED
+
+        def poll(frame : int = 0):
+          if not courseFiltersWindow.winfo_exists():
+            return
+          try:
+            courses = results.get_nowait()
+          except queue.Empty:
+            statusVar.set(f"{_SPINNER[frame % len(_SPINNER)]} Loading courses from Canvas API...")
+            courseFiltersWindow.after(100, poll, frame + 1)
+            return
+
+          loadCoursesBtn['state'] = tk.NORMAL
+          refreshBtn['state'] = tk.NORMAL
+          if len(courses) == 0:
+            statusVar.set("No courses loaded from Canvas API! Check the Canvas URL and token.")
+            return
+          self.__courseCache.put(canvasUrl, canvasToken, courses, scope)
+          showCourses(courses)
+          statusVar.set(f"{len(courses)} courses loaded from Canvas API successfully!")
+
+        poll()
 
       def removeBtnClick():
         if listView.curselection():
@@ -103,6 +149,7 @@ class CourseFilterWindow:
       addBtn = tk.Button(master=addFrame, text="Add", font=Font.helv16, command=addBtnClick, fg="black", state=tk.NORMAL)
       btnFrame = tk.Frame(mainFrame, bg="black")
       loadCoursesBtn = tk.Button(master=btnFrame, text="Load courses from Canvas API", font=Font.helv16, command=loadCoursesBtnClick, fg="black", state=tk.NORMAL)
+      refreshBtn = tk.Button(master=btnFrame, text="Refresh", font=Font.helv16, command=lambda : loadCoursesBtnClick(refresh=True), fg="black", state=tk.NORMAL)
       removeBtn = tk.Button(master=btnFrame, text="Remove selected course", font=Font.helv16, command=removeBtnClick, fg="black", state=tk.NORMAL)
       btnFrame2 = tk.Frame(mainFrame, bg="black")
       clearBtn = tk.Button(master=btnFrame2, text="Clear courses", font=Font.helv16, command=clearBtnClick, fg="black", state=tk.NORMAL)
@@ -125,7 +172,8 @@ class CourseFilterWindow:
       labelTitle = label(mainFrame, "Courses to Download", Font.helv24b, 25, tk.CENTER)
       labelTitle.grid(row=0, column=0, padx=2, pady=4, sticky="n")
 
-      descMsg = "To load current courses from the Canvas API, click on the 'Load Courses from Canvas API' button. " + \
+      descMsg = "To load current courses from the Canvas API, click on the 'Load Courses from Canvas API' button " + \
+         "(courses are cached after the first load; click on 'Refresh' to reload them from Canvas). " + \
          "To add a new course, type in the new course code and press the 'Enter' key or click on the 'Add' " + \
          "button. To remove a course, select the course to remove and press the 'Backspace' key or click on the " + \
          "'Remove selected course' button. If empty, all courses will be downloaded. The courses to download are listed below:"
@@ -141,6 +189,7 @@ class CourseFilterWindow:
       
       btnFrame.grid(row=4, column=0, padx=4, pady=2)
       loadCoursesBtn.pack(side=tk.LEFT, padx=4)
+      refreshBtn.pack(side=tk.LEFT, padx=4)
       removeBtn.pack(side=tk.LEFT, padx=4)
       
       btnFrame2.grid(row=5, column=0, padx=4, pady=4)
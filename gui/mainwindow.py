@@ -6,36 +6,33 @@ import threading
 import tkinter as tk
 import tkinter.ttk as ttk
 from downloader import Downloader
-from richtext import RichText
-from gui.components import entry, Font, label
+from downloadqueue import DownloadQueue
+from filters import FilterEngine
+from coursescope import CourseScope
+from RichText import RichText
+from gui.components import configureStyles, entry, Font, label
 from gui.coursefilters import CourseFilterWindow
+from gui.runhistory import RunHistoryWindow
+from gui.plantree import PlanTree
+
+# the number of values stored in the `.values` file
+_VALUE_COUNT = 10
 
 def _loadValues():
   """Loads the values from local storage (`.values` file) when the application is opened (if they exist).
   If values do not exist, the value will be represented as blank for users to enter in the GUI.
 
   Returns:
-    list[str]: A list of [Canvas URL, Canvas API token, Local file save location, Course filters] to be loaded.
+    list[str]: A list of [Canvas URL, Canvas API token, Local file save location, Course filters,
+    Download order, Bandwidth limit, Filter rules, Enrollment state, Favourites only, Term] to be loaded.
   """
   try:
     f = open(".values", "r")
-    lines = f.readlines()
+    lines = [line.rstrip('\n') for line in f.readlines()]
     f.close()
-    print(lines)
-    if len(lines) == 4:
-      return lines
-    elif len(lines) == 3:
-      return [lines[0], lines[1], lines[2], ""]
-    elif len(lines) == 2:
-      return [lines[0], lines[1], "", ""]
-    elif len(lines) == 1:
-      return [lines[0], "", "", ""]
-    elif len(lines) == 0:
-      return ["", "", "", ""]
-    else:
-      return lines[:4]
+    return (lines + [""] * _VALUE_COUNT)[:_VALUE_COUNT]
   except:
-    return ["", "", "", ""]
+    return [""] * _VALUE_COUNT
   
 def _onClose(values : list[str]):
   """Handles the saving of values into local storage (`.values` file) when the application is closed.
@@ -43,14 +40,12 @@ def _onClose(values : list[str]):
   populate the values currently in the `.values` file on re-open (in `_loadValues()`).
 
   Args:
-    values (list[str]): A list of [Canvas URL, Canvas API token, Local file save location, Course filters]
+    values (list[str]): A list of [Canvas URL, Canvas API token, Local file save location, Course filters,
+    Download order, Bandwidth limit, Filter rules, Enrollment state, Favourites only, Term]
   """
   try:
     f = open(".values", "w")
-    for i in range(3):
-      if not values[i].endswith('\n'): 
-        values[i] += '\n'
-    f.writelines(values)
+    f.writelines([value.rstrip('\n') + '\n' for value in values])
     f.close()
   except:
     print("Could not save settings!")
@@ -61,6 +56,7 @@ def runGui():
   window = tk.Tk()
   window.configure(bg="black", padx=20, pady=15)
   window.title("Canvas Downloader")
+  configureStyles()
 
   # the frame variables ending with 1 represent the frame for the 1st column,
   # 2 represents the frame for the 2nd column.
@@ -73,6 +69,16 @@ def runGui():
   frameFilePath2 = tk.Frame(master=window, borderwidth=1, bg="black")
   frameCourseFilters1 = tk.Frame(master=window, borderwidth=1, bg="black")
   frameCourseFilters2 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameDownloadOrder1 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameDownloadOrder2 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameBandwidthLimit1 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameBandwidthLimit2 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameFilterRules1 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameFilterRules2 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameCourseScope1 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameCourseScope2 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameTerm1 = tk.Frame(master=window, borderwidth=1, bg="black")
+  frameTerm2 = tk.Frame(master=window, borderwidth=1, bg="black")
   frameDownloadBtn = tk.Frame(master=window, borderwidth=1)
   frameDownloadInfo = tk.Frame(master=window, borderwidth=1, bg="black")
 
@@ -80,13 +86,29 @@ def runGui():
   # v2 represents the Canvas API token
   # v3 represents the location of the Canvas files on your local machine
   # v4 represents the comma-separated course filters for the Canvas downloader.
-  v1, v2, v3, v4 = _loadValues()
+  # v5 represents the download order policy for the Canvas downloader.
+  # v6 represents the bandwidth limit specification for the Canvas downloader.
+  # v7 represents the semicolon-separated filter rules for the Canvas downloader.
+  # v8, v9 and v10 represent the enrollment state, whether to list favourite courses only ("1" or ""),
+  # and the term of the course scope for the Canvas downloader.
+  v1, v2, v3, v4, v5, v6, v7, v8, v9, v10 = _loadValues()
+  if v8.strip() not in CourseScope.ENROLLMENT_STATES:
+    v8 = ""
+  if v5.strip() not in DownloadQueue.POLICIES:
+    v5 = "api"
   sv4Display = tk.StringVar(value=v4 if v4 != "" else "All courses")
   sv1 = tk.StringVar(value=v1.strip())
   sv2 = tk.StringVar(value=v2.strip())
   sv3 = tk.StringVar(value=v3.strip())
   sv4 = tk.StringVar(value=v4.strip())
+  sv5Display = tk.StringVar(value=DownloadQueue.POLICIES[v5.strip()])
+  sv6 = tk.StringVar(value=v6.strip())
+  sv7 = tk.StringVar(value=v7.strip())
+  sv8Display = tk.StringVar(value=CourseScope.ENROLLMENT_STATES[v8.strip()])
+  iv9 = tk.IntVar(value=1 if v9.strip() == "1" else 0)
+  sv10 = tk.StringVar(value=v10.strip())
   downloadStatus = tk.StringVar(value="Download")
+  pauseStatus = tk.StringVar(value="Pause")
 
   def callback1(var, index, mode):
     nonlocal v1, downloader
@@ -109,23 +131,114 @@ def runGui():
     sv4Display.set(sv4.get() if sv4.get() != "" else "All courses")
     downloader.filters = v4.strip().split(", ")
 
+  def callback5(var, index, mode):
+    nonlocal v5
+    for policy, policyName in DownloadQueue.POLICIES.items():
+      if policyName == sv5Display.get():
+        v5 = policy
+        downloader.downloadOrder = policy
+
+  def callback6(var, index, mode):
+    nonlocal v6
+    # the bandwidth limit is applied immediately, even if a download is in progress
+    try:
+      downloader.rateLimiter.setSpec(sv6.get())
+      v6 = sv6.get()
+      entryBandwidthLimit.configure(style="pad.TEntry")
+    except ValueError:
+      entryBandwidthLimit.configure(style="invalid.TEntry")
+
+  def callback7(var, index, mode):
+    nonlocal v7
+    rules = sv7.get().split(";")
+    try:
+      FilterEngine(rules)
+      v7 = sv7.get()
+      downloader.rules = rules
+      entryFilterRules.configure(style="pad.TEntry")
+    except ValueError:
+      entryFilterRules.configure(style="invalid.TEntry")
+
+  def courseScopeCallback(var, index, mode):
+    nonlocal v8, v9, v10
+    for enrollmentState, enrollmentStateName in CourseScope.ENROLLMENT_STATES.items():
+      if enrollmentStateName == sv8Display.get():
+        v8 = enrollmentState
+    v9 = "1" if iv9.get() == 1 else ""
+    v10 = sv10.get()
+    downloader.courseScope = CourseScope(v8, term=v10, favouritesOnly=(v9 == "1"))
+
   def downloadBtnClick(downloader : Downloader):
     """Handles the click event of the download button (`downloadBtn`).
     """
-    downloadBtn['state'] = tk.DISABLED
-    window.update_idletasks()
+    setRunning(True)
     downloadStatus.set("Downloading...")
     window.update_idletasks()
+    # run the download operation in a separate thread to ensure GUI doesn't freeze
+    # during the download process
+    runInBackground(downloader.run)
+
+  def runInBackground(operation):
+    """Runs an operation of the downloader in a separate thread, and restores the buttons once it ends, whether it
+    succeeds or fails. Tk widgets can only be changed from the main thread, so the end of the operation is polled for
+    from the main thread.
+    """
+    finished = threading.Event()
     def run():
-      downloader.run()
+      try:
+        operation()
+      finally:
+        finished.set()
+
+    def poll():
+      if not finished.is_set():
+        window.after(100, poll)
+        return
       downloadStatus.set("Download")
-      window.update_idletasks()
-      downloadBtn['state'] = tk.NORMAL
-      window.update_idletasks()
+      setRunning(False)
 
-    # run the download operation in a separate thread to ensure GUI doesn't freeze
-    # during the download process
     threading.Thread(target=run).start()
+    window.after(100, poll)
+
+  def setRunning(running : bool):
+    """Enables the pause and cancel buttons while a run is in progress, and the download and verify buttons otherwise.
+    """
+    downloadBtn['state'] = tk.DISABLED if running else tk.NORMAL
+    verifyBtn['state'] = tk.DISABLED if running else tk.NORMAL
+    pauseBtn['state'] = tk.NORMAL if running else tk.DISABLED
+    cancelBtn['state'] = tk.NORMAL if running else tk.DISABLED
+    pauseStatus.set("Pause")
+    window.update_idletasks()
+
+  def pauseBtnClick(downloader : Downloader):
+    """Handles the click event of the pause button (`pauseBtn`), which pauses or resumes the run in progress.
+    """
+    if downloader.isPaused():
+      downloader.resume()
+      pauseStatus.set("Pause")
+    else:
+      downloader.pause()
+      pauseStatus.set("Resume")
+
+  def cancelBtnClick(downloader : Downloader):
+    """Handles the click event of the cancel button (`cancelBtn`), which stops the run in progress once the current
+    file is downloaded. The progress of the run is saved, so the next download continues from where it stopped.
+    """
+    cancelBtn['state'] = tk.DISABLED
+    pauseBtn['state'] = tk.DISABLED
+    downloadStatus.set("Cancelling...")
+    downloader.cancel()
+
+  def verifyBtnClick(downloader : Downloader):
+    """Handles the click event of the verify button (`verifyBtn`), which checks the downloaded files and downloads
+    missing, changed or corrupt files again.
+    """
+    setRunning(True)
+    downloadStatus.set("Verifying...")
+    if downloader.displayArea != None:
+      downloader.displayArea.delete(1.0, tk.END)
+    window.update_idletasks()
+    runInBackground(downloader.verify)
 
   labelIntroText = label(frameIntroText, "Canvas Downloader", Font.helv24b, 25, tk.CENTER)
   labelCanvasUrl = label(frameCanvasUrl1, "Canvas URL: ")
@@ -136,10 +249,27 @@ def runGui():
   entryFilePath = entry(frameFilePath2, text=v3, textvariable=sv3)
   labelCourseFilters1 = label(frameCourseFilters1, text="Download courses: ")
   labelCourseFilters2 = tk.Message(master=frameCourseFilters2, textvariable=sv4Display, font=Font.helv16, width=395, justify=tk.LEFT, bg="black", fg="white")
+  labelDownloadOrder = label(frameDownloadOrder1, text="Download order: ")
+  optionDownloadOrder = tk.OptionMenu(frameDownloadOrder2, sv5Display, *DownloadQueue.POLICIES.values())
+  optionDownloadOrder.config(font=Font.helv16, width=30, fg="black", highlightthickness=0)
+  labelBandwidthLimit = label(frameBandwidthLimit1, text="Bandwidth limit: ")
+  entryBandwidthLimit = entry(frameBandwidthLimit2, text=v6, textvariable=sv6)
+  labelFilterRules = label(frameFilterRules1, text="Filter rules: ")
+  entryFilterRules = entry(frameFilterRules2, text=v7, textvariable=sv7)
+  labelCourseScope = label(frameCourseScope1, text="List courses: ")
+  optionEnrollmentState = tk.OptionMenu(frameCourseScope2, sv8Display, *CourseScope.ENROLLMENT_STATES.values())
+  optionEnrollmentState.config(font=Font.helv16, width=24, fg="black", highlightthickness=0)
+  checkFavourites = tk.Checkbutton(master=frameCourseScope2, text="Favourites only", variable=iv9, font=Font.helv16,
+    bg="black", fg="white", selectcolor="black", activebackground="black", activeforeground="white", highlightthickness=0)
+  labelTerm = label(frameTerm1, text="Term: ")
+  entryTerm = entry(frameTerm2, text=v10, textvariable=sv10)
 
-  scrollDownloadInfo = tk.Scrollbar(master=frameDownloadInfo)
+  # the download log and the sync plan are shown in separate tabs
+  notebookDownloadInfo = ttk.Notebook(master=frameDownloadInfo)
+  frameDownloadLog = tk.Frame(master=notebookDownloadInfo, bg="black")
+  scrollDownloadInfo = tk.Scrollbar(master=frameDownloadLog)
   textDownloadInfo = RichText(
-    master=frameDownloadInfo,
+    master=frameDownloadLog,
     bg="black", 
     fg="white", 
     height=20, 
@@ -148,8 +278,21 @@ def runGui():
   scrollDownloadInfo.config(command=textDownloadInfo.yview)
   scrollDownloadInfo.pack(side=tk.RIGHT, fill=tk.Y)
   textDownloadInfo.config(font=Font.consolas)
+  planTree = PlanTree(notebookDownloadInfo)
+  notebookDownloadInfo.add(frameDownloadLog, text="Log")
+  notebookDownloadInfo.add(planTree.frame, text="Sync Plan")
 
-  downloader = Downloader(v3.strip(), v1.strip(), v2.strip(), v4.strip().split(", "), window, textDownloadInfo)
+  downloader = Downloader(v3.strip(), v1.strip(), v2.strip(), v4.strip().split(", "), window, textDownloadInfo, v5.strip(),
+    courseScope=CourseScope(v8.strip(), term=v10.strip(), favouritesOnly=(v9.strip() == "1")), progressListener=planTree.post)
+  try:
+    FilterEngine(v7.strip().split(";"))
+    downloader.rules = v7.strip().split(";")
+  except ValueError:
+    print("Invalid filter rules! Downloading without filter rules.")
+  try:
+    downloader.rateLimiter.setSpec(v6.strip())
+  except ValueError:
+    print("Invalid bandwidth limit! Downloading without a limit.")
 
   courseFiltersWindow = CourseFilterWindow(window, downloader, sv4)
   courseFiltersButton = tk.Button(
@@ -158,17 +301,48 @@ def runGui():
       font=Font.helv16, command=courseFiltersWindow.open,
       fg="black",
       state=tk.NORMAL)
+  runHistoryWindow = RunHistoryWindow(window, downloader)
+  runHistoryButton = tk.Button(
+      master=frameDownloadBtn,
+      text="Run History...",
+      font=Font.helv16, command=runHistoryWindow.open,
+      fg="black",
+      state=tk.NORMAL)
   downloadBtn = tk.Button(
       master=frameDownloadBtn,
       textvariable=downloadStatus,
       font=Font.helv16, command=lambda : downloadBtnClick(downloader),
       fg="black",
       state=tk.NORMAL)
+  verifyBtn = tk.Button(
+      master=frameDownloadBtn,
+      text="Verify Files",
+      font=Font.helv16, command=lambda : verifyBtnClick(downloader),
+      fg="black",
+      state=tk.NORMAL)
+  pauseBtn = tk.Button(
+      master=frameDownloadBtn,
+      textvariable=pauseStatus,
+      font=Font.helv16, command=lambda : pauseBtnClick(downloader),
+      fg="black",
+      state=tk.DISABLED)
+  cancelBtn = tk.Button(
+      master=frameDownloadBtn,
+      text="Cancel",
+      font=Font.helv16, command=lambda : cancelBtnClick(downloader),
+      fg="black",
+      state=tk.DISABLED)
 
   sv1.trace_add("write", callback1)
   sv2.trace_add("write", callback2)
   sv3.trace_add("write", callback3)
   sv4.trace_add("write", callback4)
+  sv5Display.trace_add("write", callback5)
+  sv6.trace_add("write", callback6)
+  sv7.trace_add("write", callback7)
+  sv8Display.trace_add("write", courseScopeCallback)
+  iv9.trace_add("write", courseScopeCallback)
+  sv10.trace_add("write", courseScopeCallback)
 
   frameIntroText.grid(row=0, column=0, padx=3, pady=4, columnspan=2)
   labelIntroText.pack(fill=tk.X)
@@ -188,12 +362,38 @@ def runGui():
   frameCourseFilters2.grid(row=4, column=1, sticky="we")
   labelCourseFilters1.pack(side="left", anchor="n")
   labelCourseFilters2.pack(side="left", padx=(10, 0))
-  frameDownloadBtn.grid(row=5, column=0, pady=4, columnspan=2)
+  frameDownloadOrder1.grid(row=5, column=0, pady=2)
+  frameDownloadOrder2.grid(row=5, column=1, sticky="w")
+  labelDownloadOrder.pack(side="left")
+  optionDownloadOrder.pack(side="left", padx=(10, 0))
+  frameBandwidthLimit1.grid(row=6, column=0, pady=2)
+  frameBandwidthLimit2.grid(row=6, column=1)
+  labelBandwidthLimit.pack(side="left")
+  entryBandwidthLimit.pack()
+  frameFilterRules1.grid(row=7, column=0, pady=2)
+  frameFilterRules2.grid(row=7, column=1)
+  labelFilterRules.pack(side="left")
+  entryFilterRules.pack()
+  frameCourseScope1.grid(row=8, column=0, pady=2)
+  frameCourseScope2.grid(row=8, column=1, sticky="w")
+  labelCourseScope.pack(side="left")
+  optionEnrollmentState.pack(side="left", padx=(10, 0))
+  checkFavourites.pack(side="left", padx=(10, 0))
+  frameTerm1.grid(row=9, column=0, pady=2)
+  frameTerm2.grid(row=9, column=1)
+  labelTerm.pack(side="left")
+  entryTerm.pack()
+  frameDownloadBtn.grid(row=10, column=0, pady=4, columnspan=2)
   courseFiltersButton.pack(side="left")
   downloadBtn.pack(side="left")
-  frameDownloadInfo.grid(row=6, column=0, pady=4, columnspan=2)
+  pauseBtn.pack(side="left")
+  cancelBtn.pack(side="left")
+  verifyBtn.pack(side="left")
+  runHistoryButton.pack(side="left")
+  frameDownloadInfo.grid(row=11, column=0, pady=4, columnspan=2)
+  notebookDownloadInfo.pack(fill=tk.BOTH, expand=True)
   textDownloadInfo.pack(side=tk.LEFT)
 
   window.mainloop()
 
-  _onClose([v1, v2, v3, v4])
\ No newline at end of file
+  _onClose([v1, v2, v3, v4, v5, v6, v7, v8, v9, v10])
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""Module that renders the sync plan of the Canvas downloader application as a tree of courses, folders and files.
+"""
+
+import queue
+import tkinter as tk
+import tkinter.ttk as ttk
+from filemodels import Course, Folder
+from gui.components import Font
+from runstats import formatBytes
+
+# the statuses of a file that count as synced
+_DONE_STATUSES = { "added", "updated", "moved", "skipped", "verified" }
+
+class PlanTree:
+  """A tree view of the courses, folders and files in the sync plan, with the status and size of each.
+
+  The tree is updated from the downloader's progress events, which are queued by the download thread and applied
+  in batches on the GUI thread. The folders of a course and the files of a folder are only added to the tree when
+  the course or folder is expanded, so that the tree stays small and responsive for very large plans.
+  """
+
+  # the interval between applying the queued progress events, in milliseconds
+  POLL_INTERVAL = 100
+
+  # the maximum number of progress events applied at a time, so that the GUI stays responsive
+  MAX_EVENTS_PER_POLL = 5000
+
+  def __init__(self, master : tk.Misc):
+    self.__events = queue.Queue()
+    self.__courses : dict[int, Course] = {}
+    self.__folders : dict[int, Folder] = {}
+    self.__children : dict[str, list[str]] = {}
+    self.__populated : set[str] = set()
+    self.__status : dict[int, str] = {}
+    self.__parents : dict[int, tuple[str, str]] = {}
+    # the number of synced files, the number of files and the total size of each course and folder
+    self.__totals : dict[str, list[int]] = {}
+
+    self.frame = tk.Frame(master, bg="black")
+    ttk.Style().configure("plan.Treeview", font=Font.consolas, rowheight=20)
+    self.__tree = ttk.Treeview(self.frame, columns=("status", "size"), style="plan.Treeview", height=20)
+    self.__tree.heading("#0", text="Name", anchor=tk.W)
+    self.__tree.heading("status", text="Status", anchor=tk.W)
+    self.__tree.heading("size", text="Size", anchor=tk.E)
+    self.__tree.column("#0", width=520)
+    self.__tree.column("status", width=140)
+    self.__tree.column("size", width=100, anchor=tk.E)
+    scroll = tk.Scrollbar(master=self.frame, command=self.__tree.yview)
+    self.__tree.configure(yscrollcommand=scroll.set)
+    scroll.pack(side=tk.RIGHT, fill=tk.Y)
+    self.__tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+    self.__tree.bind("<<TreeviewOpen>>", self.__onOpen)
+    self.__tree.after(PlanTree.POLL_INTERVAL, self.__poll)
+
+  def post(self, event : str, details : dict):
+    """Queues a progress event of the downloader, to be applied to the tree on the GUI thread. Can be called from any
+    thread, and is used as the downloader's progress listener.
+
+    Args:
+      event (str): The progress event, as described in `Downloader`.
+      details (dict): The details of the event.
+    """
+    self.__events.put((event, details))
+
+  def __poll(self):
+    dirty : set[str] = set()
+    for _ in range(PlanTree.MAX_EVENTS_PER_POLL):
+      try:
+        event, details = self.__events.get_nowait()
+      except queue.Empty:
+        break
+      if event == "plan":
+        self.__clear()
+        dirty.clear()
+      elif event == "folder":
+        self.__addFolder(details["course"], details["folder"], dirty)
+      elif event == "file":
+        self.__setStatus(details["id"], details["status"], dirty)
+
+    for iid in dirty:
+      if self.__tree.exists(iid):
+        self.__tree.item(iid, values=self.__values(iid))
+    self.__tree.after(PlanTree.POLL_INTERVAL, self.__poll)
+
+  def __clear(self):
+    self.__tree.delete(*self.__tree.get_children())
+    self.__courses.clear()
+    self.__folders.clear()
+    self.__children.clear()
+    self.__populated.clear()
+    self.__status.clear()
+    self.__parents.clear()
+    self.__totals.clear()
+
+  def __addFolder(self, course : Course, folder : Folder, dirty : set[str]):
+    courseIid = f"course{course.id}"
+    folderIid = f"folder{folder.id}"
+    if course.id not in self.__courses:
+      self.__courses[course.id] = course
+      self.__children[courseIid] = []
+      self.__totals[courseIid] = [0, 0, 0]
+      self.__insert("", courseIid, f"{course.course_code} {course.name}", True)
+
+    files = folder.files or []
+    self.__folders[folder.id] = folder
+    self.__children[courseIid].append(folderIid)
+    self.__totals[folderIid] = [0, len(files), sum(file.size or 0 for file in files)]
+    for file in files:
+      self.__status[file.id] = "queued"
+      self.__parents[file.id] = (courseIid, folderIid)
+    self.__totals[courseIid][1] += len(files)
+    self.__totals[courseIid][2] += self.__totals[folderIid][2]
+    if courseIid in self.__populated:
+      self.__insert(courseIid, folderIid, folder.getPath(), len(files) > 0)
+    dirty.add(courseIid)
+
+  def __setStatus(self, fileId : int, status : str, dirty : set[str]):
+    if fileId not in self.__parents:
+      return
+    wasDone = self.__status[fileId] in _DONE_STATUSES
+    isDone = status in _DONE_STATUSES
+    self.__status[fileId] = status
+    for iid in self.__parents[fileId]:
+      self.__totals[iid][0] += int(isDone) - int(wasDone)
+      dirty.add(iid)
+    if self.__tree.exists(f"file{fileId}"):
+      self.__tree.set(f"file{fileId}", "status", status)
+
+  def __insert(self, parent : str, iid : str, text : str, hasChildren : bool):
+    self.__tree.insert(parent, tk.END, iid=iid, text=text, values=self.__values(iid))
+    if hasChildren:
+      # a placeholder child makes the node expandable until its children are added
+      self.__tree.insert(iid, tk.END, iid=f"{iid}/placeholder", text="Loading...")
+
+  def __values(self, iid : str) -> tuple[str, str]:
+    done, count, size = self.__totals[iid]
+    return (f"{done} / {count} synced", formatBytes(size))
+
+  def __onOpen(self, event : tk.Event = None):
+    iid = self.__tree.focus()
+    if iid in self.__populated or not self.__tree.exists(f"{iid}/placeholder"):
+      return
+    self.__populated.add(iid)
+    self.__tree.delete(f"{iid}/placeholder")
+    if iid.startswith("course"):
+      for folderIid in self.__children[iid]:
+        folder = self.__folders[int(folderIid[len("folder"):])]
+        self.__insert(iid, folderIid, folder.getPath(), len(folder.files or []) > 0)
+    elif iid.startswith("folder"):
+      for file in self.__folders[int(iid[len("folder"):])].files:
+        self.__tree.insert(iid, tk.END, iid=f"file{file.id}", text=file.display_name,
+          values=(self.__status[file.id], formatBytes(file.size or 0)))
@@ -0,0 +1,62 @@
+"""Module that runs the Run History popup window in the Canvas downloader application.
+"""
+
+from tkinter import Event, Tk, Toplevel
+import tkinter as tk
+from downloader import Downloader
+from gui.components import Font, label
+from runstats import RunStats, formatHistory
+
+class RunHistoryWindow:
+  """A popup window showing the statistics of the previous runs saved in the downloader's root directory."""
+
+  def __init__(self, master : Tk, downloader : Downloader):
+    self.__isOpen = False
+    self.__master = master
+    self.__downloader = downloader
+
+  def close(self, event : Event = None):
+    self.__isOpen = False
+
+  def open(self):
+
+    if not self.__isOpen:
+
+      self.__isOpen = True
+      runHistoryWindow = Toplevel(self.__master, bg="black")
+      runHistoryWindow.title("Run History")
+      runHistoryWindow.geometry("1100x500")
+
+      labelTitle = label(runHistoryWindow, "Run History", Font.helv24b, 25, tk.CENTER)
+      labelTitle.pack(padx=2, pady=4)
+
+      frameHistory = tk.Frame(runHistoryWindow, bg="black")
+      scrollHistory = tk.Scrollbar(master=frameHistory)
+      textHistory = tk.Text(master=frameHistory, bg="black", fg="white", font=Font.consolas, wrap=tk.NONE, yscrollcommand=scrollHistory.set)
+      scrollHistory.config(command=textHistory.yview)
+
+      def refreshBtnClick():
+        textHistory.config(state=tk.NORMAL)
+        textHistory.delete(1.0, tk.END)
+        textHistory.insert(tk.END, formatHistory(RunStats.loadHistory(self.__downloader.root), details=True))
+        textHistory.config(state=tk.DISABLED)
+        textHistory.see(tk.END)
+
+      def closeBtnClick():
+        runHistoryWindow.destroy()
+
+      btnFrame = tk.Frame(runHistoryWindow, bg="black")
+      refreshBtn = tk.Button(master=btnFrame, text="Refresh", font=Font.helv16, command=refreshBtnClick, fg="black", state=tk.NORMAL)
+      closeBtn = tk.Button(master=btnFrame, text="Close Window", font=Font.helv16, command=closeBtnClick, fg="black", state=tk.NORMAL)
+
+      frameHistory.pack(fill=tk.BOTH, expand=True, padx=12, pady=4)
+      scrollHistory.pack(side=tk.RIGHT, fill=tk.Y)
+      textHistory.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+      btnFrame.pack(pady=4)
+      refreshBtn.pack(side=tk.LEFT, padx=4)
+      closeBtn.pack(side=tk.LEFT, padx=4)
+
+      refreshBtnClick()
+
+      runHistoryWindow.bind('<Escape>', lambda event : closeBtnClick())
+      runHistoryWindow.bind('<Destroy>', self.close)
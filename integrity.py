@@ -0,0 +1,43 @@
+"""A module that encapsulates the integrity checking of the downloaded files, by hashing the local copies of the
+files across a pool of processes and comparing them with the hashes stored in the file log (`.files`).
+"""
+
+import hashlib
+
+# the number of bytes to read from the disk at a time when hashing a file
+_READ_SIZE = 1024 * 1024
+
+def hashFile(location : str) -> str:
+  """Computes the SHA-256 hash of a local file.
+
+  Args:
+    location (str): The location of the file.
+
+  Returns:
+    str: The SHA-256 hash of the file's content, or None if the file could not be read.
+  """
+  digest = hashlib.sha256()
+  try:
+    with open(location, "rb") as f:
+      for block in iter(lambda : f.read(_READ_SIZE), b""):
+        digest.update(block)
+  except OSError:
+    return None
+  return digest.hexdigest()
+
+def hashFiles(locations : list[str], workers : int = None) -> dict[str, str]:
+  """Computes the SHA-256 hashes of many local files in parallel, across a pool of processes.
+
+  Args:
+    locations (list[str]): The locations of the files.
+    workers (int, optional): The number of worker processes. Defaults to None, which means the number of CPUs.
+
+  Returns:
+    dict[str, str]: The SHA-256 hash of each file by location, or None for files that could not be read.
+  """
+  if len(locations) == 0:
+    return {}
+  # the process pool (and `multiprocessing`) is only loaded when files are verified
+  from concurrent.futures import ProcessPoolExecutor
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    return dict(zip(locations, executor.map(hashFile, locations, chunksize=16)))
@@ -1,16 +1,18 @@
-"""The main entry point to the application."""
+"""The main entry point to the application. Modules are imported only for the command being run, so that the GUI
+window appears without waiting for the command line and HTTP modules to be loaded.
+"""
 
 import os
-from downloader import Downloader
-from gui.mainwindow import runGui
+import sys
 
-from dotenv import load_dotenv
+if __name__ == "__main__":
+  if len(sys.argv) > 1:
+    # the environment variables (which may be set in a `.env` file) are the defaults of the command line options
+    from dotenv import load_dotenv
+    load_dotenv()
 
-load_dotenv()
-
-root = os.environ.get('SAVE_TO')
-canvasUrl = os.environ.get('CANVAS_URL')
-canvasToken = os.environ.get('CANVAS_TOKEN')
-
-if __name__ == "__main__": 
-  runGui()
\ No newline at end of file
+    from cli import runCli
+    runCli(sys.argv[1:], os.environ.get('SAVE_TO'), os.environ.get('CANVAS_URL'), os.environ.get('CANVAS_TOKEN'))
+  else:
+    from gui.mainwindow import runGui
+    runGui()
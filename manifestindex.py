@@ -0,0 +1,121 @@
+"""A module that encapsulates the manifest index (`.manifest.db`), a SQLite database in the root directory that
+records every downloaded file with its course, folder, name, size, modification date, local path and hash.
+
+The index is updated as files are downloaded, so that the mirror can be queried by file ID, name or path without
+walking the directory tree.
+"""
+
+import sqlite3
+
+from filemodels import Course, File, Folder
+
+# the columns of the index, in the order they are returned
+COLUMNS = ["id", "course_code", "course_name", "folder_path", "display_name", "size", "modified_at", "local_path", "sha256"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+  id INTEGER PRIMARY KEY,
+  course_code TEXT NOT NULL,
+  course_name TEXT,
+  folder_path TEXT NOT NULL,
+  display_name TEXT NOT NULL,
+  size INTEGER,
+  modified_at TEXT,
+  local_path TEXT,
+  sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS files_course_code ON files (course_code);
+CREATE INDEX IF NOT EXISTS files_local_path ON files (local_path);
+"""
+
+def _likePattern(pattern : str) -> str:
+  """Converts a glob pattern (with `*` and `?`) into a SQL `LIKE` pattern. A pattern without wildcards matches any
+  value containing it.
+
+  Args:
+    pattern (str): The glob pattern.
+
+  Returns:
+    str: The `LIKE` pattern, with `\\` as the escape character.
+  """
+  escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+  if "*" not in pattern and "?" not in pattern:
+    return f"%{escaped}%"
+  return escaped.replace("*", "%").replace("?", "_")
+
+class ManifestIndex:
+  """The manifest index of the files downloaded into a root directory."""
+
+  def __init__(self, indexLocation : str):
+    """Opens the manifest index, creating it if it does not exist.
+
+    Args:
+      indexLocation (str): The location of the index database (usually `{root}/.manifest.db`).
+    """
+    self._connection = sqlite3.connect(indexLocation)
+    self._connection.row_factory = sqlite3.Row
+    self._connection.executescript(_SCHEMA)
+
+  def record(self, course : Course, folder : Folder, file : File, localPath : str, sha256 : str = None):
+    """Records a downloaded file in the index, replacing any previous record of the file. The change is only saved
+    once `commit` is called.
+
+    Args:
+      course (Course): The course of the file.
+      folder (Folder): The folder of the file.
+      file (File): The file.
+      localPath (str): The path the file is saved to, relative to the root directory.
+      sha256 (str, optional): The SHA-256 hash of the file's content, if known. Defaults to None.
+    """
+    self._connection.execute(
+      f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+      (file.id, course.course_code, course.name, folder.getPath(), file.display_name, file.size, file.modified_at, localPath, sha256),
+    )
+
+  def commit(self):
+    """Saves the changes recorded since the last commit."""
+    self._connection.commit()
+
+  def close(self):
+    """Saves the changes and closes the index."""
+    self._connection.commit()
+    self._connection.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def find(self, id : int) -> dict:
+    """Finds a file in the index by its Canvas file ID.
+
+    Args:
+      id (int): The Canvas file ID.
+
+    Returns:
+      dict: The record of the file, with the keys in `COLUMNS`, or None if the file is not in the index.
+    """
+    row = self._connection.execute(f"SELECT {', '.join(COLUMNS)} FROM files WHERE id = ?", (id,)).fetchone()
+    return dict(row) if row is not None else None
+
+  def search(self, pattern : str, courseCode : str = None, limit : int = 50) -> list[dict]:
+    """Searches the index for files whose name or local path matches a pattern (case-insensitive).
+
+    Args:
+      pattern (str): A glob pattern with `*` and `?` wildcards, or text that the name or path must contain.
+      courseCode (str, optional): Only search the files of the course with this course code. Defaults to None.
+      limit (int, optional): The maximum number of files to return. Defaults to 50.
+
+    Returns:
+      list[dict]: The records of the matching files, ordered by local path.
+    """
+    likePattern = _likePattern(pattern)
+    query = f"SELECT {', '.join(COLUMNS)} FROM files WHERE (display_name LIKE ? ESCAPE '\\' OR local_path LIKE ? ESCAPE '\\')"
+    params : list = [likePattern, likePattern]
+    if courseCode is not None:
+      query += " AND course_code = ?"
+      params.append(courseCode)
+    query += " ORDER BY local_path LIMIT ?"
+    params.append(limit)
+    return [dict(row) for row in self._connection.execute(query, params)]
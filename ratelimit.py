@@ -0,0 +1,179 @@
+"""A module that encapsulates the bandwidth limiting capability of the Canvas file downloader.
+
+The bandwidth limit is given as a limit specification, a comma-separated list of rates. A rate is a number of
+bytes per second with an optional `K`, `M` or `G` suffix (e.g. `500K`), or `0`/`off` for no limit. A rate may be
+prefixed by a time-of-day window in the format `HH:MM-HH:MM=`, in which case the rate only applies within that
+window. The rate without a window applies at all other times. For example, `09:00-17:00=500K, 5M` limits the
+download speed to 500 KB/s during working hours and 5 MB/s otherwise.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+_UNITS = { "": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3 }
+
+def _parseBytes(amount : str) -> float:
+  """Parses an amount with an optional `K`, `M` or `G` suffix and an optional `B` (e.g. `500MB`) into bytes."""
+  amount = amount.strip().upper().removesuffix("B")
+  unit = amount[-1] if amount != "" and amount[-1] in _UNITS else ""
+  return float(amount[:len(amount) - len(unit)]) * _UNITS[unit]
+
+def parseSize(size : str) -> int:
+  """Parses a size with an optional `K`, `M` or `G` suffix (e.g. `500M`) into a number of bytes.
+
+  Args:
+    size (str): The size to parse.
+
+  Returns:
+    int: The number of bytes.
+  """
+  return int(_parseBytes(size))
+
+def parseRate(rate : str) -> float:
+  """Parses a rate (e.g. `500K`) into a number of bytes per second.
+
+  Args:
+    rate (str): The rate to parse.
+
+  Returns:
+    float: The number of bytes per second, or None if the rate is unlimited.
+  """
+  rate = rate.strip().upper().removesuffix("/S")
+  if rate in ("", "0", "OFF"):
+    return None
+  value = _parseBytes(rate)
+  if value <= 0:
+    raise ValueError(f"Invalid rate: {rate}")
+  return value
+
+def _parseTime(timeStr : str) -> int:
+  """Parses a time of day in the format `HH:MM` into the number of minutes after midnight."""
+  hours, minutes = timeStr.strip().split(":")
+  # `24:00` is allowed as the end of the day
+  if not (0 <= int(hours) < 24 and 0 <= int(minutes) < 60 or int(hours) == 24 and int(minutes) == 0):
+    raise ValueError(f"Invalid time: {timeStr}")
+  return int(hours) * 60 + int(minutes)
+
+class ScheduleWindow:
+  """A time-of-day window within which a specific bandwidth limit applies."""
+
+  def __init__(self, start : int, end : int, rate : float):
+    """Creates a schedule window.
+
+    Args:
+      start (int): The start of the window, in minutes after midnight.
+      end (int): The end of the window, in minutes after midnight. If before `start`, the window wraps
+      around midnight.
+      rate (float): The number of bytes per second allowed within the window, or None if unlimited.
+    """
+    self.start = start
+    self.end = end
+    self.rate = rate
+
+  def contains(self, minute : int) -> bool:
+    """Checks whether a time of day falls within the window.
+
+    Args:
+      minute (int): The time of day, in minutes after midnight.
+
+    Returns:
+      bool: True if the time of day is within the window, False otherwise.
+    """
+    if self.start <= self.end:
+      return self.start <= minute < self.end
+    return minute >= self.start or minute < self.end
+
+class TokenBucket:
+  """A thread-safe token bucket rate limiter. A single token bucket is shared by all the transfers of a downloader,
+  so that the total download speed stays within the limit. The limit can be changed while transfers are in progress.
+  """
+
+  def __init__(self, spec : str = ""):
+    """Creates a token bucket rate limiter.
+
+    Args:
+      spec (str, optional): The limit specification, as described in the module documentation. Defaults to "",
+      which means no limit.
+    """
+    self._lock = threading.Lock()
+    self._tokens = 0.0
+    self._lastRefill = time.monotonic()
+    self.setSpec(spec)
+
+  def setSpec(self, spec : str):
+    """Changes the limit specification of the token bucket. Takes effect immediately, including for transfers in progress.
+
+    Args:
+      spec (str): The limit specification, as described in the module documentation.
+
+    Raises:
+      ValueError: If the limit specification is invalid.
+    """
+    rate = None
+    schedule : list[ScheduleWindow] = []
+    for part in spec.split(","):
+      if part.strip() == "":
+        continue
+      try:
+        if "=" in part:
+          window, windowRate = part.split("=", 1)
+          start, end = window.split("-", 1)
+          schedule.append(ScheduleWindow(_parseTime(start), _parseTime(end), parseRate(windowRate)))
+        else:
+          rate = parseRate(part)
+      except ValueError:
+        raise ValueError(f"Invalid limit: {part.strip()} (expected a rate like 500K, or a window like 09:00-17:00=500K)") from None
+
+    with self._lock:
+      self.spec = spec
+      self._rate = rate
+      self._schedule = schedule
+      self._tokens = min(self._tokens, 0.0)
+
+  def currentRate(self) -> float:
+    """Returns the bandwidth limit at the current time of day.
+
+    Returns:
+      float: The number of bytes per second currently allowed, or None if unlimited.
+    """
+    now = datetime.now()
+    minute = now.hour * 60 + now.minute
+    for window in self._schedule:
+      if window.contains(minute):
+        return window.rate
+    return self._rate
+
+  def consume(self, amount : int):
+    """Takes a number of bytes from the bucket, blocking until the transfer of those bytes is within the limit.
+
+    Args:
+      amount (int): The number of bytes transferred.
+    """
+    with self._lock:
+      self._refill()
+      if self.currentRate() is None:
+        return
+      self._tokens -= amount
+
+    while True:
+      with self._lock:
+        self._refill()
+        rate = self.currentRate()
+        if rate is None or self._tokens >= 0:
+          return
+        wait = -self._tokens / rate
+      # sleep in short intervals, so that a change in the limit takes effect quickly
+      time.sleep(min(wait, 0.25))
+
+  def _refill(self):
+    """Adds the tokens accumulated since the last refill to the bucket. The bucket holds at most one second's worth
+    of tokens. Must be called with the lock held.
+    """
+    now = time.monotonic()
+    rate = self.currentRate()
+    if rate is None:
+      self._tokens = 0.0
+    else:
+      self._tokens = min(self._tokens + (now - self._lastRefill) * rate, rate)
+    self._lastRefill = now
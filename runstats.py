@@ -0,0 +1,249 @@
+"""A module containing the statistics collected during a run of the Canvas file downloader, and the run history
+which is saved as one JSON record per line in the locally-stored run log (`.runs`) in the root directory.
+"""
+
+import contextlib
+import heapq
+import json
+import threading
+import time
+
+# the requests of a run may be recorded from several threads at once (the lock is not kept in the statistics, which
+# are pickled by batch runs)
+_recordLock = threading.Lock()
+
+class RunStats:
+  """The statistics of a single run of the Canvas file downloader."""
+
+  FIELDS = ["added", "updated", "moved", "skipped", "failed", "bytes", "requests"]
+
+  # the number of slowest requests kept in the statistics
+  SLOWEST_COUNT = 5
+
+  def __init__(self, added : int = 0, updated : int = 0, moved : int = 0, skipped : int = 0, failed : int = 0, bytes : int = 0, requests : int = 0):
+    """Creates a run statistics object.
+
+    Args:
+      added (int, optional): The number of new files downloaded. Defaults to 0.
+      updated (int, optional): The number of updated files downloaded. Defaults to 0.
+      moved (int, optional): The number of files renamed or moved locally instead of being downloaded. Defaults to 0.
+      skipped (int, optional): The number of files that did not require an update. Defaults to 0.
+      failed (int, optional): The number of files that failed to download. Defaults to 0.
+      bytes (int, optional): The number of bytes downloaded. Defaults to 0.
+      requests (int, optional): The number of requests made to the Canvas API. Defaults to 0.
+    """
+    self.added = added
+    self.updated = updated
+    self.moved = moved
+    self.skipped = skipped
+    self.failed = failed
+    self.bytes = bytes
+    self.requests = requests
+    self.command = "download"
+    self.cancelled = False
+    self.startedAt : float = None
+    self.endedAt : float = None
+    self.phases : dict[str, float] = {}
+    self.slowest : list[tuple[float, str]] = []
+
+  def add(self, other : "RunStats"):
+    """Adds the counts of another run statistics object to this object.
+
+    Args:
+      other (RunStats): The run statistics to add.
+    """
+    for field in RunStats.FIELDS:
+      setattr(self, field, getattr(self, field) + getattr(other, field))
+
+  def start(self, command : str = "download"):
+    """Marks the start of the run.
+
+    Args:
+      command (str, optional): The command being run, either "download" or "verify". Defaults to "download".
+    """
+    self.command = command
+    self.startedAt = time.time()
+
+  def finish(self):
+    """Marks the end of the run."""
+    self.endedAt = time.time()
+
+  @contextlib.contextmanager
+  def phase(self, name : str):
+    """A context manager that times a phase of the run (e.g. `crawl` or `download`).
+
+    Args:
+      name (str): The name of the phase.
+    """
+    start = time.monotonic()
+    try:
+      yield
+    finally:
+      self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - start
+
+  def recordRequest(self, description : str, duration : float):
+    """Records a Canvas API request in the statistics, keeping track of the slowest requests.
+
+    Args:
+      description (str): The description of the request (e.g. the API path).
+      duration (float): The duration of the request, in seconds.
+    """
+    with _recordLock:
+      self.requests += 1
+      entry = (duration, description)
+      if len(self.slowest) < RunStats.SLOWEST_COUNT:
+        heapq.heappush(self.slowest, entry)
+      elif entry > self.slowest[0]:
+        heapq.heapreplace(self.slowest, entry)
+
+  def duration(self) -> float:
+    """Returns the duration of the run.
+
+    Returns:
+      float: The duration of the run in seconds, or 0 if the run has not finished.
+    """
+    if self.startedAt is None or self.endedAt is None:
+      return 0.0
+    return self.endedAt - self.startedAt
+
+  def toDict(self) -> dict:
+    """Returns the run statistics as a dictionary that can be saved as JSON.
+
+    Returns:
+      dict: The run statistics.
+    """
+    return {
+      "command": self.command,
+      "cancelled": self.cancelled,
+      "startedAt": self.startedAt,
+      "endedAt": self.endedAt,
+      **{ field : getattr(self, field) for field in RunStats.FIELDS },
+      "phases": { name : round(seconds, 3) for name, seconds in self.phases.items() },
+      "slowest": [[round(duration, 3), description] for duration, description in sorted(self.slowest, reverse=True)],
+    }
+
+  @classmethod
+  def fromDict(cls, statsDict : dict) -> "RunStats":
+    """Creates a run statistics object from a dictionary created by `toDict`.
+
+    Args:
+      statsDict (dict): The run statistics as a dictionary.
+
+    Returns:
+      RunStats: The run statistics object.
+    """
+    stats = cls(**{ field : statsDict.get(field, 0) for field in RunStats.FIELDS })
+    stats.command = statsDict.get("command", "download")
+    stats.cancelled = statsDict.get("cancelled", False)
+    stats.startedAt = statsDict.get("startedAt")
+    stats.endedAt = statsDict.get("endedAt")
+    stats.phases = statsDict.get("phases", {})
+    stats.slowest = [(duration, description) for duration, description in statsDict.get("slowest", [])]
+    return stats
+
+  def save(self, root : str):
+    """Appends the run statistics to the run log (`.runs`) in the root directory.
+
+    Args:
+      root (str): The root directory the files are saved into.
+    """
+    try:
+      with open(f"{root}/.runs", "a") as f:
+        f.write(json.dumps(self.toDict(), separators=(",", ":")) + "\n")
+    except OSError:
+      print("Could not save the run statistics!")
+
+  @classmethod
+  def loadHistory(cls, root : str) -> list["RunStats"]:
+    """Loads the statistics of all the previous runs from the run log (`.runs`) in the root directory.
+
+    Args:
+      root (str): The root directory the files are saved into.
+
+    Returns:
+      list[RunStats]: The statistics of the previous runs, oldest first. Invalid records are skipped.
+    """
+    history = []
+    try:
+      with open(f"{root}/.runs", "r") as f:
+        for line in f:
+          try:
+            history.append(cls.fromDict(json.loads(line)))
+          except (ValueError, TypeError):
+            continue
+    except OSError:
+      return []
+    return history
+
+  def __str__(self) -> str:
+    return f"{self.added} added, {self.updated} updated, {self.moved} moved, {self.skipped} skipped, {self.failed} failed, {formatBytes(self.bytes)}"
+
+def formatBytes(size : int) -> str:
+  """Formats a number of bytes in a human-readable form (e.g. `1.5 MB`).
+
+  Args:
+    size (int): The number of bytes.
+
+  Returns:
+    str: The human-readable number of bytes.
+  """
+  for unit in ["B", "KB", "MB", "GB"]:
+    if size < 1024 or unit == "GB":
+      return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+    size /= 1024
+
+def _change(current : float, previous : float) -> str:
+  """Formats the change between a value of a run and the value of the previous run as a percentage (e.g. `+12%`).
+
+  Args:
+    current (float): The value of the run.
+    previous (float): The value of the previous run, or None if there is no previous run.
+
+  Returns:
+    str: The percentage change, or an empty string if there is no previous value to compare with.
+  """
+  if previous is None or previous == 0:
+    return ""
+  return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+def formatHistory(history : list[RunStats], limit : int = 20, details : bool = False) -> str:
+  """Formats the run history as a report, with one line per run and the change in the crawl time and download
+  throughput from the previous run.
+
+  Args:
+    history (list[RunStats]): The statistics of the previous runs, oldest first.
+    limit (int, optional): The maximum number of the most recent runs to include. Defaults to 20.
+    details (bool, optional): Whether to include the phase durations and slowest requests of each run. Defaults to False.
+
+  Returns:
+    str: The run history report.
+  """
+  if len(history) == 0:
+    return "No runs recorded yet."
+
+  lines = []
+  startIndex = max(0, len(history) - limit)
+  for index in range(startIndex, len(history)):
+    run = history[index]
+    previous = history[index - 1] if index > 0 else None
+    crawlTime = run.phases.get("crawl", 0.0)
+    downloadTime = run.phases.get("download", 0.0)
+    throughput = run.bytes / downloadTime if downloadTime > 0 else 0.0
+    # throughput is only compared between runs that downloaded files
+    previousThroughput = None
+    if previous is not None and previous.bytes > 0 and previous.phases.get("download", 0.0) > 0:
+      previousThroughput = previous.bytes / previous.phases["download"]
+    throughputStr = f"{formatBytes(throughput)}/s{_change(throughput, previousThroughput)}" if run.bytes > 0 else "-"
+    startedAt = time.strftime("%Y-%m-%d %H:%M", time.localtime(run.startedAt)) if run.startedAt else "unknown"
+
+    lines.append(
+      f"{startedAt} {run.command:<8} {run.duration():7.1f}s  {run.requests:5d} requests  "
+      f"crawl {crawlTime:6.1f}s{_change(crawlTime, previous.phases.get('crawl') if previous else None)}  "
+      f"{throughputStr}  {run}{' (cancelled)' if run.cancelled else ''}"
+    )
+    if details:
+      phases = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in run.phases.items())
+      lines.append(f"    phases: {phases}")
+      for duration, description in sorted(run.slowest, reverse=True):
+        lines.append(f"    slow request: {duration:.2f}s {description}")
+  return "\n".join(lines)
@@ -0,0 +1,461 @@
+"""A module that encapsulates the storage sinks the Canvas file downloader saves the downloaded files into.
+
+Files are identified within a sink by their path relative to the root directory (e.g. `CS1101S/Lectures/L1.pdf`),
+and their content is streamed into the sink as it is downloaded. The following sinks are supported:
+
+- `local`: Saves each file as a separate file under the root directory.
+- `tar` and `zip`: Saves the files of each course into a single archive in the root directory (e.g. `CS1101S.tar`),
+  which avoids creating a file on disk for every downloaded file. Archives are only ever appended to, so a file that
+  is updated on Canvas is added to the archive again, and the latest copy is the one extracted last. Files are spooled
+  while they are downloaded, and appended to their archive once complete.
+- `s3://bucket/prefix`: Uploads the files into an S3-compatible object store, under the given key prefix. Requires
+  the optional `boto3` package. The endpoint of a non-AWS object store can be given with `endpointUrl`.
+
+The file log, run history and other records of the downloader are always saved in the local root directory.
+"""
+
+import os
+import pathlib
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+
+SINKS = {
+  "local": "Separate files in the root directory",
+  "tar": "A tar archive per course in the root directory",
+  "zip": "A zip archive per course in the root directory",
+  "s3://bucket/prefix": "An S3-compatible object store (requires boto3)",
+}
+
+class SinkWriter:
+  """Writes the content of a single file into a sink. Used as a context manager: the file is only saved if the
+  `with` block completes, and is discarded if the block raises an exception.
+  """
+
+  def write(self, data : bytes):
+    """Writes the next chunk of the file's content.
+
+    Args:
+      data (bytes): The chunk to write.
+    """
+    raise NotImplementedError
+
+  def commit(self):
+    """Saves the file once all its content has been written."""
+
+  def abort(self):
+    """Discards the file, leaving the sink as it was before the file was written."""
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exceptionType, exception, traceback):
+    if exceptionType is None:
+      self.commit()
+    else:
+      self.abort()
+
+class StorageSink:
+  """The interface of a storage sink."""
+
+  name = ""
+
+  def open(self, path : str, size : int = None) -> SinkWriter:
+    """Starts writing a file into the sink, replacing any existing file at the path once it is saved.
+
+    Args:
+      path (str): The path of the file, relative to the root directory.
+      size (int, optional): The size of the file in bytes, if known. Defaults to None.
+
+    Returns:
+      SinkWriter: The writer of the file's content.
+    """
+    raise NotImplementedError
+
+  def exists(self, path : str) -> bool:
+    """Checks whether a file exists in the sink.
+
+    Args:
+      path (str): The path of the file, relative to the root directory.
+
+    Returns:
+      bool: True if the file exists, False otherwise.
+    """
+    raise NotImplementedError
+
+  def move(self, oldPath : str, newPath : str) -> bool:
+    """Moves a file within the sink.
+
+    Args:
+      oldPath (str): The current path of the file, relative to the root directory.
+      newPath (str): The new path of the file, relative to the root directory.
+
+    Returns:
+      bool: True if the file was moved, False if the sink does not support moving files or the move failed.
+    """
+    return False
+
+  def makeFolder(self, path : str):
+    """Creates a folder in the sink, for sinks where empty folders exist.
+
+    Args:
+      path (str): The path of the folder, relative to the root directory.
+    """
+
+  def localLocation(self, path : str) -> str:
+    """Returns the location of a file on the local filesystem, for sinks that save files as separate local files.
+
+    Args:
+      path (str): The path of the file, relative to the root directory.
+
+    Returns:
+      str: The local location of the file, or None if the sink does not save files locally.
+    """
+    return None
+
+  def close(self):
+    """Closes the sink once all the files have been written."""
+
+class _LocalWriter(SinkWriter):
+  """Writes a file into a temporary `.part` file, which replaces the file once it is saved."""
+
+  def __init__(self, location : str):
+    self._location = location
+    self._partLocation = f"{location}.part"
+    pathlib.Path(location).parent.mkdir(parents=True, exist_ok=True)
+    self._file = open(self._partLocation, "wb")
+
+  def write(self, data : bytes):
+    self._file.write(data)
+
+  def commit(self):
+    self._file.close()
+    os.replace(self._partLocation, self._location)
+
+  def abort(self):
+    self._file.close()
+    if os.path.exists(self._partLocation):
+      os.remove(self._partLocation)
+
+class LocalSink(StorageSink):
+  """Saves each file as a separate file under the root directory."""
+
+  name = "local"
+
+  def __init__(self, root : str = ""):
+    """Creates a local sink.
+
+    Args:
+      root (str, optional): The root directory. Defaults to "", which means paths are used as they are.
+    """
+    self.root = root
+
+  def localLocation(self, path : str) -> str:
+    return os.path.join(self.root, path) if self.root != "" else path
+
+  def open(self, path : str, size : int = None) -> SinkWriter:
+    return _LocalWriter(self.localLocation(path))
+
+  def exists(self, path : str) -> bool:
+    return os.path.exists(self.localLocation(path))
+
+  def move(self, oldPath : str, newPath : str) -> bool:
+    try:
+      pathlib.Path(self.localLocation(newPath)).parent.mkdir(parents=True, exist_ok=True)
+      os.replace(self.localLocation(oldPath), self.localLocation(newPath))
+      return True
+    except OSError:
+      return False
+
+  def makeFolder(self, path : str):
+    pathlib.Path(self.localLocation(path)).mkdir(parents=True, exist_ok=True)
+
+class _ArchiveWriter(SinkWriter):
+  """Writes a file into an archive. The content is spooled into memory, or into a temporary file in the root directory
+  for large files, and only appended to the archive on commit, holding the archive's lock, so that files of the same
+  archive can be downloaded concurrently. If the file turns out to be of a different size than expected, it is not
+  appended.
+  """
+
+  # the size up to which the content of a file is spooled into memory
+  SPOOL_SIZE = 8 * 1024 * 1024
+
+  def __init__(self, archive : tarfile.TarFile | zipfile.ZipFile, lock : threading.Lock, names : set[str], name : str, root : str, size : int = None):
+    self._archive = archive
+    self._lock = lock
+    self._names = names
+    self._name = name
+    self._size = size
+    self._spool = tempfile.SpooledTemporaryFile(_ArchiveWriter.SPOOL_SIZE, dir=root)
+
+  def write(self, data : bytes):
+    self._spool.write(data)
+
+  def commit(self):
+    try:
+      written = self._spool.tell()
+      if self._size is not None and written != self._size:
+        raise IOError(f"Incomplete file: {written} of {self._size} bytes")
+      self._spool.seek(0)
+      with self._lock:
+        self._append(written)
+        self._names.add(self._name)
+    finally:
+      self._spool.close()
+
+  def abort(self):
+    self._spool.close()
+
+  def _append(self, size : int):
+    """Appends the spooled content of the file to the archive, leaving the archive as it was if appending fails.
+
+    Args:
+      size (int): The size of the file.
+    """
+    raise NotImplementedError
+
+class _TarWriter(_ArchiveWriter):
+  """Writes a file into a tar archive. If appending the file fails, the archive is truncated back to its state before
+  the file.
+  """
+
+  def _append(self, size : int):
+    archive = self._archive
+    info = tarfile.TarInfo(self._name)
+    info.size = size
+    info.mtime = int(time.time())
+    offset = archive.offset
+    try:
+      header = info.tobuf(archive.format, archive.encoding, archive.errors)
+      archive.fileobj.write(header)
+      shutil.copyfileobj(self._spool, archive.fileobj)
+      # the content is padded to a whole number of tar blocks
+      blocks, remainder = divmod(size, tarfile.BLOCKSIZE)
+      if remainder > 0:
+        archive.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+        blocks += 1
+      archive.fileobj.flush()
+    except Exception:
+      archive.fileobj.seek(offset)
+      archive.fileobj.truncate()
+      raise
+    archive.offset = offset + len(header) + blocks * tarfile.BLOCKSIZE
+
+class _ZipWriter(_ArchiveWriter):
+  """Writes a file into a zip archive, without compression. If appending the file fails, the archive is truncated back
+  to its state before the file.
+  """
+
+  def _append(self, size : int):
+    archive = self._archive
+    info = zipfile.ZipInfo(self._name, time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    previous = archive.NameToInfo.get(self._name)
+    with warnings.catch_warnings():
+      # an updated file is added again under the same name
+      warnings.simplefilter("ignore", UserWarning)
+      entry = archive.open(info, "w", force_zip64=True)
+    try:
+      shutil.copyfileobj(self._spool, entry)
+      entry.close()
+    except Exception:
+      entry.close()
+      # remove the incomplete entry, so that the central directory is written where the entry started
+      archive.filelist.remove(info)
+      if previous is not None:
+        archive.NameToInfo[self._name] = previous
+      else:
+        archive.NameToInfo.pop(self._name, None)
+      archive.start_dir = info.header_offset
+      archive.fp.seek(info.header_offset)
+      archive.fp.truncate()
+      raise
+
+class ArchiveSink(StorageSink):
+  """Saves the files of each course into a single tar or zip archive in the root directory."""
+
+  def __init__(self, root : str, format : str = "tar"):
+    """Creates an archive sink.
+
+    Args:
+      root (str): The root directory to save the archives into.
+      format (str, optional): The archive format, "tar" or "zip". Defaults to "tar".
+    """
+    self.root = root
+    self.name = format
+    self._archives : dict[str, tarfile.TarFile | zipfile.ZipFile] = {}
+    self._names : dict[str, set[str]] = {}
+    # the locks of the archives, held while a file is appended to the archive
+    self._locks : dict[str, threading.Lock] = {}
+    self._archivesLock = threading.Lock()
+
+  def _archive(self, path : str) -> tuple[tarfile.TarFile | zipfile.ZipFile, str]:
+    """Opens the archive of the course a file belongs to, and returns it with the file's name within the archive.
+
+    Args:
+      path (str): The path of the file, relative to the root directory.
+
+    Returns:
+      tuple[tarfile.TarFile | zipfile.ZipFile, str]: The archive and the name of the file within the archive.
+    """
+    course, _, name = path.partition("/")
+    with self._archivesLock:
+      if course not in self._archives:
+        location = os.path.join(self.root, f"{course}.{self.name}")
+        pathlib.Path(self.root).mkdir(parents=True, exist_ok=True)
+        if self.name == "tar":
+          archive = tarfile.open(location, "a", format=tarfile.PAX_FORMAT)
+          self._names[course] = set(archive.getnames())
+        else:
+          archive = zipfile.ZipFile(location, "a", allowZip64=True)
+          self._names[course] = set(archive.namelist())
+        self._archives[course] = archive
+        self._locks[course] = threading.Lock()
+      return self._archives[course], name
+
+  def open(self, path : str, size : int = None) -> SinkWriter:
+    archive, name = self._archive(path)
+    course = path.partition("/")[0]
+    # the name is only added to the names in the archive once the writer commits the file
+    writer = _TarWriter if self.name == "tar" else _ZipWriter
+    return writer(archive, self._locks[course], self._names[course], name, self.root, size)
+
+  def exists(self, path : str) -> bool:
+    _, name = self._archive(path)
+    return name in self._names[path.partition("/")[0]]
+
+  def close(self):
+    for archive in self._archives.values():
+      archive.close()
+    self._archives.clear()
+    self._names.clear()
+
+class _S3Writer(SinkWriter):
+  """Uploads a file into an S3 bucket as it is written, in a single request for small files, and as a multipart
+  upload of `S3Sink.PART_SIZE` parts for large files.
+  """
+
+  def __init__(self, client, bucket : str, key : str):
+    self._client = client
+    self._bucket = bucket
+    self._key = key
+    self._buffer = bytearray()
+    self._uploadId = None
+    self._parts = []
+
+  def _uploadPart(self):
+    if self._uploadId is None:
+      self._uploadId = self._client.create_multipart_upload(Bucket=self._bucket, Key=self._key)["UploadId"]
+    partNumber = len(self._parts) + 1
+    response = self._client.upload_part(Bucket=self._bucket, Key=self._key, UploadId=self._uploadId, PartNumber=partNumber, Body=bytes(self._buffer))
+    self._parts.append({ "ETag": response["ETag"], "PartNumber": partNumber })
+    self._buffer.clear()
+
+  def write(self, data : bytes):
+    self._buffer += data
+    if len(self._buffer) >= S3Sink.PART_SIZE:
+      self._uploadPart()
+
+  def commit(self):
+    try:
+      if self._uploadId is None:
+        self._client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer))
+        return
+      if len(self._buffer) > 0:
+        self._uploadPart()
+      self._client.complete_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._uploadId, MultipartUpload={ "Parts": self._parts })
+    except Exception:
+      self.abort()
+      raise
+
+  def abort(self):
+    self._buffer.clear()
+    if self._uploadId is not None:
+      self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._uploadId)
+      self._uploadId = None
+
+class S3Sink(StorageSink):
+  """Uploads the files into an S3-compatible object store."""
+
+  name = "s3"
+
+  # the size of the parts of a multipart upload (S3 requires at least 5 MB for all but the last part)
+  PART_SIZE = 8 * 1024 * 1024
+
+  def __init__(self, bucket : str, prefix : str = "", endpointUrl : str = None):
+    """Creates an S3 sink. The credentials are read by `boto3` from the environment or its configuration files.
+
+    Args:
+      bucket (str): The name of the bucket.
+      prefix (str, optional): The key prefix to upload the files under. Defaults to "".
+      endpointUrl (str, optional): The endpoint of the object store, for S3-compatible stores other than AWS.
+      Defaults to None.
+
+    Raises:
+      ImportError: If `boto3` is not installed.
+    """
+    import boto3
+    self.bucket = bucket
+    self.prefix = prefix.strip("/")
+    self._client = boto3.client("s3", endpoint_url=endpointUrl)
+
+  def _key(self, path : str) -> str:
+    return posixpath.join(self.prefix, path) if self.prefix != "" else path
+
+  def open(self, path : str, size : int = None) -> SinkWriter:
+    return _S3Writer(self._client, self.bucket, self._key(path))
+
+  def exists(self, path : str) -> bool:
+    try:
+      self._client.head_object(Bucket=self.bucket, Key=self._key(path))
+      return True
+    except Exception:
+      return False
+
+  def move(self, oldPath : str, newPath : str) -> bool:
+    try:
+      self._client.copy_object(Bucket=self.bucket, Key=self._key(newPath), CopySource={ "Bucket": self.bucket, "Key": self._key(oldPath) })
+      self._client.delete_object(Bucket=self.bucket, Key=self._key(oldPath))
+      return True
+    except Exception:
+      return False
+
+def validateStorage(storage : str):
+  """Checks a storage sink specification, without creating the sink.
+
+  Args:
+    storage (str): The sink specification, `local`, `tar`, `zip` or `s3://bucket/prefix`.
+
+  Raises:
+    ValueError: If the sink specification is invalid.
+  """
+  if storage not in ("local", "tar", "zip") and not (storage.startswith("s3://") and storage[5:].strip("/") != ""):
+    raise ValueError(f"Invalid storage: {storage}")
+
+def createSink(storage : str, root : str, endpointUrl : str = None) -> StorageSink:
+  """Creates a storage sink from its specification.
+
+  Args:
+    storage (str): The sink specification, `local`, `tar`, `zip` or `s3://bucket/prefix`.
+    root (str): The root directory to save the files into.
+    endpointUrl (str, optional): The endpoint of the object store, for `s3://` sinks. Defaults to None.
+
+  Raises:
+    ValueError: If the sink specification is invalid.
+    ImportError: If the sink's optional dependencies are not installed.
+
+  Returns:
+    StorageSink: The storage sink.
+  """
+  validateStorage(storage)
+  if storage == "local":
+    return LocalSink(root)
+  elif storage in ("tar", "zip"):
+    return ArchiveSink(root, storage)
+  bucket, _, prefix = storage[5:].partition("/")
+  return S3Sink(bucket, prefix, endpointUrl)
@@ -0,0 +1,243 @@
+"""A module that encapsulates the HTTP transports the Canvas file downloader sends its requests with.
+
+- `http1` sends the requests over pooled HTTP/1.1 connections with `requests`, so that consecutive requests to the
+  same host reuse their connections instead of opening a new connection for each request.
+- `http2` sends the requests with `httpx` over HTTP/2, which multiplexes concurrent requests to the same host as
+  streams over a single connection (see `Downloader.concurrency`). It requires the optional `httpx[http2]` package,
+  and falls back to `http1` if the package is not installed. Hosts that do not support HTTP/2 are sent HTTP/1.1 requests over the same connection pool.
+
+API responses are negotiated with gzip or deflate compression (see `API_HEADERS`), and decoded with `orjson` if the
+optional package is installed (see `decodeJson`).
+
+The HTTP packages are only imported when a transport is created, so that importing the downloader (e.g. to show the
+GUI) does not wait for them to load.
+"""
+
+import json
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+  import requests
+
+TRANSPORTS = {
+  "http1": "HTTP/1.1 with pooled connections",
+  "http2": "HTTP/2 with multiplexed streams (requires httpx[http2])",
+}
+
+# the headers of Canvas API requests, which ask for the JSON listings to be compressed
+API_HEADERS = {
+  'Accept': 'application/json',
+  'Accept-Encoding': 'gzip, deflate',
+}
+
+# the function that decodes JSON, chosen when the first response is decoded
+_loads = None
+
+def decodeJson(content : bytes):
+  """Decodes a JSON response body, with `orjson` if it is installed, which is several times faster than `json` on
+  large listings.
+
+  Args:
+    content (bytes): The response body.
+
+  Raises:
+    ValueError: If the body is not valid JSON.
+
+  Returns:
+    The decoded JSON value.
+  """
+  global _loads
+  if _loads is None:
+    try:
+      import orjson
+      _loads = orjson.loads
+    except ImportError:
+      _loads = json.loads
+  return _loads(content)
+
+class Transport:
+  """The interface of an HTTP transport. Responses have the same interface as `requests.Response` objects (the
+  `status_code`, `headers`, `links`, `url` and `content` attributes, and the `json`, `iter_content`, `raise_for_status` and
+  `close` methods), and can be used as context managers.
+  """
+
+  name = ""
+
+  def get(self, url : str, params : dict = None, headers : dict = None, stream : bool = False):
+    """Sends a `GET` request, following redirects.
+
+    Args:
+      url (str): The URL to request.
+      params (dict, optional): The query parameters. List values are sent as repeated parameters. Defaults to None.
+      headers (dict, optional): The request headers. Defaults to None.
+      stream (bool, optional): Whether to stream the response body with `iter_content` instead of reading it
+      immediately. Defaults to False.
+
+    Returns:
+      The response.
+    """
+    raise NotImplementedError
+
+  def post(self, url : str, params : dict = None, json : dict = None, headers : dict = None):
+    """Sends a `POST` request with a JSON body.
+
+    Args:
+      url (str): The URL to request.
+      params (dict, optional): The query parameters. Defaults to None.
+      json (dict, optional): The JSON body. Defaults to None.
+      headers (dict, optional): The request headers. Defaults to None.
+
+    Returns:
+      The response.
+    """
+    raise NotImplementedError
+
+  def close(self):
+    """Closes the connections of the transport."""
+
+class RequestsTransport(Transport):
+  """Sends requests over pooled HTTP/1.1 connections with `requests`."""
+
+  name = "http1"
+
+  def __init__(self, poolSize : int = 16):
+    """Creates an HTTP/1.1 transport.
+
+    Args:
+      poolSize (int, optional): The maximum number of connections kept open to each host. Defaults to 16.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    self._session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+    self._session.mount("http://", adapter)
+    self._session.mount("https://", adapter)
+
+  def get(self, url : str, params : dict = None, headers : dict = None, stream : bool = False) -> "requests.Response":
+    return self._session.get(url, params=params, headers=headers, stream=stream)
+
+  def post(self, url : str, params : dict = None, json : dict = None, headers : dict = None) -> "requests.Response":
+    return self._session.post(url, params=params, json=json, headers=headers)
+
+  def close(self):
+    self._session.close()
+
+class _HTTP2Response:
+  """Wraps an `httpx` response in the interface of a `requests.Response` object."""
+
+  def __init__(self, response, stream : bool):
+    self._response = response
+    self.status_code = response.status_code
+    self.headers = response.headers
+    self.url = str(response.url)
+    if not stream:
+      response.read()
+
+  @property
+  def content(self) -> bytes:
+    return self._response.read()
+
+  @property
+  def links(self) -> dict:
+    return self._response.links
+
+  def json(self):
+    return decodeJson(self._response.read())
+
+  def iter_content(self, chunk_size : int = None):
+    return self._response.iter_bytes(chunk_size)
+
+  def raise_for_status(self):
+    if self.status_code >= 400:
+      import requests
+      raise requests.HTTPError(f"{self.status_code} error for url: {self.url}", response=self)
+
+  def close(self):
+    self._response.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __repr__(self) -> str:
+    return f"<Response [{self.status_code}]>"
+
+class HTTP2Transport(Transport):
+  """Sends requests over HTTP/2 with `httpx`, multiplexing concurrent requests to a host as streams over a connection."""
+
+  name = "http2"
+
+  def __init__(self, maxConnections : int = 4, priorKnowledge : bool = False):
+    """Creates an HTTP/2 transport.
+
+    Args:
+      maxConnections (int, optional): The maximum number of connections kept open to each host. Defaults to 4.
+      priorKnowledge (bool, optional): Whether to speak HTTP/2 to plain `http://` hosts straight away, instead of
+      only negotiating it over TLS. Only for servers known to support it, like the benchmarks' stand-in server.
+      Defaults to False.
+
+    Raises:
+      ImportError: If `httpx` or its HTTP/2 support is not installed.
+    """
+    import httpx
+    self._httpx = httpx
+    self._client = httpx.Client(
+      http1=not priorKnowledge,
+      http2=True,
+      follow_redirects=True,
+      limits=httpx.Limits(max_connections=maxConnections * 8, max_keepalive_connections=maxConnections),
+      timeout=httpx.Timeout(60.0, connect=30.0),
+    )
+
+  def _url(self, url : str, params : dict):
+    """Adds query parameters to a URL, keeping the URL's own query parameters like `requests` does (`httpx` replaces
+    them), which the `next` links of paginated listings rely on.
+    """
+    return self._httpx.URL(url).copy_merge_params(params) if params else url
+
+  def get(self, url : str, params : dict = None, headers : dict = None, stream : bool = False) -> _HTTP2Response:
+    request = self._client.build_request("GET", self._url(url, params), headers=headers)
+    return _HTTP2Response(self._client.send(request, stream=stream), stream)
+
+  def post(self, url : str, params : dict = None, json : dict = None, headers : dict = None) -> _HTTP2Response:
+    return _HTTP2Response(self._client.post(self._url(url, params), json=json, headers=headers), False)
+
+  def close(self):
+    self._client.close()
+
+def createTransport(name : str = "http1") -> Transport:
+  """Creates a transport by name, falling back to the `http1` transport if the transport's optional dependencies are
+  not installed.
+
+  Args:
+    name (str, optional): The name of the transport, one of the keys of `TRANSPORTS`. Defaults to "http1".
+
+  Raises:
+    ValueError: If the transport name is invalid.
+
+  Returns:
+    Transport: The transport.
+  """
+  if name not in TRANSPORTS:
+    raise ValueError(f"Invalid transport: {name}")
+  if name == "http2":
+    try:
+      return HTTP2Transport()
+    except ImportError:
+      print("HTTP/2 requires the httpx[http2] package (pip install httpx[http2]). Using HTTP/1.1 instead.")
+  return RequestsTransport()
+
+_defaultTransport : Transport = None
+
+def defaultTransport() -> Transport:
+  """Returns the shared `http1` transport used when no transport is given.
+
+  Returns:
+    Transport: The shared transport.
+  """
+  global _defaultTransport
+  if _defaultTransport is None:
+    _defaultTransport = RequestsTransport()
+  return _defaultTransport